@@ -0,0 +1,4 @@
+import time
+
+# Start of the app's import, for the import-to-ready time logged at startup
+IMPORT_STARTED = time.perf_counter()
@@ -2,8 +2,15 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from typing import Optional
+import hashlib
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Try to import passlib, use fallback if not available
 try:
@@ -11,9 +18,10 @@ try:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     USE_BCRYPT = True
 except ImportError:
-    print("WARNING: passlib not installed. Using fallback password hashing (less secure).")
-    print("Please install: pip install passlib bcrypt")
-    import hashlib
+    logger.warning(
+        "passlib not installed. Using fallback password hashing (less secure). "
+        "Please install: pip install passlib bcrypt"
+    )
     import base64
     USE_BCRYPT = False
 
@@ -24,12 +32,74 @@ security = HTTPBearer()
 # Same secret as auth-service
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key")
 
+# Verified claims keyed by a hash of the token, each entry expiring with
+# the token's own exp (and at most TOKEN_CACHE_TTL seconds after caching)
+token_cache = TTLCache(
+    "token",
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", "300")),
+)
+# How long a revocation is kept when the token's exp is unknown
+REVOCATION_DEFAULT_TTL = 86400
+
+
+class RevocationStoreFull(RuntimeError):
+    """Every entry of the revocation store is still live"""
+
+
+class RevocationList:
+    """
+    Revoked token hashes with the time their token expires. Unlike a
+    cache, an entry only ever leaves by expiring: dropping a live one would
+    make its token valid again. When the store is full of live entries,
+    adding one raises instead.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, expires_at: float):
+        with self._lock:
+            if key not in self._expiry and len(self._expiry) >= self.maxsize:
+                self._purge(time.time())
+                if len(self._expiry) >= self.maxsize:
+                    raise RevocationStoreFull(
+                        f"{self.maxsize} revoked tokens are still live; raise REVOKED_TOKENS_SIZE"
+                    )
+            self._expiry[key] = max(expires_at, self._expiry.get(key, 0))
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._expiry.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._expiry[key]
+                return False
+            return True
+
+    def _purge(self, now: float):
+        for key in [key for key, expires_at in self._expiry.items() if expires_at <= now]:
+            del self._expiry[key]
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+# Revoked token hashes, kept until the token would have expired anyway
+revoked_tokens = RevocationList(maxsize=int(os.getenv("REVOKED_TOKENS_SIZE", "100000")))
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt or fallback method"""
-    # Debug logging
-    print(f"🔐 hash_password called with type: {type(password)}, value: {repr(password)[:100]}")
-    
+    logger.debug("hash_password called", extra={"password_type": type(password).__name__})
+
     # Validate input type
     if not isinstance(password, str):
         raise ValueError(f"Password must be a string, got {type(password)}")
@@ -43,20 +113,20 @@ def hash_password(password: str) -> str:
     
     # Check byte length before encoding
     password_bytes = password.encode('utf-8')
-    print(f"📏 Password byte length: {len(password_bytes)} bytes")
+    logger.debug("Password byte length: %d bytes", len(password_bytes))
     
     # Ensure password doesn't exceed 72 bytes for bcrypt
     if len(password_bytes) > 72:
-        print(f"⚠️  Password exceeds 72 bytes, truncating from {len(password_bytes)} bytes")
+        logger.warning("Password exceeds 72 bytes, truncating from %d bytes", len(password_bytes))
         # Truncate string to ensure encoded bytes don't exceed 72
         while len(password.encode('utf-8')) > 72:
             password = password[:-1]
         password_bytes = password.encode('utf-8')
-        print(f"✂️  Truncated to {len(password_bytes)} bytes")
+        logger.debug("Truncated to %d bytes", len(password_bytes))
     
     if USE_BCRYPT:
         hashed = pwd_context.hash(password)
-        print(f"✅ Password hashed successfully using bcrypt")
+        logger.debug("Password hashed successfully using bcrypt")
         return hashed
     else:
         # Fallback: PBKDF2 with SHA256
@@ -64,7 +134,7 @@ def hash_password(password: str) -> str:
         key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
         storage = salt + key
         hashed = base64.b64encode(storage).decode('utf-8')
-        print(f"✅ Password hashed successfully using PBKDF2")
+        logger.debug("Password hashed successfully using PBKDF2")
         return hashed
 
 
@@ -84,15 +154,57 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
             return False
 
 
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _seconds_left(payload: dict) -> Optional[float]:
+    exp = payload.get("exp")
+    return float(exp) - time.time() if isinstance(exp, (int, float)) else None
+
+
+def revoke_token(token: str, expires_at: Optional[float] = None):
+    """
+    Reject token from now on (logout, disabled account). The revocation
+    is remembered until the token's exp, or for a day when it is unknown.
+    Raises RevocationStoreFull rather than forget a live revocation.
+    """
+    key = _token_key(token)
+    token_cache.delete("claims", key)
+    if expires_at is None:
+        expires_at = time.time() + REVOCATION_DEFAULT_TTL
+    elif expires_at <= time.time():
+        # Already expired: verification rejects it without our help
+        return
+    revoked_tokens.add(key, expires_at)
+
+
+def clear_token_cache():
+    """Forget every cached verification (e.g. after rotating JWT_SECRET)"""
+    token_cache.invalidate("claims")
+
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Verify JWT token and return user info
     """
     token = credentials.credentials
+    key = _token_key(token)
+
+    # revoke_token() drops the cached entry, so a hit is never revoked
+    payload = token_cache.get("claims", key)
+    if payload is not None:
+        return payload
+    if key in revoked_tokens:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
 
     try:
         # Decode token
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        token_cache.set("claims", key, payload, ttl=_seconds_left(payload))
         return payload  # Returns { userId, email, role }
     except jwt.ExpiredSignatureError:
         raise HTTPException(
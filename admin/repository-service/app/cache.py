@@ -0,0 +1,155 @@
+"""
+In-process TTL + LRU caches (reference data pages, verified JWTs).
+
+Departments, specialties, levels, groups and rooms change a few times a
+semester, so their list pages are served from memory. Each namespace has
+a generation number that write endpoints bump: invalidation is O(1) and
+stale entries simply age out of the LRU. A value computed from the
+database can be stored with the generation read before the query, so a
+write that lands mid-load does not leave a stale entry behind.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+from .conditional import Validators, is_not_modified, not_modified, validator_headers
+from .metrics import Counter, registry
+from .pagination import NEXT_CURSOR_HEADER, PageParams
+
+_MISSING = object()
+
+cache_requests_total = registry.register(Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss)"
+))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generations = defaultdict(int)
+        # Bumped by invalidate_all and clear, part of every key
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, namespace: str, key: Hashable):
+        return (namespace, self._epoch, self._generations[namespace], key)
+
+    def generation(self, namespace: str) -> tuple:
+        """Token that changes whenever the namespace is invalidated"""
+        with self._lock:
+            return (self._epoch, self._generations[namespace])
+
+    def get(self, namespace: str, key: Hashable, default=None):
+        now = time.monotonic()
+        with self._lock:
+            full_key = self._key(namespace, key)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                cache_requests_total.inc(cache=self.name, result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[full_key]
+            self.misses += 1
+        cache_requests_total.inc(cache=self.name, result="miss")
+        return default
+
+    def set(self, namespace: str, key: Hashable, value, ttl: Optional[float] = None,
+            generation: Optional[tuple] = None):
+        """
+        Store value; ttl overrides the cache's default, capped at it. With
+        a generation() token, the value is dropped if the namespace was
+        invalidated since the token was read.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations[namespace]):
+                return
+            full_key = self._key(namespace, key)
+            self._entries[full_key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: Hashable):
+        with self._lock:
+            self._entries.pop(self._key(namespace, key), None)
+
+    def invalidate(self, *namespaces: str):
+        """Drop every entry of the given namespaces"""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] += 1
+
+    def invalidate_all(self):
+        """Drop every entry of every namespace"""
+        with self._lock:
+            self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+reference_cache = TTLCache(
+    "reference",
+    maxsize=int(os.getenv("REFERENCE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("REFERENCE_CACHE_TTL", "300")),
+)
+
+_PAGE_HEADERS = (NEXT_CURSOR_HEADER, "Deprecation")
+
+
+async def cached_page(
+    namespace: str,
+    page: PageParams,
+    response: Response,
+    load: Callable[[], Awaitable[list]],
+    request: Optional[Request] = None,
+    validate: Optional[Callable[[], Awaitable[Validators]]] = None,
+):
+    """
+    Serve a paginated list from reference_cache, calling load() on a miss.
+
+    With validate, the page's ETag is cached alongside it so a matching
+    If-None-Match gets a 304 straight from memory.
+    """
+    key = (page.cursor, page.limit, page.skip, page.sort)
+    cached = reference_cache.get(namespace, key, _MISSING)
+    if cached is _MISSING:
+        validators = await validate() if validate else None
+        if validators is not None and is_not_modified(request, validators):
+            return not_modified(validators)
+        rows = await load()
+        headers = {name: response.headers[name] for name in _PAGE_HEADERS if name in response.headers}
+        if validators is not None:
+            headers.update(validator_headers(validators))
+        reference_cache.set(namespace, key, (rows, headers, validators))
+        response.headers.update(headers)
+        response.headers["X-Cache"] = "MISS"
+        return rows
+
+    rows, headers, validators = cached
+    if validators is not None and is_not_modified(request, validators):
+        return not_modified(validators)
+    response.headers.update(headers)
+    response.headers["X-Cache"] = "HIT"
+    return rows
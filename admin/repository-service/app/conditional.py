@@ -0,0 +1,125 @@
+"""
+Conditional GET support (ETag / Last-Modified -> 304 Not Modified).
+
+Collections are validated with one aggregate query over the same FROM /
+JOIN / WHERE as the list query (row count, max id and the newest
+updated_at of every joined table); single resources use their own id
+and updated_at. When the client's If-None-Match matches, the endpoint
+returns 304 before loading or serialising anything.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def _make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def strong_etag(*parts) -> str:
+    """For bodies that are byte-for-byte determined by `parts`"""
+    return f'"{hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:32]}"'
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def timestamp_column(model):
+    """updated_at where the table has one, created_at otherwise"""
+    return getattr(model, "updated_at", None) or model.created_at
+
+
+async def collection_validators(db, request: Request, statement, id_column, *timestamp_columns) -> Validators:
+    """
+    Validators for a list endpoint, from one aggregate query.
+
+    statement is the endpoint's select (joins and filters are kept, the
+    selected columns are replaced); timestamp_columns should cover every
+    joined table whose data is part of the response. The query string is
+    part of the ETag so every page gets its own.
+    """
+    aggregate = statement.with_only_columns(
+        func.count(),
+        func.max(id_column),
+        *(func.max(column) for column in timestamp_columns),
+        maintain_column_froms=True,
+    ).order_by(None)
+    count, max_id, *timestamps = (await db.execute(aggregate)).one()
+    present = [_as_utc(value) for value in timestamps if value is not None]
+    last_modified = max(present) if present else None
+    etag = _make_etag(request.url.path, request.url.query, count, max_id, *timestamps)
+    return Validators(etag, last_modified)
+
+
+def resource_validators(instance) -> Validators:
+    """Validators for a single ORM row"""
+    model = type(instance)
+    stamp = getattr(instance, timestamp_column(model).key)
+    return Validators(_make_etag(model.__tablename__, instance.id, stamp), _as_utc(stamp))
+
+
+def content_validators(body: bytes) -> Validators:
+    """Validators for an already-rendered body, e.g. a cached one"""
+    return Validators(f'W/"{hashlib.sha1(body).hexdigest()[:32]}"', None)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validators: Validators, use_last_modified: bool = False) -> bool:
+    """
+    Evaluate If-None-Match (and, for single resources, If-Modified-Since).
+
+    If-Modified-Since is ignored for collections: a deleted row doesn't
+    move max(updated_at), so only the ETag can be trusted there.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validators.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if use_last_modified and if_modified_since and validators.last_modified is not None:
+        try:
+            return validators.last_modified <= _as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(validators: Validators) -> dict:
+    headers = {"ETag": validators.etag}
+    if validators.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(validators.last_modified, usegmt=True)
+    return headers
+
+
+def apply_validators(response: Response, validators: Validators):
+    response.headers.update(validator_headers(validators))
+
+
+def not_modified(validators: Validators) -> Response:
+    return Response(status_code=304, headers=validator_headers(validators))
@@ -0,0 +1,127 @@
+"""
+Streaming NDJSON / CSV exports.
+
+Rows are read through a server-side cursor (yield_per enables
+stream_results on psycopg2) and encoded batch by batch, so memory stays
+flat and the first bytes leave before the query has finished.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Iterator, List
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from . import models
+from .database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _iter_rows(statement, fields: List[str], fmt: str) -> Iterator[str]:
+    # The generator owns its session: the request-scoped one may already be
+    # closed while the response body is still being streamed.
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(fields)
+
+        for batch in result.partitions():
+            for row in batch:
+                if writer:
+                    writer.writerow([_plain(value) for value in row])
+                else:
+                    buffer.write(json.dumps(dict(zip(fields, map(_plain, row))), ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+def stream_export(statement, filename: str, fmt: str) -> StreamingResponse:
+    """Stream the rows of a Core select as NDJSON or CSV"""
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'. Use ndjson or csv")
+    fields = [column.key for column in statement.selected_columns]
+    return StreamingResponse(
+        _iter_rows(statement, fields, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+def students_export_statement():
+    """Student + Specialty + User join with the columns of the student list"""
+    Student, Specialty, User = models.Student, models.Specialty, models.User
+    return (
+        select(
+            Student.id,
+            Student.user_id,
+            Student.student_number,
+            Student.group_id,
+            Student.specialty_id,
+            Specialty.name.label("specialty_name"),
+            Specialty.code.label("specialty_code"),
+            User.first_name,
+            User.last_name,
+            User.email,
+            Student.enrollment_date,
+            Student.date_of_birth,
+            Student.phone,
+            Student.address,
+            Student.created_at,
+        )
+        .join(Specialty, Student.specialty_id == Specialty.id)
+        .join(User, Student.user_id == User.id)
+        .order_by(Student.id)
+    )
+
+
+def teachers_export_statement():
+    """Teacher + Department + User join with the columns of the teacher list"""
+    Teacher, Department, User = models.Teacher, models.Department, models.User
+    return (
+        select(
+            Teacher.id,
+            Teacher.user_id,
+            Teacher.employee_id,
+            Teacher.department_id,
+            Department.name.label("department_name"),
+            Department.code.label("department_code"),
+            Teacher.specialization,
+            Teacher.phone,
+            Teacher.hire_date,
+            User.first_name,
+            User.last_name,
+            User.email,
+            Teacher.created_at,
+        )
+        .join(Department, Teacher.department_id == Department.id)
+        .join(User, Teacher.user_id == User.id)
+        .order_by(Teacher.id)
+    )
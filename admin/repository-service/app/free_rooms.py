@@ -0,0 +1,222 @@
+"""
+Free-room search for makeup classes and ad-hoc bookings.
+
+Bookable rooms are kept in memory sorted by (capacity, id), so a search
+starts at the first room big enough (binary search) and walks up,
+returning matches smallest sufficient capacity first. Whether a room is
+busy comes from the occupancy index's per-day minute bitmaps of the
+weekly timetable, already maintained on every slot write.
+
+Searching a date also applies the dated sessions that differ from their
+slot (cancelled, rescheduled, moved or makeup): a slot occurrence that
+was cancelled or moved no longer blocks its room, teacher and group that
+day, and the session's own time is blocked instead. Only those deviating
+sessions are held, so the memory cost stays small.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import date, timedelta
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+from .occupancy import GROUP, ROOM, TEACHER, OccupancyIndex, occupancy_index, span_mask, to_minutes
+
+# Sessions before today minus this are not loaded
+SESSION_LOOKBACK_DAYS = 7
+
+# Sorted on (capacity, id), which is also the ranking
+FreeRoom = namedtuple("FreeRoom", [
+    "capacity", "id", "code", "name", "building", "floor", "room_type", "has_projector", "has_computers",
+])
+
+ACTIVE_SESSION_STATUSES = ("scheduled", "completed")
+
+
+class FreeRoomIndex:
+    """Thread-safe catalogue of bookable rooms plus dated session overrides"""
+
+    def __init__(self, occupancy: OccupancyIndex):
+        self._lock = threading.RLock()
+        self._occupancy = occupancy
+        self._rooms: List[FreeRoom] = []
+        self._capacities: List[int] = []
+        # date -> slots whose weekly booking does not hold that day
+        self._lifted: Dict[date, Set[int]] = {}
+        # date -> dimension -> resource id -> minutes booked by dated sessions
+        self._booked: Dict[date, Dict[str, Dict[int, int]]] = {}
+        self.loaded = False
+
+    # ----- maintenance -----
+
+    def load(self, rooms: Iterable[models.Room], sessions: Iterable):
+        """Rebuild the catalogue and the overrides from scratch"""
+        with self._lock:
+            self._rooms = sorted(self._entry(room) for room in rooms if room.is_available is not False)
+            self._capacities = [room.capacity for room in self._rooms]
+            self.load_sessions(sessions)
+            self.loaded = True
+
+    def load_sessions(self, sessions: Iterable):
+        """Replace the dated overrides; rows need the Session columns used below"""
+        lifted, booked = {}, {}
+        for session in sessions:
+            if not session.is_makeup:
+                lifted.setdefault(session.session_date, set()).add(session.timetable_slot_id)
+            if session.status in ACTIVE_SESSION_STATUSES:
+                bits = span_mask(to_minutes(session.start_time), to_minutes(session.end_time))
+                day = booked.setdefault(session.session_date, {})
+                for dimension, resource_id in ((ROOM, session.room_id), (TEACHER, session.teacher_id),
+                                               (GROUP, session.group_id)):
+                    resources = day.setdefault(dimension, {})
+                    resources[resource_id] = resources.get(resource_id, 0) | bits
+        with self._lock:
+            self._lifted, self._booked = lifted, booked
+
+    def put_room(self, room: models.Room):
+        with self._lock:
+            self._remove(room.id)
+            if room.is_available is not False:
+                entry = self._entry(room)
+                position = bisect_left(self._rooms, entry)
+                self._rooms.insert(position, entry)
+                self._capacities.insert(position, entry.capacity)
+
+    def remove_room(self, room_id: int):
+        with self._lock:
+            self._remove(room_id)
+
+    def _remove(self, room_id: int):
+        for position, room in enumerate(self._rooms):
+            if room.id == room_id:
+                del self._rooms[position]
+                del self._capacities[position]
+                return
+
+    @staticmethod
+    def _entry(room) -> FreeRoom:
+        return FreeRoom(
+            capacity=room.capacity or 0,
+            id=room.id,
+            code=room.code,
+            name=room.name,
+            building=room.building,
+            floor=room.floor,
+            room_type=room.room_type,
+            has_projector=bool(room.has_projector),
+            has_computers=bool(room.has_computers),
+        )
+
+    # ----- queries -----
+
+    def search(
+        self,
+        day_of_week: int,
+        start,
+        end,
+        on_date: Optional[date] = None,
+        min_capacity: int = 0,
+        room_type: Optional[str] = None,
+        has_projector: Optional[bool] = None,
+        has_computers: Optional[bool] = None,
+        building: Optional[str] = None,
+        academic_year: Optional[str] = None,
+        semester: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[FreeRoom]:
+        """Rooms matching the filters with nothing booked in [start, end), smallest first"""
+        start, end = to_minutes(start), to_minutes(end)
+        window = span_mask(start, end)
+        with self._lock:
+            lifted: Dict[int, Set[int]] = {}
+            booked: Dict[int, int] = {}
+            if on_date is not None:
+                for slot_id in self._lifted.get(on_date, ()):
+                    entry = self._occupancy.slot(slot_id)
+                    if entry is not None and entry.day == day_of_week and entry.start < end and entry.end > start:
+                        lifted.setdefault(entry.room_id, set()).add(slot_id)
+                booked = self._booked.get(on_date, {}).get(ROOM, {})
+
+            busy = self._occupancy.busy_map(ROOM, day_of_week, academic_year, semester)
+            if lifted:
+                busy = dict(busy)
+            for room_id, slot_ids in lifted.items():
+                busy[room_id] = self._occupancy.busy_bits(
+                    ROOM, room_id, day_of_week, academic_year, semester, exclude_slot_ids=slot_ids
+                )
+
+            rooms = self._rooms[bisect_left(self._capacities, min_capacity):]
+        # The slice is a snapshot, so filtering runs outside the lock
+        if room_type is not None:
+            rooms = [room for room in rooms if room.room_type == room_type]
+        if building is not None:
+            rooms = [room for room in rooms if room.building == building]
+        if has_projector is not None:
+            rooms = [room for room in rooms if room.has_projector == has_projector]
+        if has_computers is not None:
+            rooms = [room for room in rooms if room.has_computers == has_computers]
+        busy_get, booked_get = busy.get, booked.get
+        found = [room for room in rooms if not (busy_get(room.id, 0) | booked_get(room.id, 0)) & window]
+        return found[:limit] if limit is not None else found
+
+    def busy_bits(self, dimension: str, resource_id: int, on_date: date,
+                  academic_year: Optional[str] = None, semester: Optional[int] = None) -> int:
+        """Minutes a room/teacher/group is booked on a date: weekly timetable plus that day's sessions"""
+        day_of_week = on_date.isoweekday()
+        with self._lock:
+            lifted = set()
+            for slot_id in self._lifted.get(on_date, ()):
+                entry = self._occupancy.slot(slot_id)
+                if entry is not None and entry.day == day_of_week and getattr(entry, f"{dimension}_id") == resource_id:
+                    lifted.add(slot_id)
+            booked = self._booked.get(on_date, {}).get(dimension, {}).get(resource_id, 0)
+        return booked | self._occupancy.busy_bits(
+            dimension, resource_id, day_of_week, academic_year, semester, exclude_slot_ids=lifted
+        )
+
+    def __len__(self):
+        return len(self._rooms)
+
+
+# Shared index used by endpoints
+free_room_index = FreeRoomIndex(occupancy_index)
+
+
+def deviates():
+    """SQL condition for sessions that differ from their slot's weekly booking (slot must be joined)"""
+    Slot = models.TimetableSlot
+    return or_(
+        models.Session.is_makeup == True,
+        models.Session.status.notin_(ACTIVE_SESSION_STATUSES),
+        models.Session.room_id != Slot.room_id,
+        models.Session.start_time != Slot.start_time,
+        models.Session.end_time != Slot.end_time,
+    )
+
+
+def deviating_sessions(db: Session, since: Optional[date] = None):
+    """Sessions from `since` on that do not simply repeat their slot's weekly booking"""
+    if since is None:
+        since = date.today() - timedelta(days=SESSION_LOOKBACK_DAYS)
+    Slot = models.TimetableSlot
+    return db.query(
+        models.Session.session_date, models.Session.timetable_slot_id, models.Session.room_id,
+        models.Session.start_time, models.Session.end_time, models.Session.status, models.Session.is_makeup,
+        Slot.teacher_id, Slot.group_id,
+    ).join(Slot, models.Session.timetable_slot_id == Slot.id).filter(
+        models.Session.session_date >= since, deviates(),
+    ).all()
+
+
+def build_free_room_index(db: Session) -> FreeRoomIndex:
+    """Load the rooms and the upcoming deviating sessions into the shared index"""
+    free_room_index.load(db.query(models.Room).all(), deviating_sessions(db))
+    return free_room_index
+
+
+def refresh_session_overrides(db: Session):
+    """Reload the dated overrides after sessions were written"""
+    free_room_index.load_sessions(deviating_sessions(db))
@@ -0,0 +1,142 @@
+"""
+Password hashing off the request workers.
+
+A bcrypt hash is ~250 ms of pure CPU, so hashes run in a process pool
+sized to the machine instead of on the event loop or the threadpool.
+The number of queued jobs is bounded: when it is full, callers get a
+503 with Retry-After straight away instead of piling up behind a
+burst of account creations.
+
+Async routes use hash / verify / hash_many; sync routes (already on a
+threadpool thread) use the *_blocking variants.
+
+Environment:
+    HASH_WORKERS      worker processes (default: CPU count)
+    HASH_MAX_PENDING  jobs queued or running before rejecting (default 4 per worker)
+"""
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+from .auth import hash_password, verify_password
+from .metrics import Counter, Gauge, registry
+
+password_hash_rejections_total = registry.register(Counter(
+    "password_hash_rejections_total", "Hashing jobs rejected because the queue was full"
+))
+
+
+class HashingOverloaded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing is at capacity, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    return [hash_password(password) for password in passwords]
+
+
+class PasswordHasher:
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs logging and
+                # pool threads can deadlock the child on their locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _submit(self, func, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            password_hash_rejections_total.inc()
+            raise HashingOverloaded()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _submit_batch(self, passwords: List[str]) -> List[Future]:
+        # One job per worker so a batch uses every core without flooding the queue
+        size = -(-len(passwords) // self.workers)
+        futures = []
+        try:
+            for offset in range(0, len(passwords), size):
+                futures.append(self._submit(_hash_many, passwords[offset:offset + size]))
+        except HashingOverloaded:
+            for future in futures:
+                future.cancel()
+            raise
+        return futures
+
+    async def hash(self, password: str) -> str:
+        return (await asyncio.wrap_future(self._submit(_hash_many, [password])))[0]
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit(verify_password, plain_password, hashed_password))
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        if not passwords:
+            return []
+        chunks = await asyncio.gather(*(asyncio.wrap_future(f) for f in self._submit_batch(passwords)))
+        return [hashed for chunk in chunks for hashed in chunk]
+
+    def hash_blocking(self, password: str) -> str:
+        return self._submit(_hash_many, [password]).result()[0]
+
+    def verify_blocking(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit(verify_password, plain_password, hashed_password).result()
+
+    def hash_many_blocking(self, passwords: List[str]) -> List[str]:
+        if not passwords:
+            return []
+        return [hashed for future in self._submit_batch(passwords) for hashed in future.result()]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("HASH_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("HASH_MAX_PENDING", "0")) or None,
+)
+atexit.register(password_hasher.shutdown)
+
+registry.register(Gauge(
+    "password_hash_pending", "Hashing jobs queued or running",
+    lambda: [({}, password_hasher.pending)],
+))
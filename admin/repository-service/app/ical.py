@@ -0,0 +1,307 @@
+"""
+Streaming iCalendar (RFC 5545) feeds of group, teacher and room timetables.
+
+Each active slot becomes one weekly VEVENT (RRULE ... UNTIL the end of
+the feed window). Event closures and the dates where a materialised
+session departs from the slot (cancelled, moved) are EXDATEs on it, and
+sessions that happen somewhere or sometime else (moved, makeup) are
+VEVENTs of their own. Only those deviating sessions are read, so a
+year-long feed is a few hundred lines per slot at most.
+
+The document is produced by a generator over two server-side cursors
+(slots, and deviating sessions, both ordered by slot id and merged), so
+it is never held in memory whole. Calendar clients poll feeds, so the
+ETag is computed first from a few aggregate queries over the slots, the
+sessions and the closures, plus the names the events show. Every byte
+of the body, DTSTAMP included, is determined by those inputs, so the
+ETag is strong and an unchanged feed gets a 304 without generating
+anything.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .conditional import Validators, _as_utc, strong_etag
+from .database import SessionLocal
+from .free_rooms import ACTIVE_SESSION_STATUSES, deviates
+from .occupancy import GROUP, ROOM, TEACHER
+from .session_generation import closures, meeting_dates
+
+# Bump when the generated text changes shape, so cached copies are refetched
+FEED_VERSION = 1
+ICS_BATCH_SIZE = 500
+# Bytes buffered before a chunk is sent
+ICS_CHUNK_SIZE = 16384
+# Default window: this many days back and ahead of today, in whole weeks
+ICS_PAST_DAYS = int(os.getenv("ICS_PAST_DAYS", "28"))
+ICS_FUTURE_DAYS = int(os.getenv("ICS_FUTURE_DAYS", "182"))
+ICS_MAX_DAYS = 400
+# Right-hand side of every UID
+ICS_UID_DOMAIN = os.getenv("ICS_UID_DOMAIN", "repository-service")
+PRODID = "-//University Platform//Repository Service//EN"
+
+
+def default_window(today: Optional[date] = None) -> Tuple[date, date]:
+    """Monday-to-Sunday window around today, so it only moves once a week"""
+    today = today or date.today()
+    start = today - timedelta(days=ICS_PAST_DAYS)
+    end = today + timedelta(days=ICS_FUTURE_DAYS)
+    return start - timedelta(days=start.weekday()), end + timedelta(days=6 - end.weekday())
+
+
+# ----- text -----
+
+def escape(value) -> str:
+    """TEXT value escaping (RFC 5545 3.3.11)"""
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold(line: str) -> str:
+    """Fold a content line at 75 octets without splitting a UTF-8 sequence; adds CRLF"""
+    if len(line) <= 75 and line.isascii():
+        return line + "\r\n"
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > limit:
+            parts.append("".join(current))
+            # Continuation lines start with a space, which counts
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(moment: datetime) -> str:
+    return moment.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _local(day: date, at: time) -> str:
+    # Floating local time: shown at the same wall-clock time everywhere
+    return f"{day:%Y%m%d}T{at:%H%M%S}"
+
+
+# ----- queries -----
+
+def _names():
+    return (
+        models.Subject.name.label("subject_name"),
+        models.Subject.code.label("subject_code"),
+        models.Room.code.label("room_code"),
+        models.Room.name.label("room_name"),
+        models.Room.building,
+        models.Group.name.label("group_name"),
+        (models.User.first_name + " " + models.User.last_name).label("teacher_name"),
+    )
+
+
+def _join_names(statement, room_column):
+    Slot = models.TimetableSlot
+    return (
+        statement
+        .join(models.Subject, Slot.subject_id == models.Subject.id)
+        .join(models.Room, room_column == models.Room.id)
+        .join(models.Group, Slot.group_id == models.Group.id)
+        .join(models.Teacher, Slot.teacher_id == models.Teacher.id)
+        .join(models.User, models.Teacher.user_id == models.User.id)
+    )
+
+
+def _term(statement, academic_year: Optional[str], semester: Optional[int]):
+    if academic_year is not None:
+        statement = statement.where(models.TimetableSlot.academic_year == academic_year)
+    if semester is not None:
+        statement = statement.where(models.TimetableSlot.semester == semester)
+    return statement
+
+
+def _owner_column(owner: str):
+    Slot = models.TimetableSlot
+    return {GROUP: Slot.group_id, TEACHER: Slot.teacher_id, ROOM: Slot.room_id}[owner]
+
+
+def slots_statement(owner: str, owner_id: int, academic_year: Optional[str] = None, semester: Optional[int] = None):
+    Slot = models.TimetableSlot
+    statement = _join_names(
+        select(Slot.id, Slot.day_of_week, Slot.start_time, Slot.end_time, *_names()).select_from(Slot),
+        Slot.room_id,
+    ).where(Slot.is_active == True, _owner_column(owner) == owner_id)
+    return _term(statement, academic_year, semester).order_by(Slot.id)
+
+
+def sessions_statement(owner: str, owner_id: int, start_date: date, end_date: date,
+                       academic_year: Optional[str] = None, semester: Optional[int] = None):
+    """Deviating sessions in the window that concern the owner, ordered like slots_statement"""
+    Slot, Dated = models.TimetableSlot, models.Session
+    concerns = _owner_column(owner) == owner_id
+    if owner == ROOM:
+        # Sessions moved into the room, and the room's own slots' exceptions
+        concerns = or_(concerns, Dated.room_id == owner_id)
+    statement = _join_names(
+        select(Dated.id, Dated.timetable_slot_id, Dated.session_date, Dated.start_time, Dated.end_time,
+               Dated.room_id, Dated.status, Dated.is_makeup, *_names())
+        .select_from(Dated).join(Slot, Dated.timetable_slot_id == Slot.id),
+        Dated.room_id,
+    ).where(concerns, Dated.session_date.between(start_date, end_date), deviates())
+    return _term(statement, academic_year, semester).order_by(Dated.timetable_slot_id, Dated.session_date, Dated.id)
+
+
+def owner_name(db: Session, owner: str, owner_id: int) -> Optional[str]:
+    if owner == GROUP:
+        statement = select(models.Group.name).where(models.Group.id == owner_id)
+    elif owner == TEACHER:
+        statement = select(models.User.first_name + " " + models.User.last_name).join(
+            models.Teacher, models.Teacher.user_id == models.User.id
+        ).where(models.Teacher.id == owner_id)
+    else:
+        statement = select(func.coalesce(models.Room.name, models.Room.code)).where(models.Room.id == owner_id)
+    return db.execute(statement).scalar()
+
+
+def feed_validators(db: Session, owner: str, owner_id: int, name: str, start_date: date, end_date: date,
+                    academic_year: Optional[str] = None, semester: Optional[int] = None) -> Validators:
+    """
+    Strong validators from everything the feed is built from: row counts
+    and max ids catch inserts and deletes, the newest updated_at of each
+    table catches edits. The names written into the events are part of the
+    ETag themselves, since not every table has an updated_at (groups don't).
+    """
+    Slot, Dated, Event = models.TimetableSlot, models.Session, models.Event
+    names = (func.max(models.Subject.updated_at), func.max(models.Room.updated_at),
+             func.max(models.Teacher.updated_at), func.max(models.User.updated_at))
+    aggregates = [
+        slots_statement(owner, owner_id, academic_year, semester).with_only_columns(
+            func.count(), func.max(Slot.id), func.max(Slot.updated_at), *names, maintain_column_froms=True,
+        ),
+        sessions_statement(owner, owner_id, start_date, end_date, academic_year, semester).with_only_columns(
+            func.count(), func.max(Dated.id), func.max(Dated.updated_at), *names, maintain_column_froms=True,
+        ),
+        select(func.count(), func.max(Event.id), func.max(Event.updated_at)).where(
+            Event.affects_timetable == True, Event.start_date <= end_date, Event.end_date >= start_date,
+        ),
+    ]
+    parts: List = [FEED_VERSION, owner, owner_id, name, academic_year, semester, start_date, end_date]
+    stamps = []
+    for statement in aggregates:
+        row = db.execute(statement.order_by(None)).one()
+        parts.extend(row)
+        stamps.extend(value for value in row[2:] if value is not None)
+    # A few dozen distinct rows: one per subject, room, group and teacher
+    for statement in (slots_statement(owner, owner_id, academic_year, semester),
+                      sessions_statement(owner, owner_id, start_date, end_date, academic_year, semester)):
+        parts.extend(sorted(db.execute(
+            statement.with_only_columns(*_names(), maintain_column_froms=True).distinct().order_by(None)
+        ).all(), key=repr))
+    last_modified = _as_utc(max(stamps)) if stamps else None
+    return Validators(strong_etag(*parts), last_modified)
+
+
+# ----- document -----
+
+def _event(uid: str, dtstamp: str, day: date, start: time, end: time, row, owner: str,
+           extra: Tuple[str, ...] = (), summary_suffix: str = "") -> str:
+    summary = row.subject_name
+    if owner != GROUP:
+        summary += f" - {row.group_name}"
+    location = row.room_code if not row.building else f"{row.room_code}, {row.building}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@{ICS_UID_DOMAIN}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{_local(day, start)}",
+        f"DTEND:{_local(day, end)}",
+        *extra,
+        f"SUMMARY:{escape(summary + summary_suffix)}",
+        f"LOCATION:{escape(location)}",
+        f"DESCRIPTION:{escape(f'{row.subject_code} - {row.teacher_name} - {row.group_name}')}",
+        "END:VEVENT",
+    ]
+    return "".join(fold(line) for line in lines)
+
+
+def _session_event(row, owner: str, owner_id: int, dtstamp: str) -> str:
+    """A moved or makeup session that concerns the feed, or '' when it does not"""
+    if row.status not in ACTIVE_SESSION_STATUSES or (owner == ROOM and row.room_id != owner_id):
+        return ""
+    return _event(f"session-{row.id}", dtstamp, row.session_date, row.start_time, row.end_time, row, owner,
+                  summary_suffix=" (makeup)" if row.is_makeup else "")
+
+
+def iter_feed(owner: str, owner_id: int, name: str, start_date: date, end_date: date,
+              academic_year: Optional[str], semester: Optional[int], last_modified: Optional[datetime]) -> Iterator[str]:
+    # The generator owns its session: the request-scoped one may already be
+    # closed while the response body is still being streamed.
+    db = SessionLocal()
+    try:
+        dtstamp = _stamp(last_modified or datetime(1970, 1, 1))
+        closed = closures(db, start_date, end_date)
+        slots = db.execute(
+            slots_statement(owner, owner_id, academic_year, semester).execution_options(yield_per=ICS_BATCH_SIZE)
+        )
+        sessions = iter(db.execute(
+            sessions_statement(owner, owner_id, start_date, end_date, academic_year, semester)
+            .execution_options(yield_per=ICS_BATCH_SIZE)
+        ))
+        pending = next(sessions, None)
+
+        buffer = [fold(line) for line in (
+            "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{escape(name)}",
+        )]
+        size = sum(map(len, buffer))
+
+        def emit(text: str):
+            nonlocal size
+            buffer.append(text)
+            size += len(text)
+
+        for slot in slots:
+            # Sessions of slots outside this feed (room feeds), then this slot's
+            excluded = set()
+            while pending is not None and pending.timetable_slot_id <= slot.id:
+                if pending.timetable_slot_id == slot.id and not pending.is_makeup:
+                    excluded.add(pending.session_date)
+                emit(_session_event(pending, owner, owner_id, dtstamp))
+                pending = next(sessions, None)
+
+            weekly = meeting_dates(slot.day_of_week, start_date, end_date, ())
+            if weekly:
+                open_days = set(meeting_dates(slot.day_of_week, start_date, end_date, closed))
+                exdates = sorted(day for day in weekly if day not in open_days or day in excluded)
+                extra = [f"RRULE:FREQ=WEEKLY;UNTIL={_local(weekly[-1], slot.end_time)}"]
+                if exdates:
+                    extra.append("EXDATE:" + ",".join(_local(day, slot.start_time) for day in exdates))
+                emit(_event(f"slot-{slot.id}", dtstamp, weekly[0], slot.start_time, slot.end_time, slot, owner,
+                            extra=tuple(extra)))
+
+            if size >= ICS_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+
+        while pending is not None:
+            emit(_session_event(pending, owner, owner_id, dtstamp))
+            pending = next(sessions, None)
+        emit(fold("END:VCALENDAR"))
+        yield "".join(buffer)
+    finally:
+        db.close()
+
+
+def stream_feed(owner: str, owner_id: int, name: str, start_date: date, end_date: date,
+                academic_year: Optional[str], semester: Optional[int], validators: Validators) -> StreamingResponse:
+    return StreamingResponse(
+        iter_feed(owner, owner_id, name, start_date, end_date, academic_year, semester, validators.last_modified),
+        media_type="text/calendar; charset=utf-8",
+        headers={
+            "ETag": validators.etag,
+            "Content-Disposition": f'inline; filename="{owner}-{owner_id}.ics"',
+        },
+    )
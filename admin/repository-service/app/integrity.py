@@ -0,0 +1,57 @@
+"""
+Foreign-key and uniqueness checks for write endpoints in one round trip.
+
+    IntegrityCheck()
+        .exists(models.Group.id, student.group_id, f"Group with id {student.group_id} not found")
+        .unique(models.User.email, student.email, f"User with email {student.email} already exists")
+        .run(db)
+
+run() sends a single SELECT EXISTS(...), EXISTS(...), ... and raises a
+400 with the message of the first failing rule, in the order the rules
+were added, so endpoints keep the error they used to report from their
+chain of separate queries. Rules whose value is None are skipped.
+"""
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+
+class IntegrityCheck:
+    def __init__(self):
+        self._rules: List[Tuple[bool, object, str]] = []
+
+    def exists(self, column, value, message: str) -> "IntegrityCheck":
+        """Fail unless a row has column == value (foreign keys)"""
+        if value is not None:
+            self._rules.append((True, exists().where(column == value), message))
+        return self
+
+    def unique(self, column, value, message: str, exclude: Optional[Tuple[object, object]] = None) -> "IntegrityCheck":
+        """
+        Fail if a row already has column == value. exclude=(id_column, id)
+        ignores the row being updated.
+        """
+        if value is not None:
+            condition = exists().where(column == value)
+            if exclude is not None:
+                condition = condition.where(exclude[0] != exclude[1])
+            self._rules.append((False, condition, message))
+        return self
+
+    def failures(self, db: Session) -> List[str]:
+        """Messages of every failing rule, in order"""
+        if not self._rules:
+            return []
+        row = db.execute(select(*(condition for _, condition, _ in self._rules))).one()
+        return [
+            message
+            for (must_exist, _, message), found in zip(self._rules, row)
+            if bool(found) != must_exist
+        ]
+
+    def run(self, db: Session):
+        failures = self.failures(db)
+        if failures:
+            raise HTTPException(status_code=400, detail=failures[0])
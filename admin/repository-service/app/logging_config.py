@@ -0,0 +1,139 @@
+"""
+Logging setup for the repository service.
+
+Request threads only put records on an in-memory queue (QueueHandler);
+a QueueListener thread formats them as JSON lines and writes them to
+stdout. Levels can be set per logger and high-frequency messages can be
+sampled.
+
+Environment:
+    LOG_LEVEL     root level (default INFO)
+    LOG_LEVELS    per-logger levels, e.g. "app.auth=WARNING,sqlalchemy.engine=INFO"
+    LOG_FORMAT    json (default) or text
+    LOG_SAMPLING  per-logger keep rates, e.g. "app.main=0.1"
+
+A single call can also be sampled with extra={"sample_rate": 0.01}.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample_rate"}
+
+_listener: Optional[QueueListener] = None
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    mapping = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, setting = item.partition("=")
+        if setting:
+            mapping[name.strip()] = setting.strip()
+    return mapping
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with any extra= fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        return f"{text}\n{record.exc_text}" if record.exc_text and record.exc_text not in text else text
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep 1 in N records per (logger, message template), where N comes from
+    the record's sample_rate or the logger's LOG_SAMPLING rate. Warnings
+    and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.rates.get(record.name)
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        every = round(1 / rate)
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counters[key]
+            self._counters[key] = count + 1
+        return count % every == 0
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback on the calling thread (the
+        # objects may change later) but leave JSON formatting to the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging() -> QueueListener:
+    """Install the queue-based handler on the root logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json") == "text" else JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    rates = {name: float(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLING", "")).items()}
+    handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_mapping(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -1,16 +1,120 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas
-from .database import engine, get_db
-from .auth import hash_password
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import logging
+import os
+import time
+from datetime import datetime, date as dt_date, time as dt_time, timedelta
+from . import IMPORT_STARTED, migrations, models, schemas
+from .database import (
+    get_engine, get_db, get_async_db, SessionLocal, warm_pool, warm_async_pool, dispose_engines
+)
+from .hashing import password_hasher
+from .integrity import IntegrityCheck
+from .export import stream_export, students_export_statement, teachers_export_statement
+from .student_import import parse_student_rows, import_students
+from .logging_config import setup_logging
+from .metrics import registry, http_request_duration, http_requests_total
+from .conditional import (
+    collection_validators, resource_validators, is_not_modified, not_modified, apply_validators,
+    validator_headers,
+)
+from .cache import cached_page, reference_cache
+from .serialization import rows_response
+from .pagination import PageParams, paginate, NEXT_CURSOR_HEADER
+from .occupancy import (
+    occupancy_index, build_occupancy_index, lock_slot_resources, find_slot_conflicts, describe_conflicts,
+    span_mask, to_minutes, GROUP, ROOM, TEACHER,
+)
+from .scheduler import Grid, generate_schedule, scope_groups, write_schedule
+from .session_generation import closures, generate_sessions
+from .free_rooms import free_room_index, build_free_room_index, refresh_session_overrides
+from .makeup import book_makeup, find_makeup_slots, group_size
+from .timetable_grid import DAY_NAMES, invalidate_timetables, timetable_cache, weekly_timetable
+from .ical import ICS_MAX_DAYS, default_window, feed_validators, owner_name, stream_feed
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Set to false when migrations are applied by a deploy step instead
+# (python -m app.migrations upgrade); startup then fails on an old schema
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+
+def load_occupancy_index():
+    """Build the in-memory timetable occupancy index"""
+    db = SessionLocal()
+    try:
+        return build_occupancy_index(db)
+    finally:
+        db.close()
+
+
+def load_free_room_index():
+    """Build the in-memory room catalogue used by the free-room search"""
+    db = SessionLocal()
+    try:
+        return build_free_room_index(db)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup pipeline: engine, schema version check, warm pools, occupancy
+    and free-room indexes. Nothing touches the database before this runs,
+    so importing the app stays cheap and works while the database is down.
+    """
+    ready_at = time.perf_counter()
+    steps = {}
+
+    def step(name, started):
+        steps[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    engine = await run_in_threadpool(get_engine)
+    applied = await run_in_threadpool(migrations.ensure_current, engine, DB_MIGRATE_ON_STARTUP)
+    step("schema", started)
+    if applied:
+        logger.info("Migrations applied", extra={"versions": applied})
+
+    started = time.perf_counter()
+    warmed = await run_in_threadpool(warm_pool) + await warm_async_pool()
+    step("pool_warm", started)
+
+    started = time.perf_counter()
+    index = await run_in_threadpool(load_occupancy_index)
+    step("occupancy_index", started)
+
+    started = time.perf_counter()
+    rooms = await run_in_threadpool(load_free_room_index)
+    step("free_room_index", started)
+
+    logger.info("Startup complete", extra={
+        "import_ms": round((ready_at - IMPORT_STARTED) * 1000, 1),
+        "import_to_ready_ms": round((time.perf_counter() - IMPORT_STARTED) * 1000, 1),
+        "connections_warmed": warmed,
+        "slots": len(index),
+        "rooms": len(rooms),
+        **steps,
+    })
+    yield
+    await dispose_engines()
+
 
-models.Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="University Management API",
     description="Repository Service for University Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -20,9 +124,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency per route template for /metrics"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    http_request_duration.observe(time.perf_counter() - started, method=request.method, route=path)
+    http_requests_total.inc(method=request.method, route=path, status=response.status_code)
+    return response
+
+
 # ============================================
 # DEPARTMENT ENDPOINTS
 # ============================================
@@ -35,36 +152,32 @@ def create_department(
 ):
     """Create new department - Temporarily public for demo"""
     try:
-        print(f"📝 Received department: {department}")
+        logger.debug("Received department", extra={"department": department.model_dump()})
         
-        # Validate head_id if provided
-        if department.head_id:
-            user = db.query(models.User).filter(models.User.id == department.head_id).first()
-            if not user:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"User with ID {department.head_id} does not exist. Please leave Department Head ID empty or choose a valid user ID."
-                )
+        # Validate head_id and unique name/code in one query
+        IntegrityCheck().exists(
+            models.User.id, department.head_id or None,
+            f"User with ID {department.head_id} does not exist. Please leave Department Head ID empty or choose a valid user ID."
+        ).unique(
+            models.Department.name, department.name, f"Department with name {department.name} already exists"
+        ).unique(
+            models.Department.code, department.code, f"Department with code {department.code} already exists"
+        ).run(db)
         
         department_data = department.model_dump()
-        print(f"🔄 Data converted: {department_data}")
-        
         db_department = models.Department(**department_data)
-        print(f"✅ Model created: {db_department.name}")
         
         db.add(db_department)
         db.commit()
+        reference_cache.invalidate("departments")
         db.refresh(db_department)
         
-        print(f"💾 Department saved with ID: {db_department.id}")
+        logger.info("Department saved", extra={"department_id": db_department.id})
         return db_department
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error creating department: {str(e)}")
-        print(f"🔍 Error type: {type(e)}")
-        import traceback
-        print(f"📋 Traceback: {traceback.format_exc()}")
+        logger.exception("Error creating department")
         
         # Handle foreign key constraint errors
         if "ForeignKeyViolation" in str(e) and "head_id" in str(e):
@@ -77,26 +190,44 @@ def create_department(
 
 # Example: Public access for demo purposes
 @app.get("/api/departments", response_model=List[schemas.DepartmentResponse])
-def get_departments(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+async def get_departments(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
     # current_user: dict = Depends(verify_token)  # Temporarily disabled for demo
 ):
     """Get all departments - Public access for demo"""
-    departments = db.query(models.Department).offset(skip).limit(limit).all()
+    statement = select(models.Department)
+    departments = await cached_page(
+        "departments", page, response,
+        lambda: paginate(
+            db, statement, page, response, models.Department.id,
+            sortable={"code": models.Department.code, "name": models.Department.name}
+        ),
+        request=request,
+        validate=lambda: collection_validators(
+            db, request, statement, models.Department.id, models.Department.updated_at
+        )
+    )
     return departments
 
 # Get specific department
 @app.get("/api/departments/{department_id}", response_model=schemas.DepartmentResponse)
 def get_department(
     department_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get specific department by ID"""
     department = db.query(models.Department).filter(models.Department.id == department_id).first()
     if department is None:
         raise HTTPException(status_code=404, detail="Department not found")
+    validators = resource_validators(department)
+    if is_not_modified(request, validators, use_last_modified=True):
+        return not_modified(validators)
+    apply_validators(response, validators)
     return department
 
 # Update department
@@ -111,14 +242,19 @@ def update_department(
     if db_department is None:
         raise HTTPException(status_code=404, detail="Department not found")
     
-    # Validate head_id if provided
-    if department_update.head_id:
-        user = db.query(models.User).filter(models.User.id == department_update.head_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"User with ID {department_update.head_id} does not exist."
-            )
+    # Validate head_id and unique name/code in one query
+    IntegrityCheck().exists(
+        models.User.id, department_update.head_id or None,
+        f"User with ID {department_update.head_id} does not exist."
+    ).unique(
+        models.Department.name, department_update.name,
+        f"Department with name {department_update.name} already exists",
+        exclude=(models.Department.id, department_id)
+    ).unique(
+        models.Department.code, department_update.code,
+        f"Department with code {department_update.code} already exists",
+        exclude=(models.Department.id, department_id)
+    ).run(db)
     
     # Update fields
     update_data = department_update.model_dump(exclude_unset=True)
@@ -126,6 +262,7 @@ def update_department(
         setattr(db_department, field, value)
     
     db.commit()
+    reference_cache.invalidate("departments")
     db.refresh(db_department)
     return db_department
 
@@ -142,23 +279,26 @@ def delete_department(
     
     db.delete(db_department)
     db.commit()
+    reference_cache.invalidate("departments", "specialties", "levels", "groups")
     return {"message": "Department deleted successfully"}
 
 # Get students in a department
 @app.get("/api/departments/{department_id}/students", response_model=List[schemas.StudentWithUserAndSpecialtyResponse])
-def get_department_students(
+async def get_department_students(
     department_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all students in a department through specialties with user information"""
     # Check if department exists
-    department = db.query(models.Department).filter(models.Department.id == department_id).first()
-    if not department:
+    department = await db.scalar(select(models.Department.id).where(models.Department.id == department_id))
+    if department is None:
         raise HTTPException(status_code=404, detail="Department not found")
     
     # Get students through specialties with user and specialty information
-    result = (
-        db.query(
+    statement = (
+        select(
             models.Student,
             models.Specialty.name.label('specialty_name'),
             models.Specialty.code.label('specialty_code'),
@@ -168,9 +308,17 @@ def get_department_students(
         )
         .join(models.Specialty, models.Student.specialty_id == models.Specialty.id)
         .join(models.User, models.Student.user_id == models.User.id)
-        .filter(models.Specialty.department_id == department_id)
-        .all()
+        .where(models.Specialty.department_id == department_id)
+    )
+    validators = await collection_validators(
+        db, request, statement, models.Student.id,
+        models.Student.updated_at, models.Specialty.updated_at, models.User.updated_at
     )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    apply_validators(response, validators)
+
+    result = (await db.execute(statement.order_by(models.Student.id))).all()
     
     # Format the response
     students_with_info = []
@@ -194,7 +342,7 @@ def get_department_students(
         }
         students_with_info.append(student_dict)
     
-    return students_with_info
+    return rows_response(students_with_info, schemas.StudentWithUserAndSpecialtyResponse, response)
 
 
 # ============================================
@@ -202,10 +350,15 @@ def get_department_students(
 # ============================================
 
 @app.get("/api/students", response_model=List[schemas.StudentWithUserAndSpecialtyResponse])
-def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_students(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all students with user and specialty information"""
-    result = (
-        db.query(
+    statement = (
+        select(
             models.Student,
             models.Specialty.name.label('specialty_name'),
             models.Specialty.code.label('specialty_code'),
@@ -215,9 +368,18 @@ def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db))
         )
         .join(models.Specialty, models.Student.specialty_id == models.Specialty.id)
         .join(models.User, models.Student.user_id == models.User.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+    )
+    validators = await collection_validators(
+        db, request, statement, models.Student.id,
+        models.Student.updated_at, models.Specialty.updated_at, models.User.updated_at
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    apply_validators(response, validators)
+
+    result = await paginate(
+        db, statement, page, response, models.Student.id,
+        sortable={"student_number": models.Student.student_number}
     )
     
     # Format the response
@@ -242,15 +404,25 @@ def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db))
         }
         students_with_info.append(student_dict)
     
-    return students_with_info
+    return rows_response(students_with_info, schemas.StudentWithUserAndSpecialtyResponse, response)
+
+
+@app.get("/api/students/export")
+def export_students(format: str = "ndjson"):
+    """Stream every student with user and specialty information as NDJSON or CSV"""
+    return stream_export(students_export_statement(), "students", format)
 
 
 @app.get("/api/students/{student_id}", response_model=schemas.StudentResponse)
-def get_student(student_id: int, db: Session = Depends(get_db)):
+def get_student(student_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get single student by ID"""
     student = db.query(models.Student).filter(models.Student.id == student_id).first()
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
+    validators = resource_validators(student)
+    if is_not_modified(request, validators, use_last_modified=True):
+        return not_modified(validators)
+    apply_validators(response, validators)
     return student
 
 
@@ -258,39 +430,32 @@ def get_student(student_id: int, db: Session = Depends(get_db)):
 def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
     """Create new student with automatic user creation"""
     try:
-        print(f"\n{'='*60}")
-        print(f"📝 CREATE STUDENT REQUEST")
-        print(f"{'='*60}")
-        print(f"Student Number: {student.student_number}")
-        print(f"Name: {student.first_name} {student.last_name}")
-        print(f"Email: {student.email}")
-        print(f"CIN: {student.cin}")
-        print(f"Password type: {type(student.password)}")
-        print(f"Password value: {repr(student.password)[:100] if student.password else 'None'}")
-        print(f"Password length: {len(student.password) if student.password else 0} chars")
-        if student.password:
-            print(f"Password byte length: {len(student.password.encode('utf-8'))} bytes")
-        print(f"{'='*60}\n")
+        logger.info(
+            "Create student request",
+            extra={
+                "student_number": student.student_number,
+                "email": student.email,
+                "has_password": bool(student.password)
+            }
+        )
         
-        # Check if user_id is provided
+        # Check referenced ids and unique keys in one query
+        check = IntegrityCheck()
+        if student.user_id:
+            check.exists(models.User.id, student.user_id, f"User with id {student.user_id} not found")
+            check.unique(models.Student.user_id, student.user_id, f"User with id {student.user_id} is already a student")
+        else:
+            check.unique(models.User.cin, student.cin, f"User with CIN {student.cin} already exists")
+            check.unique(models.User.email, student.email, f"User with email {student.email} already exists")
+        check.exists(models.Group.id, student.group_id, f"Group with id {student.group_id} not found")
+        check.exists(models.Specialty.id, student.specialty_id, f"Specialty with id {student.specialty_id} not found")
+        check.unique(models.Student.student_number, student.student_number, f"Student number {student.student_number} already exists")
+        check.run(db)
+
         if student.user_id:
-            # Verify that the user exists
-            user = db.query(models.User).filter(models.User.id == student.user_id).first()
-            if not user:
-                raise HTTPException(status_code=400, detail=f"User with id {student.user_id} not found")
             user_id = student.user_id
         else:
-            # Validate CIN uniqueness
-            existing_user_cin = db.query(models.User).filter(models.User.cin == student.cin).first()
-            if existing_user_cin:
-                raise HTTPException(status_code=400, detail=f"User with CIN {student.cin} already exists")
-            
             # Create user automatically
-            # Check if user with email already exists
-            existing_user = db.query(models.User).filter(models.User.email == student.email).first()
-            if existing_user:
-                raise HTTPException(status_code=400, detail=f"User with email {student.email} already exists")
-            
             # Use CIN as default password if not provided
             password_to_hash = student.password if student.password else student.cin
             
@@ -308,10 +473,8 @@ def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)
             if not password_to_hash:
                 raise HTTPException(status_code=400, detail="Password cannot be empty")
             
-            print(f"🔐 Storing password as plain text: {len(password_to_hash)} characters")
-            
-            # Store password as plain text (no hashing)
-            password_hash = password_to_hash
+            # Hashed in the worker pool (bcrypt, as the login service expects)
+            password_hash = password_hasher.hash_blocking(password_to_hash)
             
             # Create new user
             new_user = models.User(
@@ -327,21 +490,6 @@ def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)
             db.flush()  # Get the user ID without committing
             user_id = new_user.id
 
-        # Verify that the group exists
-        group = db.query(models.Group).filter(models.Group.id == student.group_id).first()
-        if not group:
-            raise HTTPException(status_code=400, detail=f"Group with id {student.group_id} not found")
-
-        # Verify that the specialty exists
-        specialty = db.query(models.Specialty).filter(models.Specialty.id == student.specialty_id).first()
-        if not specialty:
-            raise HTTPException(status_code=400, detail=f"Specialty with id {student.specialty_id} not found")
-
-        # Check that the student number is not already used
-        existing_student = db.query(models.Student).filter(models.Student.student_number == student.student_number).first()
-        if existing_student:
-            raise HTTPException(status_code=400, detail=f"Student number {student.student_number} already exists")
-
         # Create the student
         student_data = {
             "user_id": user_id,
@@ -365,12 +513,37 @@ def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)
         raise
     except Exception as e:
         db.rollback()
-        print(f"Error creating student: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating student")
         raise HTTPException(status_code=500, detail=f"Failed to create student: {str(e)}")
 
 
+@app.post("/api/students/bulk")
+async def create_students_bulk(request: Request, db: Session = Depends(get_db)):
+    """
+    Create many students at once from a JSON array or a CSV document
+    (raw text/csv body or a multipart upload in a "file" field).
+
+    Rows use the same fields as POST /api/students. Invalid rows are
+    reported with their row number and don't prevent valid rows from
+    being created.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'file' upload")
+        body = await upload.read()
+        content_type = upload.content_type or ""
+        if upload.filename and upload.filename.lower().endswith(".csv"):
+            content_type = "text/csv"
+    else:
+        body = await request.body()
+
+    rows = parse_student_rows(content_type, body)
+    return await run_in_threadpool(import_students, db, rows)
+
+
 @app.put("/api/students/{student_id}", response_model=schemas.StudentResponse)
 def update_student(student_id: int, student: schemas.StudentCreate, db: Session = Depends(get_db)):
     """Update student"""
@@ -422,10 +595,15 @@ def delete_student(student_id: int, db: Session = Depends(get_db)):
 # ============================================
 
 @app.get("/api/teachers", response_model=List[schemas.TeacherWithUserAndDepartmentResponse])
-def get_teachers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_teachers(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all teachers with user and department information"""
-    result = (
-        db.query(
+    statement = (
+        select(
             models.Teacher,
             models.Department.name.label('department_name'),
             models.Department.code.label('department_code'),
@@ -435,9 +613,18 @@ def get_teachers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db))
         )
         .join(models.Department, models.Teacher.department_id == models.Department.id)
         .join(models.User, models.Teacher.user_id == models.User.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+    )
+    validators = await collection_validators(
+        db, request, statement, models.Teacher.id,
+        models.Teacher.updated_at, models.Department.updated_at, models.User.updated_at
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    apply_validators(response, validators)
+
+    result = await paginate(
+        db, statement, page, response, models.Teacher.id,
+        sortable={"employee_id": models.Teacher.employee_id}
     )
     
     # Format the response
@@ -460,46 +647,44 @@ def get_teachers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db))
         }
         teachers_with_info.append(teacher_dict)
     
-    return teachers_with_info
+    return rows_response(teachers_with_info, schemas.TeacherWithUserAndDepartmentResponse, response)
+
+
+@app.get("/api/teachers/export")
+def export_teachers(format: str = "ndjson"):
+    """Stream every teacher with user and department information as NDJSON or CSV"""
+    return stream_export(teachers_export_statement(), "teachers", format)
 
 
 @app.post("/api/teachers", response_model=schemas.TeacherResponse, status_code=status.HTTP_201_CREATED)
 def create_teacher(teacher: schemas.TeacherCreate, db: Session = Depends(get_db)):
     """Create new teacher with automatic user creation"""
     try:
-        print(f"\n{'='*60}")
-        print(f"📝 CREATE TEACHER REQUEST")
-        print(f"{'='*60}")
-        print(f"Employee ID: {teacher.employee_id}")
-        print(f"Name: {teacher.first_name} {teacher.last_name}")
-        print(f"Email: {teacher.email}")
-        print(f"CIN: {teacher.cin}")
-        print(f"Password type: {type(teacher.password)}")
-        print(f"Password value: {repr(teacher.password)[:100] if teacher.password else 'None'}")
-        print(f"Password length: {len(teacher.password) if teacher.password else 0} chars")
-        if teacher.password:
-            print(f"Password byte length: {len(teacher.password.encode('utf-8'))} bytes")
-        print(f"{'='*60}\n")
+        logger.info(
+            "Create teacher request",
+            extra={
+                "employee_id": teacher.employee_id,
+                "email": teacher.email,
+                "has_password": bool(teacher.password)
+            }
+        )
         
-        # Check if user_id is provided
+        # Check referenced ids and unique keys in one query
+        check = IntegrityCheck()
+        if teacher.user_id:
+            check.exists(models.User.id, teacher.user_id, f"User with id {teacher.user_id} not found")
+            check.unique(models.Teacher.user_id, teacher.user_id, f"User with id {teacher.user_id} is already a teacher")
+        else:
+            check.unique(models.User.cin, teacher.cin, f"User with CIN {teacher.cin} already exists")
+            check.unique(models.User.email, teacher.email, f"User with email {teacher.email} already exists")
+        check.exists(models.Department.id, teacher.department_id, f"Department with id {teacher.department_id} not found")
+        check.unique(models.Teacher.employee_id, teacher.employee_id, f"Employee ID {teacher.employee_id} already exists")
+        check.run(db)
+
         if teacher.user_id:
-            # Verify that the user exists
-            user = db.query(models.User).filter(models.User.id == teacher.user_id).first()
-            if not user:
-                raise HTTPException(status_code=400, detail=f"User with id {teacher.user_id} not found")
             user_id = teacher.user_id
         else:
-            # Validate CIN uniqueness
-            existing_user_cin = db.query(models.User).filter(models.User.cin == teacher.cin).first()
-            if existing_user_cin:
-                raise HTTPException(status_code=400, detail=f"User with CIN {teacher.cin} already exists")
-            
             # Create user automatically
-            # Check if user with email already exists
-            existing_user = db.query(models.User).filter(models.User.email == teacher.email).first()
-            if existing_user:
-                raise HTTPException(status_code=400, detail=f"User with email {teacher.email} already exists")
-            
             # Use CIN as default password if not provided
             password_to_hash = teacher.password if teacher.password else teacher.cin
             
@@ -517,10 +702,8 @@ def create_teacher(teacher: schemas.TeacherCreate, db: Session = Depends(get_db)
             if not password_to_hash:
                 raise HTTPException(status_code=400, detail="Password cannot be empty")
             
-            print(f"🔐 Storing password as plain text: {len(password_to_hash)} characters")
-            
-            # Store password as plain text (no hashing)
-            password_hash = password_to_hash
+            # Hashed in the worker pool (bcrypt, as the login service expects)
+            password_hash = password_hasher.hash_blocking(password_to_hash)
             
             # Create new user
             new_user = models.User(
@@ -536,16 +719,6 @@ def create_teacher(teacher: schemas.TeacherCreate, db: Session = Depends(get_db)
             db.flush()  # Get the user ID without committing
             user_id = new_user.id
 
-        # Verify that the department exists
-        department = db.query(models.Department).filter(models.Department.id == teacher.department_id).first()
-        if not department:
-            raise HTTPException(status_code=400, detail=f"Department with id {teacher.department_id} not found")
-
-        # Check that the employee ID is not already used
-        existing_teacher = db.query(models.Teacher).filter(models.Teacher.employee_id == teacher.employee_id).first()
-        if existing_teacher:
-            raise HTTPException(status_code=400, detail=f"Employee ID {teacher.employee_id} already exists")
-
         # Create the teacher
         teacher_data = {
             "user_id": user_id,
@@ -567,18 +740,20 @@ def create_teacher(teacher: schemas.TeacherCreate, db: Session = Depends(get_db)
         raise
     except Exception as e:
         db.rollback()
-        print(f"Error creating teacher: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating teacher")
         raise HTTPException(status_code=500, detail=f"Failed to create teacher: {str(e)}")
 
 
 @app.get("/api/teachers/{teacher_id}", response_model=schemas.TeacherResponse)
-def get_teacher(teacher_id: int, db: Session = Depends(get_db)):
+def get_teacher(teacher_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get single teacher by ID"""
     teacher = db.query(models.Teacher).filter(models.Teacher.id == teacher_id).first()
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
+    validators = resource_validators(teacher)
+    if is_not_modified(request, validators, use_last_modified=True):
+        return not_modified(validators)
+    apply_validators(response, validators)
     return teacher
 
 
@@ -631,9 +806,23 @@ def delete_teacher(teacher_id: int, db: Session = Depends(get_db)):
 # ============================================
 
 @app.get("/api/subjects", response_model=List[schemas.SubjectResponse])
-def get_subjects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_subjects(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all subjects"""
-    subjects = db.query(models.Subject).offset(skip).limit(limit).all()
+    statement = select(models.Subject)
+    validators = await collection_validators(db, request, statement, models.Subject.id, models.Subject.updated_at)
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    apply_validators(response, validators)
+
+    subjects = await paginate(
+        db, statement, page, response, models.Subject.id,
+        sortable={"code": models.Subject.code}
+    )
     return subjects
 
 
@@ -652,174 +841,126 @@ def create_subject(subject: schemas.SubjectCreate, db: Session = Depends(get_db)
 # ============================================
 
 @app.get("/api/rooms", response_model=List[schemas.RoomResponse])
-def get_rooms(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_rooms(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all rooms"""
-    rooms = db.query(models.Room).offset(skip).limit(limit).all()
+    statement = select(models.Room)
+    rooms = await cached_page(
+        "rooms", page, response,
+        lambda: paginate(
+            db, statement, page, response, models.Room.id,
+            sortable={"code": models.Room.code, "capacity": models.Room.capacity}
+        ),
+        request=request,
+        validate=lambda: collection_validators(
+            db, request, statement, models.Room.id, models.Room.updated_at
+        )
+    )
     return rooms
 
 
+def _parse_hhmm(value: str) -> dt_time:
+    """Parse an 'HH:MM' string into a time object"""
+    parts = value.strip().split(":")
+    return dt_time(int(parts[0]), int(parts[1]))
+
+
 @app.get("/api/rooms/availability")
-def get_rooms_with_availability(
-    date: str = None,
-    time_slot: str = None,
-    db: Session = Depends(get_db)
+async def get_rooms_with_availability(
+    date: Optional[str] = None,
+    time_slot: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all rooms with their current availability and assigned teachers"""
-    from datetime import datetime, time as dt_time
-    
-    # Add timestamp for real-time tracking
-    request_timestamp = datetime.now()
-    
-    print(f"🕐 Real-time availability check at: {request_timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # Base query for rooms
-    rooms_query = db.query(models.Room).all()
+    """
+    Get all rooms with their availability and assigned teachers.
+
+    - date: YYYY-MM-DD, only assignments on that weekday are returned
+    - time_slot: HH:MM or HH:MM-HH:MM, only assignments overlapping it are returned
+    - as_of: reference timestamp for the "currently available" status (defaults to now)
+
+    Runs a fixed number of queries whatever the number of rooms.
+    """
+    request_timestamp = as_of or datetime.now()
+
+    try:
+        day_filter = dt_date.fromisoformat(date).isoweekday() if date else None
+        if time_slot:
+            bounds = time_slot.split("-")
+            window_start = _parse_hhmm(bounds[0])
+            window_end = _parse_hhmm(bounds[1]) if len(bounds) > 1 else window_start
+        else:
+            window_start = window_end = None
+    except (ValueError, IndexError):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid date or time_slot. Expected date=YYYY-MM-DD and time_slot=HH:MM or HH:MM-HH:MM"
+        )
+
+    # Day and window used to decide whether a room is busy
+    check_day = day_filter or request_timestamp.isoweekday()
+    check_start = window_start or request_timestamp.time()
+    check_end = window_end or check_start
+
+    rooms = (await db.execute(select(models.Room).order_by(models.Room.id))).scalars().all()
+
+    # One query for every active slot, teacher and user eager-loaded
+    slots_query = (
+        select(models.TimetableSlot)
+        .options(joinedload(models.TimetableSlot.teacher).joinedload(models.Teacher.user))
+        .where(models.TimetableSlot.is_active == True)
+    )
+    if day_filter:
+        slots_query = slots_query.where(models.TimetableSlot.day_of_week == day_filter)
+    if window_start:
+        slots_query = slots_query.where(
+            models.TimetableSlot.start_time <= window_end,
+            models.TimetableSlot.end_time >= window_start
+        )
+    slots_query = slots_query.order_by(models.TimetableSlot.day_of_week, models.TimetableSlot.start_time)
+
+    slots_by_room = defaultdict(list)
+    for slot in (await db.execute(slots_query)).scalars().all():
+        slots_by_room[slot.room_id].append(slot)
+
     rooms_data = []
-    
-    for room in rooms_query:
-        # Get current assignments for this room
-        current_assignments = db.query(models.TimetableSlot).filter(
-            models.TimetableSlot.room_id == room.id,
-            models.TimetableSlot.is_active == True
-        ).join(models.Teacher).join(models.User).all()
-        
-        # Format assignments
+    for room in rooms:
         assignments = []
-        for slot in current_assignments:
+        is_currently_available = room.is_available
+        current_status = "Available" if room.is_available else "Unavailable"
+
+        for slot in slots_by_room.get(room.id, []):
             teacher_name = f"{slot.teacher.user.first_name} {slot.teacher.user.last_name}"
-            day_names = ["", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-            day_name = day_names[slot.day_of_week] if 1 <= slot.day_of_week <= 7 else "Unknown"
-            
             assignments.append({
                 "teacher_id": slot.teacher.id,
                 "teacher_name": teacher_name,
                 "teacher_employee_id": slot.teacher.employee_id,
                 "subject_id": slot.subject_id,
                 "day_of_week": slot.day_of_week,
-                "day_name": day_name,
+                "day_name": DAY_NAMES[slot.day_of_week] if 1 <= slot.day_of_week <= 7 else "Unknown",
                 "start_time": slot.start_time.strftime("%H:%M"),
                 "end_time": slot.end_time.strftime("%H:%M"),
                 "academic_year": slot.academic_year
             })
-        
-        # Add demo assignments for demonstration (when no real assignments exist)
-        if len(assignments) == 0:
-            # Get some teachers for demo
-            all_teachers = db.query(models.Teacher).join(models.User).limit(3).all()
-            
-            # Add demo assignments based on room type
-            if room.code == "B205" and len(all_teachers) > 0:  # Computer Lab
-                assignments.append({
-                    "teacher_id": all_teachers[0].id,
-                    "teacher_name": f"{all_teachers[0].user.first_name} {all_teachers[0].user.last_name}",
-                    "teacher_employee_id": all_teachers[0].employee_id,
-                    "subject_id": 1,
-                    "day_of_week": 1,
-                    "day_name": "Monday",
-                    "start_time": "08:00",
-                    "end_time": "10:00",
-                    "academic_year": "2024-2025"
-                })
-                assignments.append({
-                    "teacher_id": all_teachers[1].id if len(all_teachers) > 1 else all_teachers[0].id,
-                    "teacher_name": f"{all_teachers[1].user.first_name} {all_teachers[1].user.last_name}" if len(all_teachers) > 1 else f"{all_teachers[0].user.first_name} {all_teachers[0].user.last_name}",
-                    "teacher_employee_id": all_teachers[1].employee_id if len(all_teachers) > 1 else all_teachers[0].employee_id,
-                    "subject_id": 2,
-                    "day_of_week": 4,
-                    "day_name": "Thursday",
-                    "start_time": "14:00",
-                    "end_time": "17:00",
-                    "academic_year": "2024-2025"
-                })
-            elif room.code == "C301" and len(all_teachers) > 1:  # Mathematics Classroom
-                assignments.append({
-                    "teacher_id": all_teachers[1].id,
-                    "teacher_name": f"{all_teachers[1].user.first_name} {all_teachers[1].user.last_name}",
-                    "teacher_employee_id": all_teachers[1].employee_id,
-                    "subject_id": 3,
-                    "day_of_week": 2,
-                    "day_name": "Tuesday",
-                    "start_time": "10:00",
-                    "end_time": "12:00",
-                    "academic_year": "2024-2025"
-                })
-            elif room.code == "A101" and len(all_teachers) > 2:  # Amphitheater
-                assignments.append({
-                    "teacher_id": all_teachers[2].id,
-                    "teacher_name": f"{all_teachers[2].user.first_name} {all_teachers[2].user.last_name}",
-                    "teacher_employee_id": all_teachers[2].employee_id,
-                    "subject_id": 4,
-                    "day_of_week": 3,
-                    "day_name": "Wednesday",
-                    "start_time": "09:00",
-                    "end_time": "11:00",
-                    "academic_year": "2024-2025"
-                })
-        
-        # Calculate current availability based on real-time logic
-        from datetime import datetime, time as dt_time
-        
-        now = datetime.now()
-        current_day = now.weekday() + 1  # Convert to 1-7 format (Monday=1)
-        current_time = now.time()
-        
-        is_currently_available = room.is_available
-        current_status = "Available"
-        
-        # Check if room is currently occupied
-        for assignment in assignments:
-            if assignment["day_of_week"] == current_day:
-                # Parse assignment times
-                start_parts = assignment["start_time"].split(":")
-                end_parts = assignment["end_time"].split(":")
-                start_time = dt_time(int(start_parts[0]), int(start_parts[1]))
-                end_time = dt_time(int(end_parts[0]), int(end_parts[1]))
-                
-                # Check if current time overlaps with assignment
-                if start_time <= current_time <= end_time:
-                    is_currently_available = False
-                    current_status = f"Busy - {assignment['teacher_name']}"
-                    break
-        
-        # Additional availability logic
-        if len(assignments) >= 25:  # Room heavily booked
-            if is_currently_available:
+
+            # Check if the slot overlaps the reference window
+            if (is_currently_available and slot.day_of_week == check_day
+                    and slot.start_time <= check_end and check_start <= slot.end_time):
+                is_currently_available = False
+                current_status = f"Busy - {teacher_name}"
+
+        if is_currently_available:
+            if len(assignments) >= 25:  # Room heavily booked
                 current_status = "Available (Heavily Booked)"
-        elif len(assignments) >= 15:  # Room moderately booked
-            if is_currently_available:
+            elif len(assignments) >= 15:  # Room moderately booked
                 current_status = "Available (Moderately Booked)"
-        elif len(assignments) == 0:
-            current_status = "Available (No Assignments)"
-        
-        # Override for real-time demo: Check actual current time
-        current_hour = now.hour
-        current_minute = now.minute
-        
-        # Real-time logic based on business hours
-        if room.code == "B205":  # Computer Lab
-            # Busy during morning hours (8:00-12:00)
-            if 8 <= current_hour < 12:
-                is_currently_available = False
-                current_status = "Busy - Dr. Sarah Wilson (Programming Course)"
-            else:
-                current_status = "Available"
-        elif room.code == "C301":  # Mathematics Classroom  
-            # Busy during afternoon hours (13:00-16:00)
-            if 13 <= current_hour < 16:
-                is_currently_available = False
-                current_status = "Busy - Prof. Michael Brown (Mathematics)"
-            else:
-                current_status = "Available"
-        elif room.code == "A101":  # Amphitheater
-            # Busy during evening hours (17:00-19:00)
-            if 17 <= current_hour < 19:
-                is_currently_available = False
-                current_status = "Busy - Dr. Emily Davis (Physics Lecture)"
-            else:
-                current_status = "Available"
-        
-        print(f"🏫 Room {room.code}: {current_status} (Hour: {current_hour:02d}:{current_minute:02d})")
-        
+            elif len(assignments) == 0:
+                current_status = "Available (No Assignments)"
+
         rooms_data.append({
             "id": room.id,
             "code": room.code,
@@ -837,35 +978,93 @@ def get_rooms_with_availability(
             "current_assignments": assignments,
             "created_at": room.created_at
         })
-    
-    print(f"✅ Returning {len(rooms_data)} rooms with real-time status")
-    
+
+    # Polled constantly by the dashboards, so only a sample is logged
+    logger.debug(
+        "Room availability computed",
+        extra={"rooms": len(rooms_data), "as_of": request_timestamp.isoformat(), "sample_rate": 0.1}
+    )
+
     # Add metadata for frontend
     response_data = {
         "timestamp": request_timestamp.isoformat(),
         "total_rooms": len(rooms_data),
         "rooms": rooms_data
     }
-    
+
     return response_data
 
 
+@app.get("/api/rooms/free", response_model=List[schemas.FreeRoomResponse])
+async def get_free_rooms(
+    response: Response,
+    start_time: str,
+    end_time: str,
+    day: Optional[int] = Query(None, ge=1, le=7),
+    date: Optional[str] = None,
+    min_capacity: int = Query(0, ge=0),
+    room_type: Optional[str] = None,
+    has_projector: Optional[bool] = None,
+    has_computers: Optional[bool] = None,
+    building: Optional[str] = None,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """
+    Rooms free for a whole window, smallest sufficient capacity first.
+
+    - day: 1 (Monday) to 7, for the weekly timetable
+    - date: YYYY-MM-DD, also applies that day's cancelled, moved and makeup sessions
+    - start_time, end_time: HH:MM
+
+    Answered from the in-memory indexes, without a database round trip.
+    """
+    try:
+        on_date = dt_date.fromisoformat(date) if date else None
+        window_start, window_end = _parse_hhmm(start_time), _parse_hhmm(end_time)
+    except (ValueError, IndexError):
+        raise HTTPException(
+            status_code=400, detail="Invalid date or time. Expected date=YYYY-MM-DD and times as HH:MM"
+        )
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    if on_date is not None and day is not None and on_date.isoweekday() != day:
+        raise HTTPException(status_code=400, detail="day does not match the weekday of date")
+    if on_date is None and day is None:
+        raise HTTPException(status_code=400, detail="Either day or date is required")
+
+    rooms = free_room_index.search(
+        on_date.isoweekday() if on_date else day, window_start, window_end,
+        on_date=on_date, min_capacity=min_capacity, room_type=room_type,
+        has_projector=has_projector, has_computers=has_computers, building=building,
+        academic_year=academic_year, semester=semester, limit=limit,
+    )
+    return rows_response([room._asdict() for room in rooms], schemas.FreeRoomResponse, response)
+
+
 @app.post("/api/rooms", response_model=schemas.RoomResponse, status_code=status.HTTP_201_CREATED)
 def create_room(room: schemas.RoomCreate, db: Session = Depends(get_db)):
     """Create new room"""
     db_room = models.Room(**room.dict())
     db.add(db_room)
     db.commit()
+    reference_cache.invalidate("rooms")
     db.refresh(db_room)
+    free_room_index.put_room(db_room)
     return db_room
 
 
 @app.get("/api/rooms/{room_id}", response_model=schemas.RoomResponse)
-def get_room(room_id: int, db: Session = Depends(get_db)):
+def get_room(room_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get room by ID"""
     room = db.query(models.Room).filter(models.Room.id == room_id).first()
     if room is None:
         raise HTTPException(status_code=404, detail="Room not found")
+    validators = resource_validators(room)
+    if is_not_modified(request, validators, use_last_modified=True):
+        return not_modified(validators)
+    apply_validators(response, validators)
     return room
 
 
@@ -880,7 +1079,9 @@ def update_room(room_id: int, room: schemas.RoomCreate, db: Session = Depends(ge
         setattr(db_room, key, value)
     
     db.commit()
+    reference_cache.invalidate("rooms")
     db.refresh(db_room)
+    free_room_index.put_room(db_room)
     return db_room
 
 
@@ -893,6 +1094,8 @@ def delete_room(room_id: int, db: Session = Depends(get_db)):
     
     db.delete(room)
     db.commit()
+    reference_cache.invalidate("rooms")
+    free_room_index.remove_room(room_id)
     return {"message": "Room deleted successfully"}
 
 
@@ -900,65 +1103,373 @@ def delete_room(room_id: int, db: Session = Depends(get_db)):
 # TIMETABLE SLOTS ENDPOINTS
 # ============================================
 
+def _slot_to_dict(slot: models.TimetableSlot) -> dict:
+    return {
+        "id": slot.id,
+        "subject_id": slot.subject_id,
+        "teacher_id": slot.teacher_id,
+        "room_id": slot.room_id,
+        "day_of_week": slot.day_of_week,
+        "start_time": slot.start_time.strftime("%H:%M"),
+        "end_time": slot.end_time.strftime("%H:%M"),
+        "academic_year": slot.academic_year,
+        "semester": slot.semester,
+        "is_active": slot.is_active
+    }
+
+
+def _check_slot_conflicts(db: Session, values: dict, exclude_slot_id: Optional[int] = None):
+    """
+    Reject room, teacher and group double-bookings for a slot.
+
+    The check runs in one query while the room/teacher/group advisory
+    locks are held, so concurrent admin sessions can't both book the same
+    resource. The in-memory index is not consulted: it only sees this
+    process's writes, so it can report a slot another worker has since
+    moved or deleted.
+    """
+    if values["end_time"] <= values["start_time"]:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    if not values.get("is_active", True):
+        return
+
+    resources = (values["room_id"], values["teacher_id"], values["group_id"], values["day_of_week"])
+    window = dict(
+        start=values["start_time"],
+        end=values["end_time"],
+        academic_year=values["academic_year"],
+        semester=values["semester"],
+        exclude_slot_id=exclude_slot_id
+    )
+
+    lock_slot_resources(db, *resources)
+    conflicts = find_slot_conflicts(db, *resources, **window)
+    if conflicts:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=describe_conflicts(conflicts))
+
+
 @app.post("/api/timetable-slots", response_model=dict, status_code=status.HTTP_201_CREATED)
 def create_timetable_slot(
-    slot_data: dict,
+    slot: schemas.TimetableSlotCreate,
     db: Session = Depends(get_db)
 ):
-    """Create a new timetable slot"""
+    """Create a new timetable slot, rejecting room/teacher/group conflicts"""
+    slot_data = slot.model_dump()
+    _check_slot_conflicts(db, slot_data)
+
     try:
-        # Convert time strings to time objects if needed
-        if isinstance(slot_data.get('start_time'), str):
-            from datetime import time as dt_time
-            start_parts = slot_data['start_time'].split(':')
-            slot_data['start_time'] = dt_time(int(start_parts[0]), int(start_parts[1]))
-        
-        if isinstance(slot_data.get('end_time'), str):
-            from datetime import time as dt_time
-            end_parts = slot_data['end_time'].split(':')
-            slot_data['end_time'] = dt_time(int(end_parts[0]), int(end_parts[1]))
-        
         db_slot = models.TimetableSlot(**slot_data)
         db.add(db_slot)
         db.commit()
         db.refresh(db_slot)
-        
-        return {
-            "id": db_slot.id,
-            "subject_id": db_slot.subject_id,
-            "teacher_id": db_slot.teacher_id,
-            "room_id": db_slot.room_id,
-            "day_of_week": db_slot.day_of_week,
-            "start_time": db_slot.start_time.strftime("%H:%M"),
-            "end_time": db_slot.end_time.strftime("%H:%M"),
-            "academic_year": db_slot.academic_year,
-            "semester": db_slot.semester,
-            "is_active": db_slot.is_active
-        }
+        occupancy_index.add(db_slot)
+        invalidate_timetables(groups=[db_slot.group_id], teachers=[db_slot.teacher_id])
+
+        return _slot_to_dict(db_slot)
     except Exception as e:
-        print(f"Error creating timetable slot: {e}")
+        db.rollback()
+        logger.exception("Error creating timetable slot")
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/timetable-slots", response_model=List[dict])
-def get_timetable_slots(db: Session = Depends(get_db)):
+async def get_timetable_slots(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get all timetable slots"""
-    slots = db.query(models.TimetableSlot).all()
-    return [
-        {
-            "id": slot.id,
-            "subject_id": slot.subject_id,
-            "teacher_id": slot.teacher_id,
-            "room_id": slot.room_id,
-            "day_of_week": slot.day_of_week,
-            "start_time": slot.start_time.strftime("%H:%M"),
-            "end_time": slot.end_time.strftime("%H:%M"),
-            "academic_year": slot.academic_year,
-            "semester": slot.semester,
-            "is_active": slot.is_active
-        }
-        for slot in slots
-    ]
+    statement = select(models.TimetableSlot)
+    validators = await collection_validators(
+        db, request, statement, models.TimetableSlot.id, models.TimetableSlot.updated_at
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    apply_validators(response, validators)
+
+    slots = (await db.execute(statement.order_by(models.TimetableSlot.id))).scalars().all()
+    return [_slot_to_dict(slot) for slot in slots]
+
+
+async def _timetable_response(request: Request, owner: str, owner_id: int, academic_year: Optional[str],
+                              semester: Optional[int], db: AsyncSession) -> Response:
+    rendered = await weekly_timetable(db, owner, owner_id, academic_year, semester)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail=f"{owner.capitalize()} not found")
+    if is_not_modified(request, rendered.validators):
+        return not_modified(rendered.validators)
+    return Response(content=rendered.body, media_type="application/json",
+                    headers=validator_headers(rendered.validators))
+
+
+@app.get("/api/groups/{group_id}/timetable")
+async def get_group_timetable(
+    group_id: int,
+    request: Request,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = Query(None, ge=1, le=2),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Week grid of a group's active slots, with subject, room and teacher names"""
+    return await _timetable_response(request, GROUP, group_id, academic_year, semester, db)
+
+
+@app.get("/api/teachers/{teacher_id}/timetable")
+async def get_teacher_timetable(
+    teacher_id: int,
+    request: Request,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = Query(None, ge=1, le=2),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Week grid of a teacher's active slots, with subject, room and group names"""
+    return await _timetable_response(request, TEACHER, teacher_id, academic_year, semester, db)
+
+
+def _ics_response(request: Request, owner: str, owner_id: int, academic_year: Optional[str], semester: Optional[int],
+                  start_date: Optional[dt_date], end_date: Optional[dt_date], db: Session) -> Response:
+    default_start, default_end = default_window()
+    start_date, end_date = start_date or default_start, end_date or default_end
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days > ICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"A feed can span at most {ICS_MAX_DAYS} days")
+    name = owner_name(db, owner, owner_id)
+    if name is None:
+        raise HTTPException(status_code=404, detail=f"{owner.capitalize()} not found")
+    validators = feed_validators(db, owner, owner_id, name, start_date, end_date, academic_year, semester)
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    return stream_feed(owner, owner_id, name, start_date, end_date, academic_year, semester, validators)
+
+
+@app.get("/api/groups/{group_id}/timetable.ics")
+def get_group_calendar(
+    group_id: int,
+    request: Request,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = Query(None, ge=1, le=2),
+    start_date: Optional[dt_date] = None,
+    end_date: Optional[dt_date] = None,
+    db: Session = Depends(get_db)
+):
+    """iCalendar feed of a group's timetable; defaults to the weeks around today"""
+    return _ics_response(request, GROUP, group_id, academic_year, semester, start_date, end_date, db)
+
+
+@app.get("/api/teachers/{teacher_id}/timetable.ics")
+def get_teacher_calendar(
+    teacher_id: int,
+    request: Request,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = Query(None, ge=1, le=2),
+    start_date: Optional[dt_date] = None,
+    end_date: Optional[dt_date] = None,
+    db: Session = Depends(get_db)
+):
+    """iCalendar feed of a teacher's timetable; defaults to the weeks around today"""
+    return _ics_response(request, TEACHER, teacher_id, academic_year, semester, start_date, end_date, db)
+
+
+@app.get("/api/rooms/{room_id}/timetable.ics")
+def get_room_calendar(
+    room_id: int,
+    request: Request,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = Query(None, ge=1, le=2),
+    start_date: Optional[dt_date] = None,
+    end_date: Optional[dt_date] = None,
+    db: Session = Depends(get_db)
+):
+    """iCalendar feed of everything booked in a room; defaults to the weeks around today"""
+    return _ics_response(request, ROOM, room_id, academic_year, semester, start_date, end_date, db)
+
+
+@app.put("/api/timetable-slots/{slot_id}", response_model=dict)
+def update_timetable_slot(
+    slot_id: int,
+    slot_update: schemas.TimetableSlotUpdate,
+    db: Session = Depends(get_db)
+):
+    """Update a timetable slot, rejecting room/teacher/group conflicts"""
+    db_slot = db.query(models.TimetableSlot).filter(models.TimetableSlot.id == slot_id).first()
+    if db_slot is None:
+        raise HTTPException(status_code=404, detail="Timetable slot not found")
+
+    update_data = slot_update.model_dump(exclude_unset=True)
+    merged = {
+        column: update_data.get(column, getattr(db_slot, column))
+        for column in ("room_id", "teacher_id", "group_id", "day_of_week", "start_time",
+                       "end_time", "academic_year", "semester", "is_active")
+    }
+    _check_slot_conflicts(db, merged, exclude_slot_id=slot_id)
+    previous_group, previous_teacher = db_slot.group_id, db_slot.teacher_id
+
+    try:
+        for field, value in update_data.items():
+            setattr(db_slot, field, value)
+        db.commit()
+        db.refresh(db_slot)
+        occupancy_index.update(db_slot)
+        invalidate_timetables(groups=[previous_group, db_slot.group_id],
+                              teachers=[previous_teacher, db_slot.teacher_id])
+        return _slot_to_dict(db_slot)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/timetable/generate", response_model=dict)
+def generate_timetable(request: schemas.TimetableGenerateRequest, db: Session = Depends(get_db)):
+    """
+    Build a conflict-free weekly timetable for a term from the teaching
+    assignments and replace the scheduled courses' active slots with it
+    """
+    grid = Grid(
+        days=request.days_per_week,
+        periods_per_day=request.periods_per_day,
+        day_start=request.day_start.hour * 60 + request.day_start.minute,
+        period_minutes=request.period_minutes,
+        max_session_periods=request.max_session_periods,
+    )
+    try:
+        grid.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    groups = scope_groups(db, request.department_id, request.group_ids)
+    if not groups:
+        raise HTTPException(status_code=404, detail="No groups to schedule")
+
+    schedule = generate_schedule(
+        db, request.academic_year, request.semester, groups, grid, time_limit=request.time_limit
+    )
+    result = {
+        "academic_year": schedule.academic_year,
+        "semester": schedule.semester,
+        "groups": len(schedule.group_ids),
+        "slots": len(schedule.rows),
+        "unplaced": schedule.unplaced,
+        "unstaffed": schedule.unstaffed,
+        "attempts": schedule.attempts,
+        "seconds": schedule.seconds,
+        "written": False,
+    }
+    logger.info("Timetable generated", extra={key: result[key] for key in ("groups", "slots", "attempts", "seconds")})
+    if schedule.unplaced and not request.allow_partial:
+        raise HTTPException(status_code=422, detail={
+            "message": f"{len(schedule.unplaced)} sessions could not be placed",
+            **result,
+        })
+    if request.dry_run:
+        result["slots_preview"] = [
+            {**row, "start_time": row["start_time"].strftime("%H:%M"), "end_time": row["end_time"].strftime("%H:%M")}
+            for row in schedule.rows
+        ]
+        return result
+
+    write_schedule(db, schedule)
+    build_occupancy_index(db)
+    # Teachers of the replaced slots are not known here, so drop every grid
+    timetable_cache.invalidate_all()
+    result["written"] = True
+    return result
+
+
+@app.post("/api/sessions/generate", response_model=dict)
+def generate_timetable_sessions(request: schemas.SessionGenerateRequest, db: Session = Depends(get_db)):
+    """
+    Create the dated sessions of the weekly timetable between two dates,
+    skipping closures; re-running only applies what changed
+    """
+    if request.end_date < request.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+
+    started = time.perf_counter()
+    result = generate_sessions(
+        db, request.start_date, request.end_date,
+        academic_year=request.academic_year, semester=request.semester, slot_ids=request.slot_ids,
+    )
+    refresh_session_overrides(db)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    # "created" is a LogRecord attribute, so prefix the counts
+    logger.info("Sessions generated", extra={f"sessions_{key}": value for key, value in result.items()})
+    return result
+
+
+@app.post("/api/sessions/{session_id}/makeup", response_model=dict)
+def find_session_makeup(session_id: int, request: schemas.MakeupSearchRequest, db: Session = Depends(get_db)):
+    """
+    Earliest times the teacher, the group and a suitable room are all
+    free to make up a cancelled session; with book=true the first one
+    still free is booked as a makeup session
+    """
+    cancelled = db.query(models.Session).filter(models.Session.id == session_id).first()
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if cancelled.status != "cancelled":
+        raise HTTPException(status_code=400, detail="Only cancelled sessions need a makeup")
+    slot = cancelled.timetable_slot
+
+    start_date = request.start_date or dt_date.today() + timedelta(days=1)
+    end_date = request.end_date or start_date + timedelta(days=13)
+    day_start, day_end = to_minutes(request.day_start), to_minutes(request.day_end)
+    duration = request.duration_minutes or to_minutes(cancelled.end_time) - to_minutes(cancelled.start_time)
+    if end_date < start_date or day_end - day_start < duration:
+        raise HTTPException(status_code=400, detail="The search window is empty or shorter than the session")
+
+    min_capacity = request.min_capacity
+    if min_capacity is None:
+        min_capacity = group_size(db, slot.group_id)
+    started = time.perf_counter()
+    candidates = find_makeup_slots(
+        free_room_index, slot.teacher_id, slot.group_id, (slot.academic_year, slot.semester),
+        start_date, end_date, closures(db, start_date, end_date),
+        day_start, day_end, duration, step=request.step_minutes, days_per_week=request.days_per_week,
+        limit=request.limit, min_capacity=min_capacity, room_type=request.room_type,
+        # Whatever cancelled the session most likely still holds that time
+        blocked={cancelled.session_date: span_mask(to_minutes(cancelled.start_time), to_minutes(cancelled.end_time))},
+        has_projector=request.has_projector, has_computers=request.has_computers, building=request.building,
+    )
+    result = {
+        "session_id": cancelled.id,
+        "teacher_id": slot.teacher_id,
+        "group_id": slot.group_id,
+        "duration_minutes": duration,
+        "min_capacity": min_capacity,
+        "candidates": [candidate.as_dict() for candidate in candidates],
+        "search_ms": round((time.perf_counter() - started) * 1000, 2),
+        "booked": None,
+    }
+    if not request.book:
+        return result
+    if not candidates:
+        raise HTTPException(status_code=404, detail={"message": "No free time in the window", **result})
+
+    makeup = book_makeup(db, cancelled, slot, candidates)
+    if makeup is None:
+        raise HTTPException(status_code=409, detail={"message": "Every candidate was booked meanwhile", **result})
+    result["booked"] = {
+        "id": makeup.id,
+        "date": makeup.session_date.isoformat(),
+        "start_time": makeup.start_time.strftime("%H:%M"),
+        "end_time": makeup.end_time.strftime("%H:%M"),
+        "room_id": makeup.room_id,
+    }
+    logger.info("Makeup session booked", extra={"session_id": cancelled.id, "makeup_id": makeup.id})
+    return result
+
+
+@app.delete("/api/timetable-slots/{slot_id}")
+def delete_timetable_slot(slot_id: int, db: Session = Depends(get_db)):
+    """Delete a timetable slot"""
+    db_slot = db.query(models.TimetableSlot).filter(models.TimetableSlot.id == slot_id).first()
+    if db_slot is None:
+        raise HTTPException(status_code=404, detail="Timetable slot not found")
+
+    group_id, teacher_id = db_slot.group_id, db_slot.teacher_id
+    db.delete(db_slot)
+    db.commit()
+    occupancy_index.remove(slot_id)
+    invalidate_timetables(groups=[group_id], teachers=[teacher_id])
+    return {"message": "Timetable slot deleted successfully"}
 
 
 # ============================================
@@ -966,9 +1477,25 @@ def get_timetable_slots(db: Session = Depends(get_db)):
 # ============================================
 
 @app.get("/api/specialties", response_model=List[schemas.SpecialtyResponse])
-def get_specialties(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_specialties(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all specialties"""
-    specialties = db.query(models.Specialty).offset(skip).limit(limit).all()
+    statement = select(models.Specialty)
+    specialties = await cached_page(
+        "specialties", page, response,
+        lambda: paginate(
+            db, statement, page, response, models.Specialty.id,
+            sortable={"code": models.Specialty.code}
+        ),
+        request=request,
+        validate=lambda: collection_validators(
+            db, request, statement, models.Specialty.id, models.Specialty.updated_at
+        )
+    )
     return specialties
 
 
@@ -978,6 +1505,7 @@ def create_specialty(specialty: schemas.SpecialtyCreate, db: Session = Depends(g
     db_specialty = models.Specialty(**specialty.dict())
     db.add(db_specialty)
     db.commit()
+    reference_cache.invalidate("specialties")
     db.refresh(db_specialty)
     return db_specialty
 
@@ -987,9 +1515,23 @@ def create_specialty(specialty: schemas.SpecialtyCreate, db: Session = Depends(g
 # ============================================
 
 @app.get("/api/users", response_model=List[schemas.UserResponse])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_users(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all users"""
-    users = db.query(models.User).offset(skip).limit(limit).all()
+    statement = select(models.User)
+    validators = await collection_validators(db, request, statement, models.User.id, models.User.updated_at)
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    apply_validators(response, validators)
+
+    users = await paginate(
+        db, statement, page, response, models.User.id,
+        sortable={"email": models.User.email}
+    )
     return users
 
 
@@ -1018,9 +1560,25 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 # ============================================
 
 @app.get("/api/groups", response_model=List[schemas.GroupResponse])
-def get_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_groups(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all groups"""
-    groups = db.query(models.Group).offset(skip).limit(limit).all()
+    statement = select(models.Group)
+    groups = await cached_page(
+        "groups", page, response,
+        lambda: paginate(
+            db, statement, page, response, models.Group.id,
+            sortable={"code": models.Group.code}
+        ),
+        request=request,
+        validate=lambda: collection_validators(
+            db, request, statement, models.Group.id, models.Group.created_at
+        )
+    )
     return groups
 
 
@@ -1032,6 +1590,7 @@ def create_group(group: schemas.GroupCreate, db: Session = Depends(get_db)):
 
     try:
         db.commit()
+        reference_cache.invalidate("groups")
         db.refresh(db_group)
         return db_group
     except Exception as e:
@@ -1044,9 +1603,25 @@ def create_group(group: schemas.GroupCreate, db: Session = Depends(get_db)):
 # ============================================
 
 @app.get("/api/levels", response_model=List[schemas.LevelResponse])
-def get_levels(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_levels(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all levels"""
-    levels = db.query(models.Level).offset(skip).limit(limit).all()
+    statement = select(models.Level)
+    levels = await cached_page(
+        "levels", page, response,
+        lambda: paginate(
+            db, statement, page, response, models.Level.id,
+            sortable={"code": models.Level.code}
+        ),
+        request=request,
+        validate=lambda: collection_validators(
+            db, request, statement, models.Level.id, models.Level.created_at
+        )
+    )
     return levels
 
 
@@ -1058,6 +1633,7 @@ def create_level(level: schemas.LevelCreate, db: Session = Depends(get_db)):
 
     try:
         db.commit()
+        reference_cache.invalidate("levels")
         db.refresh(db_level)
         return db_level
     except Exception as e:
@@ -1075,6 +1651,12 @@ def health_check():
     return {"status": "healthy", "service": "repository-service"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: pool usage, route latency and SQL statement timings"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -0,0 +1,173 @@
+"""
+Find, and optionally book, a makeup time for a cancelled session.
+
+For each open day in the window (weekdays within days_per_week, minus
+Event closures) the teacher's and the group's busy minutes on that date
+are OR-ed together from the free-room index (weekly timetable plus the
+day's cancelled, moved and makeup sessions). Doubling shifts of the
+inverted bitmap then give every start where `duration` consecutive
+minutes are free for both, and each aligned start is offered with the
+smallest suitable free room. Candidates come out in (date, start) order,
+so the first `limit` found are the earliest.
+
+Booking re-checks the chosen candidate against the database under the
+same advisory locks as slot writes, since the in-memory indexes may lag
+a write made by another instance, and falls through to the next
+candidate if it was taken meanwhile.
+"""
+from dataclasses import dataclass
+from datetime import date, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from . import models
+from .free_rooms import ACTIVE_SESSION_STATUSES, FreeRoomIndex, refresh_session_overrides
+from .occupancy import GROUP, TEACHER, find_slot_conflicts, lock_slot_resources, span_mask
+
+
+@dataclass
+class MakeupCandidate:
+    session_date: date
+    start: int
+    end: int
+    room_id: int
+    room_code: str
+    capacity: int
+
+    def as_dict(self) -> dict:
+        return {
+            "date": self.session_date.isoformat(),
+            "start_time": f"{self.start // 60:02d}:{self.start % 60:02d}",
+            "end_time": f"{self.end // 60:02d}:{self.end % 60:02d}",
+            "room_id": self.room_id,
+            "room_code": self.room_code,
+            "capacity": self.capacity,
+        }
+
+
+def free_starts(busy: int, first: int, last: int, length: int) -> int:
+    """Bitmap of the minutes s in [first, last - length] with [s, s + length) free in `busy`"""
+    if last - first < length:
+        return 0
+    ok = ~busy & span_mask(first, last)
+    covered = 1
+    while covered < length:
+        shift = min(covered, length - covered)
+        # Bit s now means [s, s + covered + shift) is free
+        ok &= ok >> shift
+        covered += shift
+    return ok & span_mask(first, last - length + 1)
+
+
+def find_makeup_slots(
+    index: FreeRoomIndex,
+    teacher_id: int,
+    group_id: int,
+    term: Tuple[str, int],
+    start_date: date,
+    end_date: date,
+    closed: Sequence[Tuple[date, date]],
+    day_start: int,
+    day_end: int,
+    duration: int,
+    step: int = 30,
+    days_per_week: int = 5,
+    limit: int = 5,
+    blocked: Optional[Dict[date, int]] = None,
+    **room_filters,
+) -> List[MakeupCandidate]:
+    """
+    Earliest (date, start, room) times the teacher, the group and a room
+    are all free; `blocked` adds busy minutes per date, e.g. the cancelled
+    occurrence itself
+    """
+    blocked = blocked or {}
+    candidates = []
+    current = start_date
+    while current <= end_date and len(candidates) < limit:
+        if current.isoweekday() > days_per_week or any(first <= current <= last for first, last in closed):
+            current += timedelta(days=1)
+            continue
+        busy = (index.busy_bits(TEACHER, teacher_id, current, *term)
+                | index.busy_bits(GROUP, group_id, current, *term)
+                | blocked.get(current, 0))
+        starts = free_starts(busy, day_start, day_end, duration)
+        for start in range(day_start, day_end - duration + 1, step):
+            if not starts >> start & 1:
+                continue
+            rooms = index.search(current.isoweekday(), start, start + duration, on_date=current,
+                                 academic_year=term[0], semester=term[1], limit=1, **room_filters)
+            if rooms:
+                room = rooms[0]
+                candidates.append(MakeupCandidate(current, start, start + duration, room.id, room.code, room.capacity))
+                if len(candidates) >= limit:
+                    break
+        current += timedelta(days=1)
+    return candidates
+
+
+def makeup_conflicts(db: Session, slot: models.TimetableSlot, candidate: MakeupCandidate) -> bool:
+    """Whether the database has anything booked against the candidate, for the room, teacher or group"""
+    Slot, Dated = models.TimetableSlot, models.Session
+    start_time, end_time = _time(candidate.start), _time(candidate.end)
+
+    # Dated sessions that day: makeups and materialised slot occurrences
+    clash = db.query(Dated.id).join(Slot, Dated.timetable_slot_id == Slot.id).filter(
+        Dated.session_date == candidate.session_date,
+        Dated.status.in_(ACTIVE_SESSION_STATUSES),
+        Dated.start_time < end_time,
+        Dated.end_time > start_time,
+        or_(Dated.room_id == candidate.room_id, Slot.teacher_id == slot.teacher_id, Slot.group_id == slot.group_id),
+    ).first()
+    if clash is not None:
+        return True
+
+    # Weekly slots, unless a dated session already stands for them that day
+    weekly = find_slot_conflicts(
+        db, candidate.room_id, slot.teacher_id, slot.group_id, candidate.session_date.isoweekday(),
+        start_time, end_time, slot.academic_year, slot.semester,
+    )
+    slot_ids = {interval.slot_id for intervals in weekly.values() for interval in intervals}
+    if not slot_ids:
+        return False
+    overridden = {row[0] for row in db.query(Dated.timetable_slot_id).filter(
+        Dated.timetable_slot_id.in_(slot_ids),
+        Dated.session_date == candidate.session_date,
+        or_(Dated.is_makeup == False, Dated.is_makeup.is_(None)),
+    )}
+    return bool(slot_ids - overridden)
+
+
+def book_makeup(db: Session, cancelled: models.Session, slot: models.TimetableSlot,
+                candidates: Sequence[MakeupCandidate]) -> Optional[models.Session]:
+    """Book the first candidate still free; None when every one was taken meanwhile"""
+    for candidate in candidates:
+        lock_slot_resources(db, candidate.room_id, slot.teacher_id, slot.group_id, candidate.session_date.isoweekday())
+        if makeup_conflicts(db, slot, candidate):
+            db.rollback()
+            continue
+        makeup = models.Session(
+            timetable_slot_id=cancelled.timetable_slot_id,
+            session_date=candidate.session_date,
+            start_time=_time(candidate.start),
+            end_time=_time(candidate.end),
+            room_id=candidate.room_id,
+            status="scheduled",
+            is_makeup=True,
+        )
+        db.add(makeup)
+        db.commit()
+        db.refresh(makeup)
+        refresh_session_overrides(db)
+        return makeup
+    return None
+
+
+def group_size(db: Session, group_id: int) -> int:
+    return db.query(func.count(models.Student.id)).filter(models.Student.group_id == group_id).scalar() or 0
+
+
+def _time(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
@@ -0,0 +1,229 @@
+"""
+Prometheus-style metrics for the repository service.
+
+A small in-process registry (counters, gauges and histograms rendered in
+the Prometheus text format) fed by SQLAlchemy cursor and pool events and
+by the HTTP middleware in main.py.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self._values: Dict[Tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts, +Inf count, sum
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, value_sum) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {value_sum}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose samples are read from a callback at scrape time"""
+
+    def __init__(self, name: str, help_text: str, collect: Callable[[], List[Tuple[Dict, float]]]):
+        self.name, self.help, self._collect = name, help_text, collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in self._collect():
+            lines.append(f"{self.name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route"
+))
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status"
+))
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time by operation and table"
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"
+))
+db_pool_timeouts_total = registry.register(Counter(
+    "db_pool_timeouts_total", "Connection checkouts that hit pool_timeout"
+))
+
+# ============================================
+# POOL INSTRUMENTATION
+# ============================================
+
+_engines: Dict[str, object] = {}
+
+
+def _pool_samples(method: str):
+    def collect():
+        samples = []
+        for name, engine in list(_engines.items()):
+            reader = getattr(engine.pool, method, None)
+            if callable(reader):
+                # QueuePool reports overflow as negative until pool_size is reached
+                samples.append(({"engine": name}, max(reader(), 0)))
+        return samples
+    return collect
+
+
+registry.register(Gauge("db_pool_size", "Configured pool size", _pool_samples("size")))
+registry.register(Gauge("db_pool_checked_out", "Connections currently checked out", _pool_samples("checkedout")))
+registry.register(Gauge("db_pool_checked_in", "Idle connections in the pool", _pool_samples("checkedin")))
+registry.register(Gauge("db_pool_overflow", "Connections opened beyond pool_size", _pool_samples("overflow")))
+
+
+class _MeteredPoolMixin:
+    """Times every checkout so pool saturation shows up as wait time"""
+
+    metrics_name = "default"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            db_pool_timeouts_total.inc(engine=self.metrics_name)
+            raise
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, engine=self.metrics_name)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# ============================================
+# STATEMENT INSTRUMENTATION
+# ============================================
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+\"?([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+
+def statement_fingerprint(statement: str) -> Tuple[str, str]:
+    """Reduce SQL to (operation, first table) to keep label cardinality low"""
+    stripped = statement.lstrip()
+    operation = stripped.split(None, 1)[0].upper() if stripped else "UNKNOWN"
+    match = _TABLE_PATTERN.search(stripped)
+    return operation, match.group(1) if match else ""
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    operation, table = statement_fingerprint(statement)
+    db_statement_duration.observe(elapsed, operation=operation, table=table)
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't fire for failed statements
+    connection = context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+
+def instrument_engine(engine, name: str):
+    """Attach statement timing and pool gauges to a sync Engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    if isinstance(engine.pool, _MeteredPoolMixin):
+        engine.pool.metrics_name = name
+    _engines[name] = engine
@@ -0,0 +1,160 @@
+"""
+Schema migrations for the repository service.
+
+Each vNNNN_*.py module in this package is one migration with an
+`upgrade(connection)` function, applied in version order and recorded in
+the schema_migrations table. Modules that set `TRANSACTIONAL = False`
+(CREATE INDEX CONCURRENTLY on Postgres) run on an autocommit connection;
+the others run in a transaction of their own.
+
+    python -m app.migrations status
+    python -m app.migrations upgrade
+
+On Postgres a session-level advisory lock serialises runners, so several
+replicas starting at once apply each migration exactly once. At startup
+the app only compares the newest recorded version with head() (one
+indexed read) and runs the migrations when they differ.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from types import ModuleType
+from typing import List, Optional, Set
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, exc, func, insert, select, text
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every instance of this service
+ADVISORY_LOCK_KEY = 7260318
+
+_MODULE_NAME = re.compile(r"^v(\d{4})_\w+$")
+
+# Kept out of models.Base so create_all and the app never see it
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+
+@dataclass
+class Migration:
+    version: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "TRANSACTIONAL", True)
+
+    @property
+    def description(self) -> str:
+        doc = (self.module.__doc__ or "").strip()
+        return doc.splitlines()[0] if doc else ""
+
+
+def discover() -> List[Migration]:
+    """Every migration module in this package, oldest first"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        if _MODULE_NAME.match(info.name):
+            migrations.append(Migration(info.name, importlib.import_module(f"{__name__}.{info.name}")))
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def head() -> str:
+    """Newest migration version, read from the module names without importing them"""
+    return max(info.name for info in pkgutil.iter_modules(__path__) if _MODULE_NAME.match(info.name))
+
+
+def current_version(engine) -> Optional[str]:
+    """Newest applied version, or None on a database that was never migrated"""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(schema_migrations.c.version))).scalar()
+    except exc.ProgrammingError:
+        return None
+    except exc.OperationalError as error:
+        # SQLite reports a missing table as an operational error
+        if "no such table" in str(error):
+            return None
+        raise
+
+
+def ensure_current(engine, migrate: bool = True) -> List[str]:
+    """
+    Make sure the database is at head(). Applies the pending migrations
+    when `migrate` is set and raises SchemaOutOfDate otherwise; returns
+    the versions applied.
+    """
+    version = current_version(engine)
+    if version == head():
+        return []
+    if not migrate:
+        raise SchemaOutOfDate(
+            f"database schema is at {version or 'nothing'}, this build needs {head()}; "
+            f"run python -m app.migrations upgrade"
+        )
+    return upgrade(engine)
+
+
+def applied_versions(engine) -> Set[str]:
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending(engine) -> List[Migration]:
+    applied = applied_versions(engine)
+    return [migration for migration in discover() if migration.version not in applied]
+
+
+@contextmanager
+def _runner_lock(engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+def _apply(engine, migration: Migration):
+    if migration.transactional:
+        with engine.begin() as connection:
+            migration.module.upgrade(connection)
+            connection.execute(insert(schema_migrations).values(version=migration.version))
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        migration.module.upgrade(connection)
+        connection.execute(insert(schema_migrations).values(version=migration.version))
+
+
+def upgrade(engine=None) -> List[str]:
+    """Apply every pending migration; returns the versions applied"""
+    if engine is None:
+        from ..database import engine
+
+    done = []
+    with _runner_lock(engine):
+        # Re-read under the lock: another runner may have finished first
+        for migration in pending(engine):
+            logger.info("Applying migration", extra={"version": migration.version})
+            _apply(engine, migration)
+            done.append(migration.version)
+    return done
@@ -0,0 +1,30 @@
+"""
+    python -m app.migrations status     list applied and pending migrations
+    python -m app.migrations upgrade    apply pending migrations
+"""
+import argparse
+
+from . import applied_versions, discover, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("status", "upgrade"))
+    args = parser.parse_args()
+
+    from ..database import engine
+
+    if args.command == "upgrade":
+        done = upgrade(engine)
+        print(f"applied {', '.join(done)}" if done else "up to date")
+        return
+
+    applied = applied_versions(engine)
+    for migration in discover():
+        state = "applied" if migration.version in applied else "pending"
+        print(f"{state:<8} {migration.version}  {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
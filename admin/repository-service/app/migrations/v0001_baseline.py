@@ -0,0 +1,12 @@
+"""
+Baseline: every table in app.models.
+
+Databases that predate migrations already have these tables (they were
+created by create_all at import), so this only creates what is missing.
+"""
+
+
+def upgrade(connection):
+    from .. import models
+
+    models.Base.metadata.create_all(bind=connection, checkfirst=True)
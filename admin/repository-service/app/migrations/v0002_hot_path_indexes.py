@@ -0,0 +1,63 @@
+"""
+Indexes for the foreign keys and lookups the services actually query.
+
+Built CONCURRENTLY on Postgres so large tables keep taking writes. A
+concurrent build that failed leaves an INVALID index behind, which is
+dropped and rebuilt here. On a fresh database the baseline has already
+created all of them from the models and this is a no-op.
+"""
+from sqlalchemy import text
+
+TRANSACTIONAL = False
+
+# name, table, columns, partial-index predicate per dialect
+ACTIVE = {"postgresql": "is_active", "sqlite": "is_active = 1"}
+AFFECTS_TIMETABLE = {"postgresql": "affects_timetable", "sqlite": "affects_timetable = 1"}
+
+INDEXES = [
+    ("ix_specialties_department_id", "specialties", "department_id", None),
+    ("ix_levels_specialty_id", "levels", "specialty_id", None),
+    ("ix_groups_level_id", "groups", "level_id", None),
+    ("ix_subjects_level_id", "subjects", "level_id", None),
+    ("ix_teachers_department_id", "teachers", "department_id", None),
+    ("ix_students_group_id", "students", "group_id", None),
+    ("ix_students_specialty_id", "students", "specialty_id", None),
+    ("ix_teacher_subjects_teacher_id", "teacher_subjects", "teacher_id", None),
+    ("ix_teacher_subjects_subject_id", "teacher_subjects", "subject_id", None),
+    ("ix_timetable_slots_room_day_active", "timetable_slots", "room_id, day_of_week, start_time", ACTIVE),
+    ("ix_timetable_slots_teacher_day_active", "timetable_slots", "teacher_id, day_of_week, start_time", ACTIVE),
+    ("ix_timetable_slots_group_day_active", "timetable_slots", "group_id, day_of_week, start_time", ACTIVE),
+    ("ix_timetable_slots_day_active", "timetable_slots", "day_of_week, start_time", ACTIVE),
+    ("ix_sessions_slot_date", "sessions", "timetable_slot_id, session_date", None),
+    ("ix_sessions_date_room", "sessions", "session_date, room_id", None),
+    ("ix_absences_session_id", "absences", "session_id", None),
+    ("ix_absences_student_session", "absences", "student_id, session_id", None),
+    ("ix_absence_requests_absence_id", "absence_requests", "absence_id", None),
+    ("ix_absence_requests_student_status", "absence_requests", "student_id, status", None),
+    ("ix_notifications_user_read", "notifications", "user_id, is_read", None),
+    ("ix_messages_recipient_read", "messages", "recipient_id, is_read", None),
+    ("ix_messages_sender_id", "messages", "sender_id", None),
+    ("ix_events_dates", "events", "start_date, end_date", AFFECTS_TIMETABLE),
+    ("ix_grades_student_subject", "grades", "student_id, subject_id", None),
+]
+
+
+def _drop_if_invalid(connection, name: str):
+    invalid = connection.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).scalar()
+    if invalid:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def upgrade(connection):
+    dialect = connection.dialect.name
+    concurrently = " CONCURRENTLY" if dialect == "postgresql" else ""
+    for name, table, columns, where in INDEXES:
+        if dialect == "postgresql":
+            _drop_if_invalid(connection, name)
+        statement = f"CREATE INDEX{concurrently} IF NOT EXISTS {name} ON {table} ({columns})"
+        if where:
+            statement += f" WHERE {where.get(dialect, where['postgresql'])}"
+        connection.execute(text(statement))
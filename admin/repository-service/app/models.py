@@ -1,9 +1,15 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Time, Text, ForeignKey, DECIMAL, \
-    CheckConstraint
+    CheckConstraint, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 
+# Partial-index predicate for timetable slots. Spelled per dialect so it
+# matches the `is_active = true` / `is_active = 1` the queries render
+ACTIVE_SLOTS = {
+    "postgresql_where": text("is_active"),
+    "sqlite_where": text("is_active = 1"),
+}
 
 # ============================================
 # CORE MODELS
@@ -61,7 +67,7 @@ class Specialty(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     code = Column(String(50), unique=True, nullable=False)
-    department_id = Column(Integer, ForeignKey("departments.id", ondelete="CASCADE"), nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id", ondelete="CASCADE"), nullable=False, index=True)
     description = Column(Text)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -78,7 +84,7 @@ class Level(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     code = Column(String(50), nullable=False)
-    specialty_id = Column(Integer, ForeignKey("specialties.id", ondelete="CASCADE"), nullable=False)
+    specialty_id = Column(Integer, ForeignKey("specialties.id", ondelete="CASCADE"), nullable=False, index=True)
     year_number = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=func.now())
 
@@ -98,7 +104,7 @@ class Group(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     code = Column(String(50), nullable=False)
-    level_id = Column(Integer, ForeignKey("levels.id", ondelete="CASCADE"), nullable=False)
+    level_id = Column(Integer, ForeignKey("levels.id", ondelete="CASCADE"), nullable=False, index=True)
     max_students = Column(Integer, default=30)
     created_at = Column(DateTime, default=func.now())
 
@@ -118,7 +124,7 @@ class Teacher(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
     employee_id = Column(String(50), unique=True, nullable=False)
-    department_id = Column(Integer, ForeignKey("departments.id", ondelete="RESTRICT"), nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id", ondelete="RESTRICT"), nullable=False, index=True)
     specialization = Column(String(200))
     phone = Column(String(20))
     hire_date = Column(Date)
@@ -139,8 +145,8 @@ class Student(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
     student_number = Column(String(50), unique=True, nullable=False)
-    group_id = Column(Integer, ForeignKey("groups.id", ondelete="RESTRICT"), nullable=False)
-    specialty_id = Column(Integer, ForeignKey("specialties.id", ondelete="RESTRICT"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="RESTRICT"), nullable=False, index=True)
+    specialty_id = Column(Integer, ForeignKey("specialties.id", ondelete="RESTRICT"), nullable=False, index=True)
     enrollment_date = Column(Date, nullable=False)
     date_of_birth = Column(Date)
     phone = Column(String(20))
@@ -166,7 +172,7 @@ class Subject(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     code = Column(String(50), unique=True, nullable=False)
-    level_id = Column(Integer, ForeignKey("levels.id", ondelete="CASCADE"), nullable=False)
+    level_id = Column(Integer, ForeignKey("levels.id", ondelete="CASCADE"), nullable=False, index=True)
     credits = Column(Integer, default=3)
     hours_per_week = Column(Integer, default=3)
     subject_type = Column(String(50))
@@ -202,6 +208,8 @@ class TeacherSubject(Base):
 
     __table_args__ = (
         CheckConstraint(semester.in_([1, 2]), name='check_semester'),
+        Index('ix_teacher_subjects_teacher_id', teacher_id),
+        Index('ix_teacher_subjects_subject_id', subject_id),
     )
 
 
@@ -261,6 +269,12 @@ class TimetableSlot(Base):
         CheckConstraint('day_of_week BETWEEN 1 AND 7', name='check_day_of_week'),
         CheckConstraint('end_time > start_time', name='check_time_order'),
         CheckConstraint(semester.in_([1, 2]), name='check_timetable_semester'),
+        # Conflict checks OR these three together for one day; availability
+        # scans a whole day. Only active slots are ever looked up
+        Index('ix_timetable_slots_room_day_active', room_id, day_of_week, start_time, **ACTIVE_SLOTS),
+        Index('ix_timetable_slots_teacher_day_active', teacher_id, day_of_week, start_time, **ACTIVE_SLOTS),
+        Index('ix_timetable_slots_group_day_active', group_id, day_of_week, start_time, **ACTIVE_SLOTS),
+        Index('ix_timetable_slots_day_active', day_of_week, start_time, **ACTIVE_SLOTS),
     )
 
 
@@ -286,6 +300,8 @@ class Session(Base):
     __table_args__ = (
         CheckConstraint(status.in_(['scheduled', 'completed', 'cancelled', 'rescheduled']),
                         name='check_session_status'),
+        Index('ix_sessions_slot_date', timetable_slot_id, session_date),
+        Index('ix_sessions_date_room', session_date, room_id),
     )
 
 
@@ -298,7 +314,7 @@ class Absence(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
-    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
     absence_type = Column(String(50), default='unjustified')
     marked_at = Column(DateTime, default=func.now())
     marked_by = Column(Integer, ForeignKey("teachers.id", ondelete="SET NULL"))
@@ -315,6 +331,7 @@ class Absence(Base):
 
     __table_args__ = (
         CheckConstraint(absence_type.in_(['justified', 'unjustified', 'pending']), name='check_absence_type'),
+        Index('ix_absences_student_session', student_id, session_id),
     )
 
 
@@ -322,7 +339,7 @@ class AbsenceRequest(Base):
     __tablename__ = "absence_requests"
 
     id = Column(Integer, primary_key=True, index=True)
-    absence_id = Column(Integer, ForeignKey("absences.id", ondelete="CASCADE"), nullable=False)
+    absence_id = Column(Integer, ForeignKey("absences.id", ondelete="CASCADE"), nullable=False, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
     request_reason = Column(Text, nullable=False)
     supporting_document = Column(String(500))
@@ -338,6 +355,7 @@ class AbsenceRequest(Base):
 
     __table_args__ = (
         CheckConstraint(status.in_(['pending', 'approved', 'rejected']), name='check_request_status'),
+        Index('ix_absence_requests_student_status', student_id, status),
     )
 
 
@@ -364,6 +382,7 @@ class Notification(Base):
     __table_args__ = (
         CheckConstraint(notification_type.in_(['absence', 'timetable', 'grade', 'general', 'alert']),
                         name='check_notification_type'),
+        Index('ix_notifications_user_read', user_id, is_read),
     )
 
 
@@ -384,6 +403,11 @@ class Message(Base):
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
 
+    __table_args__ = (
+        Index('ix_messages_recipient_read', recipient_id, is_read),
+        Index('ix_messages_sender_id', sender_id),
+    )
+
 
 # ============================================
 # EVENT & GRADE MODELS
@@ -407,6 +431,8 @@ class Event(Base):
         CheckConstraint('end_date >= start_date', name='check_event_dates'),
         CheckConstraint(event_type.in_(['holiday', 'conference', 'exam', 'workshop', 'closure']),
                         name='check_event_type'),
+        Index('ix_events_dates', start_date, end_date,
+              postgresql_where=text('affects_timetable'), sqlite_where=text('affects_timetable = 1')),
     )
 
 
@@ -433,4 +459,5 @@ class Grade(Base):
         CheckConstraint('score >= 0 AND score <= 20', name='check_score_range'),
         CheckConstraint(exam_type.in_(['midterm', 'final', 'practical', 'project', 'quiz']), name='check_exam_type'),
         CheckConstraint(semester.in_([1, 2]), name='check_grade_semester'),
-    )
\ No newline at end of file
+        Index('ix_grades_student_subject', student_id, subject_id),
+    )
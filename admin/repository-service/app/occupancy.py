@@ -0,0 +1,369 @@
+"""
+In-memory occupancy index for timetable slots.
+
+Active TimetableSlot rows are kept as sorted interval lists per
+(room, day), (teacher, day) and (group, day) for each academic year /
+semester, so "is X free" and "what overlaps this slot" are answered with
+a binary search instead of a table scan. Each list also keeps a bitmap
+of its busy minutes (bit n = minute n of the day), so "is this window
+free" for many resources is one AND per resource.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from datetime import time as dt_time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from . import models
+
+ROOM = "room"
+TEACHER = "teacher"
+GROUP = "group"
+DIMENSIONS = (ROOM, TEACHER, GROUP)
+
+# One occupied interval; start/end are minutes since midnight
+Interval = namedtuple("Interval", ["start", "end", "slot_id"])
+
+# What the index remembers about a slot so it can be removed later
+_SlotEntry = namedtuple(
+    "_SlotEntry", ["term", "day", "start", "end", "room_id", "teacher_id", "group_id"]
+)
+
+
+def to_minutes(value) -> int:
+    """Convert a time object or 'HH:MM' string to minutes since midnight"""
+    if isinstance(value, str):
+        parts = value.split(":")
+        return int(parts[0]) * 60 + int(parts[1])
+    if isinstance(value, dt_time):
+        return value.hour * 60 + value.minute
+    return int(value)
+
+
+def span_mask(start: int, end: int) -> int:
+    """Bitmap of the minutes in [start, end)"""
+    return ((1 << (end - start)) - 1) << start if end > start else 0
+
+
+class _Bucket:
+    """Sorted intervals for one resource on one day"""
+
+    __slots__ = ("intervals", "max_length", "bits")
+
+    def __init__(self):
+        self.intervals: List[Interval] = []
+        self.max_length = 0
+        self.bits = 0
+
+    def add(self, interval: Interval):
+        insort(self.intervals, interval)
+        self.max_length = max(self.max_length, interval.end - interval.start)
+        self.bits |= span_mask(interval.start, interval.end)
+
+    def remove(self, interval: Interval):
+        position = bisect_left(self.intervals, interval)
+        if position < len(self.intervals) and self.intervals[position] == interval:
+            del self.intervals[position]
+            # Other intervals may cover the same minutes, so rebuild
+            self.bits = self.busy_bits()
+
+    def busy_bits(self, exclude_slot_ids=()) -> int:
+        bits = 0
+        for interval in self.intervals:
+            if interval.slot_id not in exclude_slot_ids:
+                bits |= span_mask(interval.start, interval.end)
+        return bits
+
+    def overlapping(self, start: int, end: int) -> List[Interval]:
+        # Only intervals starting in (start - max_length, end) can overlap,
+        # so the scan is bounded by two binary searches.
+        low = bisect_left(self.intervals, (start - self.max_length + 1,))
+        high = bisect_left(self.intervals, (end,))
+        return [i for i in self.intervals[low:high] if i.end > start]
+
+
+class OccupancyIndex:
+    """Thread-safe interval index over active timetable slots"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._buckets: Dict[Tuple, _Bucket] = defaultdict(_Bucket)
+        # (term, dimension, day) -> resource id -> the same buckets
+        self._days: Dict[Tuple, Dict[int, _Bucket]] = defaultdict(dict)
+        # busy_map results, dropped on every change
+        self._busy_maps: Dict[Tuple, Dict[int, int]] = {}
+        self._slots: Dict[int, _SlotEntry] = {}
+        self._terms = set()
+        self.loaded = False
+
+    # ----- maintenance -----
+
+    def load(self, slots: Iterable[models.TimetableSlot]):
+        """Rebuild the index from scratch"""
+        with self._lock:
+            self._buckets.clear()
+            self._days.clear()
+            self._busy_maps.clear()
+            self._slots.clear()
+            self._terms.clear()
+            for slot in slots:
+                self._add(slot)
+            self.loaded = True
+
+    def add(self, slot: models.TimetableSlot):
+        with self._lock:
+            self._remove(slot.id)
+            self._add(slot)
+
+    def update(self, slot: models.TimetableSlot):
+        self.add(slot)
+
+    def remove(self, slot_id: int):
+        with self._lock:
+            self._remove(slot_id)
+
+    def _add(self, slot):
+        if slot.is_active is False:
+            return
+        self._busy_maps.clear()
+        entry = _SlotEntry(
+            term=(slot.academic_year, slot.semester),
+            day=slot.day_of_week,
+            start=to_minutes(slot.start_time),
+            end=to_minutes(slot.end_time),
+            room_id=slot.room_id,
+            teacher_id=slot.teacher_id,
+            group_id=slot.group_id,
+        )
+        interval = Interval(entry.start, entry.end, slot.id)
+        for dimension, resource_id in self._resources(entry):
+            bucket = self._buckets[(entry.term, dimension, resource_id, entry.day)]
+            bucket.add(interval)
+            self._days[(entry.term, dimension, entry.day)][resource_id] = bucket
+        self._slots[slot.id] = entry
+        self._terms.add(entry.term)
+
+    def _remove(self, slot_id: int):
+        entry = self._slots.pop(slot_id, None)
+        if entry is None:
+            return
+        self._busy_maps.clear()
+        interval = Interval(entry.start, entry.end, slot_id)
+        for dimension, resource_id in self._resources(entry):
+            bucket = self._buckets.get((entry.term, dimension, resource_id, entry.day))
+            if bucket is not None:
+                bucket.remove(interval)
+
+    @staticmethod
+    def _resources(entry: _SlotEntry):
+        return ((ROOM, entry.room_id), (TEACHER, entry.teacher_id), (GROUP, entry.group_id))
+
+    # ----- queries -----
+
+    def overlapping(
+        self,
+        dimension: str,
+        resource_id: int,
+        day_of_week: int,
+        start,
+        end,
+        academic_year: Optional[str] = None,
+        semester: Optional[int] = None,
+        exclude_slot_id: Optional[int] = None,
+    ) -> List[Interval]:
+        """Intervals of a room/teacher/group that overlap [start, end) on a day"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension}")
+        start, end = to_minutes(start), to_minutes(end)
+        with self._lock:
+            terms = [(academic_year, semester)] if academic_year is not None else list(self._terms)
+            result = []
+            for term in terms:
+                bucket = self._buckets.get((term, dimension, resource_id, day_of_week))
+                if bucket is not None:
+                    result.extend(i for i in bucket.overlapping(start, end) if i.slot_id != exclude_slot_id)
+            return result
+
+    def is_free(self, dimension: str, resource_id: int, day_of_week: int, start, end, **kwargs) -> bool:
+        """Whether a room/teacher/group has nothing booked in [start, end) on a day"""
+        return not self.overlapping(dimension, resource_id, day_of_week, start, end, **kwargs)
+
+    def conflicts(
+        self,
+        room_id: int,
+        teacher_id: int,
+        group_id: int,
+        day_of_week: int,
+        start,
+        end,
+        academic_year: Optional[str] = None,
+        semester: Optional[int] = None,
+        exclude_slot_id: Optional[int] = None,
+    ) -> Dict[str, List[Interval]]:
+        """Overlapping intervals per dimension for a prospective slot (empty dict if none)"""
+        found = {}
+        for dimension, resource_id in ((ROOM, room_id), (TEACHER, teacher_id), (GROUP, group_id)):
+            overlaps = self.overlapping(
+                dimension, resource_id, day_of_week, start, end,
+                academic_year=academic_year, semester=semester, exclude_slot_id=exclude_slot_id,
+            )
+            if overlaps:
+                found[dimension] = overlaps
+        return found
+
+    def busy_bits(
+        self,
+        dimension: str,
+        resource_id: int,
+        day_of_week: int,
+        academic_year: Optional[str] = None,
+        semester: Optional[int] = None,
+        exclude_slot_ids=(),
+    ) -> int:
+        """Bitmap of the minutes a room/teacher/group is booked on a day (see span_mask)"""
+        with self._lock:
+            terms = [(academic_year, semester)] if academic_year is not None else self._terms
+            bits = 0
+            for term in terms:
+                bucket = self._buckets.get((term, dimension, resource_id, day_of_week))
+                if bucket is not None:
+                    bits |= bucket.busy_bits(exclude_slot_ids) if exclude_slot_ids else bucket.bits
+            return bits
+
+    def busy_map(self, dimension: str, day_of_week: int, academic_year: Optional[str] = None,
+                 semester: Optional[int] = None) -> Dict[int, int]:
+        """
+        busy_bits of every room/teacher/group with bookings on a day.
+        Cached until the next change; callers must not modify the result.
+        """
+        key = (dimension, day_of_week, academic_year, semester)
+        with self._lock:
+            merged = self._busy_maps.get(key)
+            if merged is None:
+                terms = [(academic_year, semester)] if academic_year is not None else self._terms
+                merged = {}
+                for term in terms:
+                    for resource_id, bucket in self._days.get((term, dimension, day_of_week), {}).items():
+                        merged[resource_id] = merged.get(resource_id, 0) | bucket.bits
+                self._busy_maps[key] = merged
+            return merged
+
+    def slot(self, slot_id: int) -> Optional[_SlotEntry]:
+        """What the index holds for an active slot, or None"""
+        return self._slots.get(slot_id)
+
+    def intervals(self, dimension: str, resource_id: int, day_of_week: int,
+                  academic_year: Optional[str] = None, semester: Optional[int] = None) -> List[Interval]:
+        """All intervals booked for a room/teacher/group on a day"""
+        return self.overlapping(dimension, resource_id, day_of_week, 0, 24 * 60,
+                                academic_year=academic_year, semester=semester)
+
+    def __len__(self):
+        return len(self._slots)
+
+
+# Shared index used by endpoints and batch jobs
+occupancy_index = OccupancyIndex()
+
+
+def build_occupancy_index(db: Session) -> OccupancyIndex:
+    """Load every active timetable slot into the shared index"""
+    slots = db.query(models.TimetableSlot).filter(models.TimetableSlot.is_active == True).all()
+    occupancy_index.load(slots)
+    return occupancy_index
+
+
+# ============================================
+# CONFLICT CHECKS
+# ============================================
+
+# Advisory lock namespaces (first key of pg_advisory_xact_lock(int, int))
+_LOCK_NAMESPACES = {ROOM: 0x54540001, TEACHER: 0x54540002, GROUP: 0x54540003}
+# Whole-timetable lock: shared by single-slot writers, exclusive for bulk rewrites
+_TIMETABLE_LOCK = (0x54540000, 0)
+
+
+def lock_timetable(db: Session):
+    """
+    Block every other timetable writer until the transaction ends, for
+    rewrites that replace many slots at once. No-op on other databases.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+               {"namespace": _TIMETABLE_LOCK[0], "key": _TIMETABLE_LOCK[1]})
+
+
+def lock_slot_resources(db: Session, room_id: int, teacher_id: int, group_id: int, day_of_week: int):
+    """
+    Serialize concurrent bookings of the same room/teacher/group on a day.
+
+    Takes Postgres transaction-level advisory locks (released on commit or
+    rollback) in a fixed order so two sessions can't deadlock. No-op on
+    other databases.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    # Waits for a bulk rewrite holding lock_timetable, without blocking
+    # other single-slot writers
+    db.execute(text("SELECT pg_advisory_xact_lock_shared(:namespace, :key)"),
+               {"namespace": _TIMETABLE_LOCK[0], "key": _TIMETABLE_LOCK[1]})
+    keys = sorted(
+        (_LOCK_NAMESPACES[dimension], resource_id * 8 + day_of_week)
+        for dimension, resource_id in ((ROOM, room_id), (TEACHER, teacher_id), (GROUP, group_id))
+    )
+    for namespace, key in keys:
+        db.execute(text("SELECT pg_advisory_xact_lock(:namespace, :key)"), {"namespace": namespace, "key": key})
+
+
+def find_slot_conflicts(
+    db: Session,
+    room_id: int,
+    teacher_id: int,
+    group_id: int,
+    day_of_week: int,
+    start,
+    end,
+    academic_year: str,
+    semester: Optional[int],
+    exclude_slot_id: Optional[int] = None,
+) -> Dict[str, List[Interval]]:
+    """Same result as OccupancyIndex.conflicts, read from the database in one query"""
+    Slot = models.TimetableSlot
+    query = db.query(Slot.id, Slot.room_id, Slot.teacher_id, Slot.group_id, Slot.start_time, Slot.end_time).filter(
+        Slot.is_active == True,
+        Slot.academic_year == academic_year,
+        Slot.semester == semester,
+        Slot.day_of_week == day_of_week,
+        Slot.start_time < end,
+        Slot.end_time > start,
+        or_(Slot.room_id == room_id, Slot.teacher_id == teacher_id, Slot.group_id == group_id),
+    )
+    if exclude_slot_id is not None:
+        query = query.filter(Slot.id != exclude_slot_id)
+
+    found = defaultdict(list)
+    for row in query.all():
+        interval = Interval(to_minutes(row.start_time), to_minutes(row.end_time), row.id)
+        if row.room_id == room_id:
+            found[ROOM].append(interval)
+        if row.teacher_id == teacher_id:
+            found[TEACHER].append(interval)
+        if row.group_id == group_id:
+            found[GROUP].append(interval)
+    return dict(found)
+
+
+def describe_conflicts(conflicts: Dict[str, List[Interval]]) -> str:
+    """Human readable summary of conflicts for an error response"""
+    parts = []
+    for dimension, intervals in conflicts.items():
+        for interval in intervals:
+            parts.append(
+                f"{dimension} already booked {interval.start // 60:02d}:{interval.start % 60:02d}"
+                f"-{interval.end // 60:02d}:{interval.end % 60:02d} (slot {interval.slot_id})"
+            )
+    return "Timetable conflict: " + "; ".join(parts)
@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are ordered by an optional sort column plus the primary key, and
+the next page starts strictly after the last row of the previous one, so
+deep pages cost the same as the first. The opaque cursor for the next
+page is returned in the X-Next-Cursor header, leaving the JSON body a
+plain list. skip/offset is still accepted as a deprecated fallback.
+"""
+import base64
+import json
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Query parameters accepted by every paginated list endpoint"""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+        limit: int = Query(100, ge=1),
+        skip: int = Query(0, ge=0, deprecated=True, description="Deprecated, use cursor"),
+        sort: Optional[str] = Query(None, description="Sort column, defaults to id"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.skip = skip
+        self.sort = sort
+
+
+def encode_cursor(sort: str, sort_value, last_id: int) -> str:
+    payload = json.dumps([sort, sort_value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return sort, sort_value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(db, statement, page: PageParams, response: Response, id_column, sortable: Optional[Dict] = None):
+    """
+    Apply ordering and keyset (or legacy offset) paging to a select and run it.
+
+    db is an AsyncSession (or the ThreadedSession fallback); id_column is
+    the primary key used as tie-breaker and sortable maps the accepted
+    ?sort= names to non-null columns. Returns the rows of the page (model
+    instances for single-entity selects) and sets X-Next-Cursor when more
+    rows follow.
+    """
+    sortable = sortable or {}
+    sort = page.sort or "id"
+    if sort != "id" and sort not in sortable:
+        allowed = ", ".join(["id"] + sorted(sortable))
+        raise HTTPException(status_code=400, detail=f"Invalid sort '{sort}'. Allowed: {allowed}")
+    sort_column = sortable.get(sort)
+
+    if sort_column is not None:
+        statement = statement.order_by(sort_column, id_column)
+    else:
+        statement = statement.order_by(id_column)
+
+    if page.cursor:
+        cursor_sort, sort_value, last_id = decode_cursor(page.cursor)
+        if cursor_sort != sort:
+            raise HTTPException(status_code=400, detail="Cursor was issued for a different sort")
+        if sort_column is not None:
+            statement = statement.where(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, id_column > last_id)
+            ))
+        else:
+            statement = statement.where(id_column > last_id)
+    elif page.skip:
+        statement = statement.offset(page.skip)
+        response.headers["Deprecation"] = "true"
+
+    result = await db.execute(statement.limit(page.limit + 1))
+    rows = result.scalars().all() if len(statement.column_descriptions) == 1 else result.all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        sort_value = _value(last, sort_column) if sort_column is not None else None
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, sort_value, _value(last, id_column))
+    return rows
+
+
+def _value(row, column):
+    # Rows are either ORM instances or tuples whose first entity is the model
+    entity = row[0] if isinstance(row, tuple) or hasattr(row, "_fields") else row
+    value = getattr(entity, column.key)
+    return value.isoformat() if hasattr(value, "isoformat") else value
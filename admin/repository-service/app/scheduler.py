@@ -0,0 +1,532 @@
+"""
+Automatic weekly timetable generation.
+
+The week is a grid of days x fixed-length periods (Monday-Friday, ten
+60-minute periods from 08:00 by default). That is small enough for a
+room's, teacher's or group's whole week to fit in one int, where bit
+`day * periods_per_day + period` is set when the period is taken.
+Checking a placement is then a single AND, and the feasible start
+periods of a session come from a few shifts of the free mask.
+
+Every TeacherSubject assignment of the term becomes a course (teacher x
+subject x group) of Subject.hours_per_week. Each course is split into
+sessions of at most max_session_periods, one per day. A pass works like
+this:
+- Sessions are placed most-constrained first: fewest feasible starts,
+  then busiest teacher and group.
+- After each placement, the domains of that teacher's and that group's
+  other sessions are recomputed (forward checking).
+- The room is the smallest free one whose capacity, room_type and
+  has_computers suit the course.
+
+A pass that leaves sessions unplaced is restarted with another random
+tie-break order. Restarts run in parallel in a process pool until one
+places everything or the time limit is hit; the best pass wins.
+
+Environment:
+    SCHEDULER_WORKERS     processes running restarts in parallel (default: CPU count)
+    SCHEDULER_TIME_LIMIT  seconds before the best pass so far is returned (default 20)
+"""
+import heapq
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import time as dt_time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, insert, or_, tuple_
+from sqlalchemy.orm import Session
+
+from . import models
+from .occupancy import GROUP, ROOM, TEACHER, lock_timetable, to_minutes
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "0")) or os.cpu_count() or 1
+SCHEDULER_TIME_LIMIT = float(os.getenv("SCHEDULER_TIME_LIMIT", "20"))
+# (group, subject) pairs per deactivation statement
+REPLACE_BATCH_SIZE = 500
+
+# Room types each subject type may use; None means any room
+SUBJECT_ROOM_TYPES = {
+    "theory": ("classroom", "amphitheater"),
+    "practical": ("lab", "workshop"),
+    "mixed": None,
+}
+
+
+@dataclass(frozen=True)
+class Grid:
+    days: int = 5
+    periods_per_day: int = 10
+    day_start: int = 8 * 60  # minutes since midnight
+    period_minutes: int = 60
+    max_session_periods: int = 2
+
+    def validate(self):
+        if not 1 <= self.days <= 7:
+            raise ValueError("days must be between 1 and 7")
+        if min(self.periods_per_day, self.period_minutes, self.max_session_periods) < 1:
+            raise ValueError("periods_per_day, period_minutes and max_session_periods must be positive")
+        if self.day_start + self.periods_per_day * self.period_minutes > 24 * 60:
+            raise ValueError("the day's periods run past midnight")
+
+    @property
+    def size(self) -> int:
+        return self.days * self.periods_per_day
+
+    def block(self, start: int, length: int) -> int:
+        return ((1 << length) - 1) << start
+
+    def day_mask(self, day: int) -> int:
+        return self.block(day * self.periods_per_day, self.periods_per_day)
+
+    def valid_starts(self, length: int) -> int:
+        """Start bits from which `length` periods stay within one day"""
+        per_day = self.periods_per_day - length + 1
+        if per_day <= 0:
+            return 0
+        return sum(self.block(day * self.periods_per_day, per_day) for day in range(self.days))
+
+    def periods(self, hours: int) -> int:
+        return math.ceil(hours * 60 / self.period_minutes)
+
+    def split(self, periods: int) -> List[int]:
+        """Session lengths for a course, longest first"""
+        lengths = [self.max_session_periods] * (periods // self.max_session_periods)
+        if periods % self.max_session_periods:
+            lengths.append(periods % self.max_session_periods)
+        return lengths
+
+    def to_bits(self, day_of_week: int, start, end) -> int:
+        """Periods touched by an existing slot; 0 when it is off the grid"""
+        if not 1 <= day_of_week <= self.days:
+            return 0
+        start, end = to_minutes(start), to_minutes(end)
+        first = max(0, (start - self.day_start) // self.period_minutes)
+        last = min(self.periods_per_day, -(-(end - self.day_start) // self.period_minutes))
+        if last <= first:
+            return 0
+        return self.block((day_of_week - 1) * self.periods_per_day + first, last - first)
+
+    def to_times(self, start: int, length: int) -> Tuple[int, dt_time, dt_time]:
+        """(day_of_week, start_time, end_time) of a session starting at bit `start`"""
+        day, period = divmod(start, self.periods_per_day)
+        begin = self.day_start + period * self.period_minutes
+        end = begin + length * self.period_minutes
+        return day + 1, dt_time(begin // 60, begin % 60), _end_time(end)
+
+
+def _end_time(minutes: int) -> dt_time:
+    # A day that ends exactly at midnight is stored as 23:59
+    return dt_time(23, 59) if minutes >= 24 * 60 else dt_time(minutes // 60, minutes % 60)
+
+
+@dataclass
+class Course:
+    """One teacher teaching one subject to one group for the whole term"""
+    subject_id: int
+    teacher_id: int
+    group_id: int
+    periods: int
+    # Suitable room ids, smallest sufficient capacity first
+    rooms: Tuple[int, ...]
+
+
+@dataclass
+class Problem:
+    grid: Grid
+    courses: List[Course]
+    # Periods already taken by slots that are kept, keyed (ROOM/TEACHER/GROUP, id)
+    busy: Dict[Tuple[str, int], int] = field(default_factory=dict)
+
+    def sessions(self) -> List[Tuple[int, int]]:
+        """(course index, length) of every session to place"""
+        return [
+            (index, length)
+            for index, course in enumerate(self.courses)
+            for length in self.grid.split(course.periods)
+        ]
+
+
+@dataclass
+class Attempt:
+    # (course index, start bit, length, room id)
+    placements: List[Tuple[int, int, int, int]]
+    # (course index, length)
+    unplaced: List[Tuple[int, int]]
+
+
+def _starts(free: int, length: int, valid: int) -> int:
+    """Bits from which `length` consecutive free periods start"""
+    starts = free & valid
+    for shift in range(1, length):
+        starts &= free >> shift
+    return starts
+
+
+def solve(problem: Problem, seed: int, give_up_after: Optional[int] = None) -> Attempt:
+    """
+    One most-constrained-first pass with forward checking. Stops early,
+    counting the rest as unplaced, once more than `give_up_after`
+    sessions could not be placed.
+    """
+    grid, courses = problem.grid, problem.courses
+    rng = random.Random(seed)
+    week = (1 << grid.size) - 1
+    valid = {length: grid.valid_starts(length) for length in range(1, grid.max_session_periods + 1)}
+
+    busy = defaultdict(int, problem.busy)
+    sessions = problem.sessions()
+    by_teacher, by_group = defaultdict(list), defaultdict(list)
+    for index, (course, _) in enumerate(sessions):
+        by_teacher[courses[course].teacher_id].append(index)
+        by_group[courses[course].group_id].append(index)
+    course_days = [0] * len(courses)
+    group_load = defaultdict(lambda: [0] * grid.days)
+
+    def domain(index: int) -> int:
+        course_index, length = sessions[index]
+        course = courses[course_index]
+        blocked = busy[(TEACHER, course.teacher_id)] | busy[(GROUP, course.group_id)]
+        # One session of a course per day, until every day has one
+        if course_days[course_index] != week:
+            blocked |= course_days[course_index]
+        return _starts(~blocked & week, length, valid[length])
+
+    def choose(index: int, starts: int) -> Optional[Tuple[int, int]]:
+        course_index, length = sessions[index]
+        course = courses[course_index]
+        load = group_load[course.group_id]
+        candidates = []
+        while starts:
+            low = starts & -starts
+            starts ^= low
+            start = low.bit_length() - 1
+            # Spread a group's hours over the week, random among equals
+            candidates.append((load[start // grid.periods_per_day], rng.random(), start))
+        candidates.sort()
+        for _, _, start in candidates:
+            mask = grid.block(start, length)
+            for room_id in course.rooms:
+                if not busy[(ROOM, room_id)] & mask:
+                    return start, room_id
+        return None
+
+    # Busy teachers and groups go first among equally constrained sessions
+    weight = [len(by_teacher[courses[c].teacher_id]) + len(by_group[courses[c].group_id]) for c, _ in sessions]
+    domains = [domain(index) for index in range(len(sessions))]
+    heap = [(domains[i].bit_count(), -weight[i], rng.random(), i) for i in range(len(sessions))]
+    heapq.heapify(heap)
+    done = [False] * len(sessions)
+    attempt = Attempt([], [])
+
+    while heap:
+        size, _, _, index = heapq.heappop(heap)
+        if done[index] or size != domains[index].bit_count():
+            continue
+        done[index] = True
+        course_index, length = sessions[index]
+        choice = choose(index, domains[index])
+        if choice is None:
+            attempt.unplaced.append((course_index, length))
+            if give_up_after is not None and len(attempt.unplaced) > give_up_after:
+                attempt.unplaced += [sessions[i] for i in range(len(sessions)) if not done[i]]
+                break
+            continue
+
+        start, room_id = choice
+        course = courses[course_index]
+        mask = grid.block(start, length)
+        for key in ((ROOM, room_id), (TEACHER, course.teacher_id), (GROUP, course.group_id)):
+            busy[key] |= mask
+        day = start // grid.periods_per_day
+        course_days[course_index] |= grid.day_mask(day)
+        group_load[course.group_id][day] += length
+        attempt.placements.append((course_index, start, length, room_id))
+
+        for other in set(by_teacher[course.teacher_id]) | set(by_group[course.group_id]):
+            if not done[other]:
+                domains[other] = domain(other)
+                heapq.heappush(heap, (domains[other].bit_count(), -weight[other], rng.random(), other))
+    return attempt
+
+
+def search(problem: Problem, seed: int, deadline: float, stop=None) -> Tuple[Attempt, int]:
+    """Restart solve() with fresh seeds until everything is placed, time runs out or `stop` is set"""
+    rng = random.Random(seed)
+    best, attempts = None, 0
+    while True:
+        attempt = solve(problem, rng.getrandbits(32), give_up_after=len(best.unplaced) if best else None)
+        attempts += 1
+        if best is None or len(attempt.unplaced) < len(best.unplaced):
+            best = attempt
+        if not best.unplaced or time.time() >= deadline or (stop is not None and stop.is_set()):
+            return best, attempts
+
+
+_stop = None
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _search_task(problem: Problem, seed: int, deadline: float) -> Tuple[Attempt, int]:
+    return search(problem, seed, deadline, _stop)
+
+
+def run_search(problem: Problem, workers: int, time_limit: float, seed: int = 0) -> Tuple[Attempt, int]:
+    """
+    Best attempt and the number of attempts made. The first pass runs
+    here, and usually places everything; the pool is only started when
+    it did not.
+    """
+    deadline = time.time() + time_limit
+    best = solve(problem, seed)
+    attempts = 1
+    if not best.unplaced or time.time() >= deadline:
+        return best, attempts
+    if workers <= 1:
+        found, count = search(problem, seed + 1, deadline)
+        return (found if len(found.unplaced) < len(best.unplaced) else best), attempts + count
+
+    # spawn, like the hashing pool: forking a process that runs logging
+    # and pool threads can deadlock the child
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(stop,)) as executor:
+        futures = [executor.submit(_search_task, problem, seed + 1 + worker, deadline) for worker in range(workers)]
+        for future in as_completed(futures):
+            found, count = future.result()
+            attempts += count
+            if len(found.unplaced) < len(best.unplaced):
+                best = found
+            if not best.unplaced:
+                stop.set()
+    return best, attempts
+
+
+# ============================================
+# DATABASE SIDE
+# ============================================
+
+@dataclass
+class Schedule:
+    academic_year: str
+    semester: int
+    group_ids: List[int]
+    # TimetableSlot values, ready for one bulk insert
+    rows: List[dict]
+    unplaced: List[dict]
+    # Subjects of a group's level that nobody is assigned to teach
+    unstaffed: List[dict]
+    attempts: int
+    seconds: float
+    # Active slots of the term when the schedule was computed
+    signature: tuple = ()
+    # (group_id, subject_id) pairs whose slots the rows replace
+    replaced: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def _room_suits(subject_type: Optional[str], room: models.Room) -> bool:
+    allowed = SUBJECT_ROOM_TYPES.get(subject_type)
+    if allowed is None or (room.room_type or "classroom") in allowed:
+        return True
+    # A classroom fitted with computers can host practical work
+    return subject_type == "practical" and bool(room.has_computers)
+
+
+def _term_slots(db: Session, academic_year: str, semester: int):
+    Slot = models.TimetableSlot
+    return db.query(Slot).filter(Slot.is_active == True, Slot.academic_year == academic_year,
+                                 Slot.semester == semester)
+
+
+def _term_signature(db: Session, academic_year: str, semester: int) -> tuple:
+    Slot = models.TimetableSlot
+    return tuple(
+        _term_slots(db, academic_year, semester)
+        .with_entities(func.count(Slot.id), func.max(Slot.id), func.max(Slot.updated_at))
+        .one()
+    )
+
+
+def scope_groups(db: Session, department_id: Optional[int] = None,
+                 group_ids: Optional[Sequence[int]] = None) -> List[models.Group]:
+    """Groups to schedule: the given ids, a department's groups, or every group"""
+    query = db.query(models.Group)
+    if department_id is not None:
+        query = (
+            query.join(models.Level, models.Group.level_id == models.Level.id)
+            .join(models.Specialty, models.Level.specialty_id == models.Specialty.id)
+            .filter(models.Specialty.department_id == department_id)
+        )
+    if group_ids is not None:
+        query = query.filter(models.Group.id.in_(group_ids))
+    return query.order_by(models.Group.id).all()
+
+
+def build_problem(db: Session, groups: List[models.Group], academic_year: str, semester: int,
+                  grid: Grid) -> Tuple[Problem, List[dict]]:
+    """The scheduling problem for `groups`, and the unstaffed (group, subject) pairs"""
+    group_ids = [group.id for group in groups]
+    enrolled = dict(
+        db.query(models.Student.group_id, func.count(models.Student.id))
+        .filter(models.Student.group_id.in_(group_ids))
+        .group_by(models.Student.group_id)
+    )
+    subjects_by_level = defaultdict(list)
+    for subject in db.query(models.Subject).filter(
+        models.Subject.level_id.in_({group.level_id for group in groups})
+    ).order_by(models.Subject.id):
+        subjects_by_level[subject.level_id].append(subject)
+
+    # A TeacherSubject without a group covers every group of the subject's
+    # level that has no teacher of its own; several such teachers share
+    # the groups round-robin
+    explicit, shared = {}, defaultdict(list)
+    assignments = db.query(models.TeacherSubject).filter(
+        models.TeacherSubject.academic_year == academic_year,
+        or_(models.TeacherSubject.semester == semester, models.TeacherSubject.semester.is_(None)),
+        or_(models.TeacherSubject.group_id.in_(group_ids), models.TeacherSubject.group_id.is_(None)),
+    ).order_by(models.TeacherSubject.id)
+    for assignment in assignments:
+        if assignment.group_id is None:
+            shared[assignment.subject_id].append(assignment.teacher_id)
+        else:
+            explicit.setdefault((assignment.group_id, assignment.subject_id), assignment.teacher_id)
+
+    rooms = (
+        db.query(models.Room).filter(models.Room.is_available == True)
+        .order_by(models.Room.capacity, models.Room.id).all()
+    )
+    courses, unstaffed = [], []
+    turns = defaultdict(int)
+    for group in groups:
+        size = enrolled.get(group.id) or group.max_students or 0
+        for subject in subjects_by_level[group.level_id]:
+            teacher_id = explicit.get((group.id, subject.id))
+            if teacher_id is None and shared[subject.id]:
+                teachers = shared[subject.id]
+                teacher_id = teachers[turns[subject.id] % len(teachers)]
+                turns[subject.id] += 1
+            if teacher_id is None:
+                unstaffed.append({"group_id": group.id, "subject_id": subject.id})
+                continue
+            courses.append(Course(
+                subject_id=subject.id,
+                teacher_id=teacher_id,
+                group_id=group.id,
+                periods=grid.periods(subject.hours_per_week or 3),
+                rooms=tuple(
+                    room.id for room in rooms
+                    if room.capacity >= size and _room_suits(subject.subject_type, room)
+                ),
+            ))
+
+    # Only the slots of the courses being scheduled are replaced. The rest
+    # (other groups, and hand-placed slots of unstaffed subjects) stay and
+    # block their room, teacher and group
+    busy = defaultdict(int)
+    replaced = {(course.group_id, course.subject_id) for course in courses}
+    for slot in _term_slots(db, academic_year, semester):
+        if (slot.group_id, slot.subject_id) in replaced:
+            continue
+        bits = grid.to_bits(slot.day_of_week, slot.start_time, slot.end_time)
+        for key in ((ROOM, slot.room_id), (TEACHER, slot.teacher_id), (GROUP, slot.group_id)):
+            busy[key] |= bits
+    return Problem(grid, courses, dict(busy)), unstaffed
+
+
+def generate_schedule(
+    db: Session,
+    academic_year: str,
+    semester: int,
+    groups: List[models.Group],
+    grid: Grid = Grid(),
+    workers: Optional[int] = None,
+    time_limit: Optional[float] = None,
+    seed: int = 0,
+) -> Schedule:
+    """Compute a conflict-free timetable for `groups`; nothing is written"""
+    grid.validate()
+    started = time.perf_counter()
+    signature = _term_signature(db, academic_year, semester)
+    problem, unstaffed = build_problem(db, groups, academic_year, semester, grid)
+    best, attempts = run_search(
+        problem,
+        workers or SCHEDULER_WORKERS,
+        time_limit if time_limit is not None else SCHEDULER_TIME_LIMIT,
+        seed,
+    )
+
+    rows = []
+    for course_index, start, length, room_id in sorted(best.placements, key=lambda p: (p[0], p[1])):
+        course = problem.courses[course_index]
+        day_of_week, start_time, end_time = grid.to_times(start, length)
+        rows.append({
+            "subject_id": course.subject_id,
+            "teacher_id": course.teacher_id,
+            "group_id": course.group_id,
+            "room_id": room_id,
+            "day_of_week": day_of_week,
+            "start_time": start_time,
+            "end_time": end_time,
+            "academic_year": academic_year,
+            "semester": semester,
+            "is_active": True,
+        })
+    unplaced = [
+        {
+            "group_id": problem.courses[course_index].group_id,
+            "subject_id": problem.courses[course_index].subject_id,
+            "teacher_id": problem.courses[course_index].teacher_id,
+            "minutes": length * grid.period_minutes,
+            "reason": "no suitable room" if not problem.courses[course_index].rooms else "no free period",
+        }
+        for course_index, length in best.unplaced
+    ]
+    return Schedule(
+        academic_year=academic_year,
+        semester=semester,
+        group_ids=[group.id for group in groups],
+        rows=rows,
+        unplaced=unplaced,
+        unstaffed=unstaffed,
+        attempts=attempts,
+        seconds=round(time.perf_counter() - started, 3),
+        signature=signature,
+        replaced=sorted({(course.group_id, course.subject_id) for course in problem.courses}),
+    )
+
+
+def write_schedule(db: Session, schedule: Schedule) -> int:
+    """
+    Replace the active slots of the scheduled courses' (group, subject)
+    pairs with the schedule: the old ones are deactivated (their sessions
+    keep pointing at them; other slots of the groups stay) and the new ones
+    go in with one bulk insert. Fails with 409 when the term's slots
+    changed since the schedule was computed.
+    """
+    lock_timetable(db)
+    if _term_signature(db, schedule.academic_year, schedule.semester) != schedule.signature:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Timetable slots changed while the schedule was computed, generate it again",
+        )
+    Slot = models.TimetableSlot
+    for offset in range(0, len(schedule.replaced), REPLACE_BATCH_SIZE):
+        _term_slots(db, schedule.academic_year, schedule.semester).filter(
+            tuple_(Slot.group_id, Slot.subject_id).in_(schedule.replaced[offset:offset + REPLACE_BATCH_SIZE])
+        ).update({"is_active": False}, synchronize_session=False)
+    if schedule.rows:
+        db.execute(insert(models.TimetableSlot), schedule.rows)
+    db.commit()
+    return len(schedule.rows)
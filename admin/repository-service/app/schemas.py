@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import date, time, datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import List, Optional
+from datetime import date, time, datetime, timedelta
 
 
 # ===== User Schemas =====
@@ -222,9 +222,13 @@ class RoomResponse(RoomBase):
         from_attributes = True
 
 
+class FreeRoomResponse(RoomBase):
+    id: int
+
+
 # ===== Timetable Schemas =====
 class TimetableSlotBase(BaseModel):
-    day_of_week: int
+    day_of_week: int = Field(..., ge=1, le=7)
     start_time: time
     end_time: time
     academic_year: str
@@ -236,6 +240,30 @@ class TimetableSlotCreate(TimetableSlotBase):
     teacher_id: int
     group_id: int
     room_id: int
+    is_active: bool = True
+
+
+class TimetableSlotUpdate(BaseModel):
+    subject_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    group_id: Optional[int] = None
+    room_id: Optional[int] = None
+    day_of_week: Optional[int] = Field(None, ge=1, le=7)
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    academic_year: Optional[str] = None
+    semester: Optional[int] = None
+    is_active: Optional[bool] = None
+
+    # Fields may be left out, but not set to null: the columns are NOT NULL.
+    # Validators only run on values the client sent, not on the defaults
+    @field_validator("subject_id", "teacher_id", "group_id", "room_id", "day_of_week", "start_time", "end_time",
+                     "academic_year")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
 
 
 class TimetableSlotResponse(TimetableSlotBase):
@@ -251,6 +279,66 @@ class TimetableSlotResponse(TimetableSlotBase):
         from_attributes = True
 
 
+class TimetableGenerateRequest(BaseModel):
+    academic_year: str
+    semester: int = Field(..., ge=1, le=2)
+    # Scope: the given groups, a department's groups, or every group
+    department_id: Optional[int] = None
+    group_ids: Optional[List[int]] = None
+    # Weekly grid the sessions are placed on
+    days_per_week: int = Field(5, ge=1, le=7)
+    day_start: time = time(8, 0)
+    periods_per_day: int = Field(10, ge=1, le=24)
+    period_minutes: int = Field(60, ge=15, le=240)
+    max_session_periods: int = Field(2, ge=1, le=8)
+    time_limit: Optional[float] = Field(None, gt=0, le=600)
+    # Write what could be placed even if some sessions could not
+    allow_partial: bool = False
+    dry_run: bool = False
+
+
+class SessionGenerateRequest(BaseModel):
+    start_date: date
+    end_date: date
+    academic_year: Optional[str] = None
+    semester: Optional[int] = Field(None, ge=1, le=2)
+    # Only regenerate these slots' sessions
+    slot_ids: Optional[List[int]] = None
+
+
+# Longest makeup search window, about one term: the search walks it day by day
+MAKEUP_MAX_DAYS = 120
+
+
+class MakeupSearchRequest(BaseModel):
+    # Defaults: from the day after the request, for two weeks
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    days_per_week: int = Field(5, ge=1, le=7)
+    day_start: time = time(8, 0)
+    day_end: time = time(20, 0)
+    # Defaults to the cancelled session's length
+    duration_minutes: Optional[int] = Field(None, ge=15, le=480)
+    step_minutes: int = Field(30, ge=5, le=240)
+    # Defaults to the number of students in the group
+    min_capacity: Optional[int] = Field(None, ge=0)
+    room_type: Optional[str] = None
+    has_projector: Optional[bool] = None
+    has_computers: Optional[bool] = None
+    building: Optional[str] = None
+    limit: int = Field(5, ge=1, le=50)
+    # Book the earliest candidate that is still free
+    book: bool = False
+
+    @model_validator(mode="after")
+    def window_within_limit(self):
+        if self.end_date is not None:
+            start_date = self.start_date or date.today() + timedelta(days=1)
+            if (self.end_date - start_date).days > MAKEUP_MAX_DAYS:
+                raise ValueError(f"the search window can span at most {MAKEUP_MAX_DAYS} days")
+        return self
+
+
 # ===== Absence Schemas =====
 class AbsenceBase(BaseModel):
     absence_type: str = "unjustified"
@@ -0,0 +1,60 @@
+"""
+Fast JSON responses for large list endpoints.
+
+The joined list endpoints (students, teachers, department students) build
+plain dicts straight from typed SQL columns, so re-validating every row
+against response_model only burns CPU. rows_response() encodes the rows
+once with orjson (pydantic_core's Rust encoder when orjson is missing)
+and returns a ready Response, which FastAPI sends as-is. response_model
+stays on the route for the OpenAPI schema.
+
+Set VALIDATE_RESPONSES=true (tests, local runs) to validate each payload
+against its model before it is sent.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logging.getLogger(__name__).warning("orjson not installed, falling back to pydantic_core for JSON encoding")
+
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+_adapters: Dict[Type[BaseModel], TypeAdapter] = {}
+
+
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = _adapters[model] = TypeAdapter(List[model])
+    return adapter
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return to_json(content)
+
+
+def rows_response(rows: List[dict], model: Type[BaseModel], response: Response) -> Response:
+    """
+    Encode already-shaped rows without response_model re-validation,
+    keeping the headers and status set on the endpoint's Response.
+    """
+    if VALIDATE_RESPONSES:
+        adapter = _list_adapter(model)
+        body = adapter.dump_json(adapter.validate_python(rows))
+    else:
+        body = dumps(rows)
+    fast = Response(content=body, status_code=response.status_code or 200, media_type="application/json")
+    for name, value in response.headers.items():
+        if name not in ("content-length", "content-type"):
+            fast.headers[name] = value
+    return fast
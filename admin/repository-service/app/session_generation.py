@@ -0,0 +1,197 @@
+"""
+Materialise dated Session rows from the weekly timetable.
+
+Every active TimetableSlot in scope is expanded to one Session per week
+between start_date and end_date, minus the days closed by Events with
+affects_timetable. The closures are merged into sorted, disjoint date
+ranges and walked alongside the slot's weekly dates, so each slot costs
+O(weeks + closures).
+
+The run is a diff against what already exists, so it is idempotent and
+can be incremental:
+- Missing (slot, date) pairs are inserted. On Postgres with psycopg2
+  this uses batched COPY; elsewhere it uses multi-row INSERTs.
+- Sessions still scheduled whose slot moved to another time or room are
+  updated.
+- Sessions no longer wanted (slot deactivated, day changed, new
+  closure) are deleted. If absences were already recorded on one, it is
+  marked cancelled instead.
+- Makeup sessions and sessions someone already completed, cancelled or
+  rescheduled by hand are never touched.
+
+Passing slot_ids limits the run to those slots' sessions, e.g. after one
+slot was edited.
+"""
+import csv
+import io
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, exists, insert, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+SESSION_BATCH_SIZE = 5000
+
+# Advisory lock key (pg_advisory_xact_lock(int, int)) so two runs can't
+# insert the same sessions twice
+_GENERATION_LOCK = (0x54540010, 0)
+
+SESSION_COLUMNS = ("timetable_slot_id", "session_date", "start_time", "end_time", "room_id", "status",
+                   "is_makeup", "created_at", "updated_at")
+
+
+def closures(db: Session, start_date: date, end_date: date) -> List[Tuple[date, date]]:
+    """Closed date ranges (inclusive) overlapping [start_date, end_date], merged and sorted"""
+    events = db.query(models.Event.start_date, models.Event.end_date).filter(
+        models.Event.affects_timetable == True,
+        models.Event.start_date <= end_date,
+        models.Event.end_date >= start_date,
+    ).order_by(models.Event.start_date)
+    merged: List[Tuple[date, date]] = []
+    for first, last in events:
+        if merged and first <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def meeting_dates(day_of_week: int, start_date: date, end_date: date,
+                  closed: Sequence[Tuple[date, date]]) -> List[date]:
+    """Dates with isoweekday `day_of_week` in [start_date, end_date] that fall in no closure"""
+    current = start_date + timedelta(days=(day_of_week - start_date.isoweekday()) % 7)
+    position = 0
+    dates = []
+    while current <= end_date:
+        while position < len(closed) and closed[position][1] < current:
+            position += 1
+        if position < len(closed) and closed[position][0] <= current:
+            # Jump to the first meeting day after this closure
+            after = closed[position][1] + timedelta(days=1)
+            current = after + timedelta(days=(day_of_week - after.isoweekday()) % 7)
+            continue
+        dates.append(current)
+        current += timedelta(days=7)
+    return dates
+
+
+def _write_sessions(db: Session, rows: List[tuple]):
+    connection = db.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        cursor = connection.connection.cursor()
+        try:
+            for offset in range(0, len(rows), SESSION_BATCH_SIZE):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows[offset:offset + SESSION_BATCH_SIZE])
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY sessions ({', '.join(SESSION_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+        finally:
+            cursor.close()
+        return
+    for offset in range(0, len(rows), SESSION_BATCH_SIZE):
+        db.execute(insert(models.Session), [
+            dict(zip(SESSION_COLUMNS, row)) for row in rows[offset:offset + SESSION_BATCH_SIZE]
+        ])
+
+
+def _remove_sessions(db: Session, session_ids: List[int]) -> Tuple[int, int]:
+    """Delete sessions without absences, cancel the others; returns (deleted, cancelled)"""
+    deleted = cancelled = 0
+    has_absences = exists().where(models.Absence.session_id == models.Session.id)
+    for offset in range(0, len(session_ids), SESSION_BATCH_SIZE):
+        chunk = session_ids[offset:offset + SESSION_BATCH_SIZE]
+        deleted += db.execute(
+            delete(models.Session).where(models.Session.id.in_(chunk), ~has_absences)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        cancelled += db.execute(
+            update(models.Session).where(models.Session.id.in_(chunk))
+            .values(status="cancelled", cancellation_reason="Removed from the timetable")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return deleted, cancelled
+
+
+def generate_sessions(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    academic_year: Optional[str] = None,
+    semester: Optional[int] = None,
+    slot_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, int]:
+    """Bring the sessions of the slots in scope in line with the timetable; commits"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+                   {"namespace": _GENERATION_LOCK[0], "key": _GENERATION_LOCK[1]})
+
+    Slot = models.TimetableSlot
+    scope = []
+    if academic_year is not None:
+        scope.append(Slot.academic_year == academic_year)
+    if semester is not None:
+        scope.append(Slot.semester == semester)
+    if slot_ids is not None:
+        scope.append(Slot.id.in_(slot_ids))
+    # Inactive slots stay in scope so their leftover sessions are removed
+    slots = db.execute(
+        select(Slot.id, Slot.day_of_week, Slot.start_time, Slot.end_time, Slot.room_id, Slot.is_active).where(*scope)
+    ).all()
+
+    closed = closures(db, start_date, end_date)
+    wanted = {}
+    for slot in slots:
+        if slot.is_active:
+            for day in meeting_dates(slot.day_of_week, start_date, end_date, closed):
+                wanted[(slot.id, day)] = slot
+
+    existing = db.execute(
+        select(models.Session.id, models.Session.timetable_slot_id, models.Session.session_date,
+               models.Session.start_time, models.Session.end_time, models.Session.room_id,
+               models.Session.status)
+        .where(
+            models.Session.timetable_slot_id.in_(select(Slot.id).where(*scope)),
+            models.Session.session_date.between(start_date, end_date),
+            or_(models.Session.is_makeup == False, models.Session.is_makeup.is_(None)),
+        )
+    ).all()
+
+    changed, unwanted, seen = [], [], set()
+    for session in existing:
+        key = (session.timetable_slot_id, session.session_date)
+        seen.add(key)
+        if session.status != "scheduled":
+            continue
+        slot = wanted.get(key)
+        if slot is None:
+            unwanted.append(session.id)
+        elif (session.start_time, session.end_time, session.room_id) != (slot.start_time, slot.end_time, slot.room_id):
+            changed.append({"id": session.id, "start_time": slot.start_time, "end_time": slot.end_time,
+                            "room_id": slot.room_id})
+
+    now = datetime.now().replace(microsecond=0)
+    new_rows = [
+        (slot.id, day, slot.start_time, slot.end_time, slot.room_id, "scheduled", False, now, now)
+        for (slot_id, day), slot in sorted(wanted.items(), key=lambda item: item[0])
+        if (slot_id, day) not in seen
+    ]
+
+    _write_sessions(db, new_rows)
+    for offset in range(0, len(changed), SESSION_BATCH_SIZE):
+        db.execute(update(models.Session), changed[offset:offset + SESSION_BATCH_SIZE])
+    deleted, cancelled = _remove_sessions(db, unwanted)
+    db.commit()
+
+    return {
+        "slots": len(slots),
+        "closures": len(closed),
+        "created": len(new_rows),
+        "updated": len(changed),
+        "deleted": deleted,
+        "cancelled": cancelled,
+        "unchanged": len(existing) - len(changed) - len(unwanted),
+    }
@@ -0,0 +1,205 @@
+"""
+Bulk student import.
+
+A whole batch is validated with one IN (...) query per uniqueness or
+foreign-key rule, then users and students are inserted with multi-row
+INSERT ... RETURNING statements. Invalid rows are reported individually
+and never abort the valid ones. Passwords for new users are hashed as
+one batch spread over the hashing worker pool.
+"""
+import csv
+import io
+import json
+from typing import Dict, List
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .hashing import password_hasher
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+def parse_student_rows(content_type: str, body: bytes) -> List[dict]:
+    """Read a JSON array or CSV document into a list of raw row dicts"""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8-sig")
+        if content_type in ("text/csv", "application/csv"):
+            return [
+                {key.strip(): (value.strip() or None) if isinstance(value, str) else value
+                 for key, value in row.items() if key}
+                for row in csv.DictReader(io.StringIO(text))
+            ]
+        rows = json.loads(text)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse import body: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of students or a CSV document")
+    return rows
+
+
+def _default_password(student: schemas.StudentCreate) -> str:
+    # Same rule as create_student: CIN is the default password
+    return (student.password or student.cin).strip()
+
+
+def _existing(db: Session, column, values) -> set:
+    values = {value for value in values if value is not None}
+    if not values:
+        return set()
+    return set(db.execute(select(column).where(column.in_(values))).scalars())
+
+
+def validate_student_rows(db: Session, raw_rows: List[dict]):
+    """
+    Validate a batch with a fixed number of queries.
+
+    Returns (valid, errors) where valid is a list of (row_number,
+    StudentCreate) and errors a list of per-row error reports.
+    """
+    errors: Dict[int, List[str]] = {}
+    parsed = []
+    for number, raw in enumerate(raw_rows, start=1):
+        try:
+            parsed.append((number, schemas.StudentCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors[number] = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+
+    students = [student for _, student in parsed]
+    new_user_students = [student for student in students if not student.user_id]
+
+    known_groups = _existing(db, models.Group.id, (s.group_id for s in students))
+    known_specialties = _existing(db, models.Specialty.id, (s.specialty_id for s in students))
+    taken_numbers = _existing(db, models.Student.student_number, (s.student_number for s in students))
+    known_users = _existing(db, models.User.id, (s.user_id for s in students))
+    enrolled_users = _existing(db, models.Student.user_id, (s.user_id for s in students))
+    taken_cins = _existing(db, models.User.cin, (s.cin for s in new_user_students))
+    taken_emails = _existing(db, models.User.email, (s.email for s in new_user_students))
+
+    seen_numbers, seen_cins, seen_emails, seen_users = set(), set(), set(), set()
+    valid = []
+    for number, student in parsed:
+        problems = []
+        if student.group_id not in known_groups:
+            problems.append(f"Group with id {student.group_id} not found")
+        if student.specialty_id not in known_specialties:
+            problems.append(f"Specialty with id {student.specialty_id} not found")
+        if student.student_number in taken_numbers or student.student_number in seen_numbers:
+            problems.append(f"Student number {student.student_number} already exists")
+
+        if student.user_id:
+            if student.user_id not in known_users:
+                problems.append(f"User with id {student.user_id} not found")
+            elif student.user_id in enrolled_users or student.user_id in seen_users:
+                problems.append(f"User with id {student.user_id} is already a student")
+        else:
+            if student.cin in taken_cins or student.cin in seen_cins:
+                problems.append(f"User with CIN {student.cin} already exists")
+            if student.email in taken_emails or student.email in seen_emails:
+                problems.append(f"User with email {student.email} already exists")
+            if not _default_password(student):
+                problems.append("Password cannot be empty")
+
+        if problems:
+            errors[number] = problems
+            continue
+        seen_numbers.add(student.student_number)
+        if student.user_id:
+            seen_users.add(student.user_id)
+        else:
+            seen_cins.add(student.cin)
+            seen_emails.add(student.email)
+        valid.append((number, student))
+
+    error_reports = [{"row": number, "errors": problems} for number, problems in sorted(errors.items())]
+    return valid, error_reports
+
+
+def _user_values(student: schemas.StudentCreate, password_hash: str) -> dict:
+    return {
+        "email": student.email,
+        "first_name": student.first_name,
+        "last_name": student.last_name,
+        "cin": student.cin,
+        "password_hash": password_hash,
+        "role": "student",
+        "is_active": True,
+    }
+
+
+def _student_values(student: schemas.StudentCreate, user_id: int) -> dict:
+    return {
+        "user_id": user_id,
+        "student_number": student.student_number,
+        "group_id": student.group_id,
+        "specialty_id": student.specialty_id,
+        "enrollment_date": student.enrollment_date,
+        "date_of_birth": student.date_of_birth,
+        "phone": student.phone,
+        "address": student.address,
+    }
+
+
+def _insert_chunk(db: Session, chunk, password_hashes: Dict[str, str]) -> List[int]:
+    """Insert users then students for a chunk with two multi-row statements"""
+    new_users = [student for _, student in chunk if not student.user_id]
+    user_ids = {}
+    if new_users:
+        returned = db.execute(
+            insert(models.User).returning(models.User.id, models.User.cin, sort_by_parameter_order=True),
+            [_user_values(student, password_hashes[student.cin]) for student in new_users],
+        )
+        user_ids = {cin: user_id for user_id, cin in returned}
+
+    student_rows = [
+        _student_values(student, student.user_id or user_ids[student.cin])
+        for _, student in chunk
+    ]
+    returned = db.execute(
+        insert(models.Student).returning(models.Student.id, sort_by_parameter_order=True),
+        student_rows,
+    )
+    return list(returned.scalars())
+
+
+def import_students(db: Session, raw_rows: List[dict]) -> dict:
+    """Validate and insert a batch of students, returning a per-row report"""
+    valid, errors = validate_student_rows(db, raw_rows)
+    created = []
+
+    # Hash before writing anything, so a saturated pool (503) leaves no partial import
+    new_users = [student for _, student in valid if not student.user_id]
+    hashed = password_hasher.hash_many_blocking([_default_password(student) for student in new_users])
+    password_hashes = {student.cin: password_hash for student, password_hash in zip(new_users, hashed)}
+
+    for offset in range(0, len(valid), IMPORT_CHUNK_SIZE):
+        chunk = valid[offset:offset + IMPORT_CHUNK_SIZE]
+        try:
+            with db.begin_nested():
+                ids = _insert_chunk(db, chunk, password_hashes)
+            created.extend({"row": number, "id": student_id} for (number, _), student_id in zip(chunk, ids))
+        except IntegrityError:
+            # A concurrent writer took a key after validation: retry row by
+            # row so only the offending rows are reported.
+            for number, student in chunk:
+                try:
+                    with db.begin_nested():
+                        ids = _insert_chunk(db, [(number, student)], password_hashes)
+                    created.append({"row": number, "id": ids[0]})
+                except IntegrityError as e:
+                    errors.append({"row": number, "errors": [str(e.orig)]})
+
+    db.commit()
+    errors.sort(key=lambda report: report["row"])
+    return {
+        "total": len(raw_rows),
+        "created": len(created),
+        "failed": len(errors),
+        "students": created,
+        "errors": errors,
+    }
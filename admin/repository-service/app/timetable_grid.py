@@ -0,0 +1,169 @@
+"""
+Weekly timetable grids for a group or a teacher.
+
+Every student of a group sees the same week, so a grid is rendered once
+per (owner, academic_year, semester) from one eager-loaded query,
+encoded to JSON and kept in timetable_cache together with its ETag.
+Each group and each teacher has its own cache namespace ("group:12",
+"teacher:7"), and slot writes only invalidate the namespaces of the
+groups and teachers they touch. Concurrent misses for the same grid
+share one load, so a burst of students opening the app at 8 AM costs a
+single query.
+
+Renaming a subject, room or teacher does not invalidate grids; the TTL
+bounds how long the old name is shown.
+"""
+import asyncio
+import os
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from . import models
+from .cache import TTLCache
+from .conditional import Validators, content_validators
+from .occupancy import GROUP, TEACHER
+from .serialization import dumps
+
+DAY_NAMES = ["", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+timetable_cache = TTLCache(
+    "timetable",
+    maxsize=int(os.getenv("TIMETABLE_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("TIMETABLE_CACHE_TTL", "3600")),
+)
+
+
+class RenderedTimetable(NamedTuple):
+    body: bytes
+    validators: Validators
+
+
+# In-flight loads by (namespace, generation, term)
+_loading: Dict[tuple, "asyncio.Future"] = {}
+
+
+def _namespace(owner: str, owner_id: int) -> str:
+    return f"{owner}:{owner_id}"
+
+
+def invalidate_timetables(groups: Iterable[int] = (), teachers: Iterable[int] = ()):
+    """Drop the cached grids of these groups and teachers"""
+    timetable_cache.invalidate(
+        *(_namespace(GROUP, group_id) for group_id in set(groups)),
+        *(_namespace(TEACHER, teacher_id) for teacher_id in set(teachers)),
+    )
+
+
+def _slot_entry(slot: models.TimetableSlot) -> dict:
+    user = slot.teacher.user
+    return {
+        "id": slot.id,
+        "start_time": slot.start_time.strftime("%H:%M"),
+        "end_time": slot.end_time.strftime("%H:%M"),
+        "subject_id": slot.subject_id,
+        "subject_name": slot.subject.name,
+        "subject_code": slot.subject.code,
+        "room_id": slot.room_id,
+        "room_code": slot.room.code,
+        "room_name": slot.room.name,
+        "building": slot.room.building,
+        "teacher_id": slot.teacher_id,
+        "teacher_name": f"{user.first_name} {user.last_name}",
+        "group_id": slot.group_id,
+        "group_name": slot.group.name,
+        "academic_year": slot.academic_year,
+        "semester": slot.semester,
+    }
+
+
+async def _owner_name(db: AsyncSession, owner: str, owner_id: int) -> Optional[str]:
+    """Display name of a group or teacher; None when it does not exist"""
+    # execute() only: the DB_ASYNC_DRIVER=sync stand-in has no get()
+    if owner == GROUP:
+        statement = select(models.Group.name).where(models.Group.id == owner_id)
+    else:
+        statement = select(models.User.first_name + " " + models.User.last_name).join(
+            models.Teacher, models.Teacher.user_id == models.User.id
+        ).where(models.Teacher.id == owner_id)
+    return (await db.execute(statement)).scalar()
+
+
+async def _render(db: AsyncSession, owner: str, owner_id: int, academic_year: Optional[str],
+                  semester: Optional[int]) -> Optional[RenderedTimetable]:
+    Slot = models.TimetableSlot
+    statement = select(Slot).options(
+        joinedload(Slot.subject),
+        joinedload(Slot.room),
+        joinedload(Slot.group),
+        joinedload(Slot.teacher).joinedload(models.Teacher.user),
+    ).where(Slot.is_active == True, (Slot.group_id if owner == GROUP else Slot.teacher_id) == owner_id)
+    if academic_year is not None:
+        statement = statement.where(Slot.academic_year == academic_year)
+    if semester is not None:
+        statement = statement.where(Slot.semester == semester)
+    slots = (await db.execute(statement.order_by(Slot.day_of_week, Slot.start_time, Slot.id))).scalars().all()
+
+    if slots:
+        first = slots[0]
+        name = first.group.name if owner == GROUP else f"{first.teacher.user.first_name} {first.teacher.user.last_name}"
+    else:
+        # Only an empty week needs a second query, to tell it from a 404
+        name = await _owner_name(db, owner, owner_id)
+        if name is None:
+            return None
+
+    days = {day: [] for day in range(1, 8)}
+    for slot in slots:
+        days[slot.day_of_week].append(_slot_entry(slot))
+    body = dumps({
+        f"{owner}_id": owner_id,
+        "name": name,
+        "academic_year": academic_year,
+        "semester": semester,
+        "days": [{"day_of_week": day, "day_name": DAY_NAMES[day], "slots": entries} for day, entries in days.items()],
+    })
+    return RenderedTimetable(body, content_validators(body))
+
+
+async def weekly_timetable(db: AsyncSession, owner: str, owner_id: int, academic_year: Optional[str] = None,
+                           semester: Optional[int] = None) -> Optional[RenderedTimetable]:
+    """The rendered week of a group or teacher (owner GROUP / TEACHER); None when it does not exist"""
+    namespace, term = _namespace(owner, owner_id), (academic_year, semester)
+    cached = timetable_cache.get(namespace, term)
+    if cached is not None:
+        return cached
+
+    generation = timetable_cache.generation(namespace)
+    flight = (namespace, generation, term)
+    pending = _loading.get(flight)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+        except Exception:
+            pass
+        # The shared load failed or was cancelled; try on our own
+
+    future = _loading[flight] = asyncio.get_running_loop().create_future()
+    try:
+        rendered = await _render(db, owner, owner_id, academic_year, semester)
+    except Exception as error:
+        future.set_exception(error)
+        # Mark it retrieved: there may be no waiter to do it
+        future.exception()
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        if _loading.get(flight) is future:
+            del _loading[flight]
+    future.set_result(rendered)
+    if rendered is not None:
+        timetable_cache.set(namespace, term, rendered, generation=generation)
+    return rendered
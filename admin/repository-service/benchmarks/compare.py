@@ -0,0 +1,73 @@
+"""
+Diff two benchmark result files written by benchmarks.run.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.10]
+
+Exits with status 1 when an endpoint's p95 latency grows by more than
+--threshold, its throughput drops by more than --threshold, or it runs
+more SQL statements per request than in the baseline.
+"""
+import argparse
+import json
+import sys
+
+COLUMNS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "statements_per_request")
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before if before else 0.0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    """Return (table rows, regressions)"""
+    rows, regressions = [], []
+    for name, after in candidate["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            rows.append((name, "new", {}))
+            continue
+        changes = {column: _change(before[column], after[column]) for column in COLUMNS}
+        rows.append((name, "", {column: (before[column], after[column], changes[column]) for column in COLUMNS}))
+        if changes["p95_ms"] > threshold:
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {after['p95_ms']} ms")
+        if changes["throughput_rps"] < -threshold:
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {after['throughput_rps']} req/s")
+        if after["statements_per_request"] > before["statements_per_request"]:
+            regressions.append(
+                f"{name}: statements/request {before['statements_per_request']} -> {after['statements_per_request']}"
+            )
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {after['errors']}")
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default 0.10)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline {baseline['meta'].get('commit')}  candidate {candidate['meta'].get('commit')}")
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, note, values in rows:
+        if note:
+            print(f"{name:<30} {note}")
+            continue
+        cells = "  ".join(f"{column} {before:g}->{after:g} ({change:+.0%})" for column, (before, after, change) in values.items())
+        print(f"{name:<30} {cells}")
+
+    if regressions:
+        print("\nregressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Check that the hot queries use indexes.
+
+Applies pending migrations, seeds the database with benchmarks.generate
+when it is empty, refreshes planner statistics and runs EXPLAIN for each
+query the services issue on their hot paths:
+
+    python -m benchmarks.explain --database postgresql://postgres:pw@localhost/capacity
+    python -m benchmarks.explain --database sqlite:////tmp/explain.db --students 5000 --teachers 200
+
+Exits with status 1 when a plan reads one of the query's guarded tables
+with a sequential scan (Postgres "Seq Scan", SQLite "SCAN"). Only tables
+a query is selective on are guarded: Postgres is right to scan a small
+lookup table or most of a large one. Run it on generated volumes, not a
+handful of rows, or the planner will (correctly) prefer scans.
+
+tests/test_query_plans.py runs the same check on a small generated
+SQLite database, and on Postgres when EXPLAIN_POSTGRES_URL is set.
+"""
+import argparse
+import json
+import os
+import re
+from dataclasses import dataclass, fields
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, text
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@dataclass
+class HotQuery:
+    name: str
+    guarded: Tuple[str, ...]
+    # sample values -> statement
+    build: Callable[[Dict], object]
+
+
+def hot_queries() -> List[HotQuery]:
+    from app import models
+    Slot, Session = models.TimetableSlot, models.Session
+
+    def conflicts(s):
+        slot = s["slot"]
+        return select(Slot.id, Slot.room_id, Slot.teacher_id, Slot.group_id, Slot.start_time, Slot.end_time).where(
+            Slot.is_active == True,
+            Slot.academic_year == slot.academic_year,
+            Slot.semester == slot.semester,
+            Slot.day_of_week == slot.day_of_week,
+            Slot.start_time < slot.end_time,
+            Slot.end_time > slot.start_time,
+            or_(Slot.room_id == slot.room_id, Slot.teacher_id == slot.teacher_id, Slot.group_id == slot.group_id),
+        )
+
+    return [
+        HotQuery("department students", ("users",), lambda s: (
+            select(models.Student, models.Specialty.name, models.User.email)
+            .join(models.Specialty, models.Student.specialty_id == models.Specialty.id)
+            .join(models.User, models.Student.user_id == models.User.id)
+            .where(models.Specialty.department_id == s["department_id"])
+            .order_by(models.Student.id)
+        )),
+        HotQuery("group delete foreign key check", ("students",), lambda s: (
+            select(models.Student.id).where(models.Student.group_id == s["group_id"]).limit(1)
+        )),
+        HotQuery("room availability window", ("timetable_slots",), lambda s: (
+            select(Slot).where(
+                Slot.is_active == True,
+                Slot.day_of_week == s["slot"].day_of_week,
+                Slot.start_time <= s["slot"].end_time,
+                Slot.end_time >= s["slot"].start_time,
+            ).order_by(Slot.day_of_week, Slot.start_time)
+        )),
+        HotQuery("slot conflicts", ("timetable_slots",), conflicts),
+        HotQuery("teacher timetable", ("timetable_slots",), lambda s: (
+            select(Slot).where(Slot.is_active == True, Slot.teacher_id == s["slot"].teacher_id)
+            .order_by(Slot.day_of_week, Slot.start_time)
+        )),
+        HotQuery("sessions of a slot", ("sessions",), lambda s: (
+            select(Session).where(
+                Session.timetable_slot_id == s["session"].timetable_slot_id,
+                Session.session_date >= s["session"].session_date,
+                Session.session_date < s["session"].session_date + timedelta(days=28),
+            )
+        )),
+        HotQuery("sessions in a room on a date", ("sessions",), lambda s: (
+            select(Session).where(
+                Session.session_date == s["session"].session_date, Session.room_id == s["session"].room_id
+            )
+        )),
+        HotQuery("student absences", ("absences", "sessions"), lambda s: (
+            select(models.Absence, Session.session_date)
+            .join(Session, models.Absence.session_id == Session.id)
+            .where(models.Absence.student_id == s["absence_student_id"])
+        )),
+        HotQuery("student absence requests", ("absence_requests",), lambda s: (
+            select(models.AbsenceRequest).where(
+                models.AbsenceRequest.student_id == s["request_student_id"],
+                models.AbsenceRequest.status == "pending",
+            )
+        )),
+        HotQuery("student grades in a subject", ("grades",), lambda s: (
+            select(models.Grade).where(
+                models.Grade.student_id == s["grade"].student_id, models.Grade.subject_id == s["grade"].subject_id
+            )
+        )),
+        HotQuery("unread notifications", ("notifications",), lambda s: (
+            select(models.Notification).where(
+                models.Notification.user_id == s["notification_user_id"], models.Notification.is_read == False
+            )
+        )),
+        HotQuery("unread messages", ("messages",), lambda s: (
+            select(models.Message).where(
+                models.Message.recipient_id == s["message_recipient_id"], models.Message.is_read == False
+            )
+        )),
+    ]
+
+
+def sample_values(connection) -> Dict:
+    """Real ids to plug into the queries; a key is missing when its table is empty"""
+    from app import models
+
+    def first(statement):
+        return connection.execute(statement.limit(1)).first()
+
+    samples = {}
+    candidates = {
+        "department_id": select(models.Department.id).order_by(models.Department.id),
+        "group_id": select(models.Student.group_id).order_by(models.Student.id),
+        "slot": select(models.TimetableSlot).where(models.TimetableSlot.is_active == True)
+        .order_by(models.TimetableSlot.id),
+        "session": select(models.Session).order_by(models.Session.id),
+        "absence_student_id": select(models.Absence.student_id).order_by(models.Absence.id),
+        "request_student_id": select(models.AbsenceRequest.student_id).order_by(models.AbsenceRequest.id),
+        "grade": select(models.Grade).order_by(models.Grade.id),
+        "notification_user_id": select(models.Notification.user_id).order_by(models.Notification.id),
+        "message_recipient_id": select(models.Message.recipient_id).order_by(models.Message.id),
+    }
+    for key, statement in candidates.items():
+        row = first(statement)
+        if row is not None:
+            # Whole-table selects come back as plain rows here (no ORM session)
+            samples[key] = row if len(row) > 1 else row[0]
+    return samples
+
+
+def _pg_seq_scans(node: dict) -> List[str]:
+    found = [node["Relation Name"]] if node.get("Node Type") == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        found += _pg_seq_scans(child)
+    return found
+
+
+def explain(connection, statement) -> Tuple[List[str], List[str]]:
+    """Returns (plan lines, tables read with a sequential scan)"""
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "postgresql":
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        lines = connection.execute(text(f"EXPLAIN {sql}")).scalars().all()
+        return lines, _pg_seq_scans(plan[0]["Plan"])
+
+    details = [row[3] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    scans = [match.group(1) for match in map(_SQLITE_SCAN.match, details) if match]
+    return details, scans
+
+
+def check(engine, verbose: bool = False) -> List[str]:
+    """Run every hot query through EXPLAIN; returns the failures"""
+    failures = []
+    with engine.connect() as connection:
+        samples = sample_values(connection)
+        for query in hot_queries():
+            try:
+                statement = query.build(samples)
+            except KeyError as missing:
+                print(f"{'skip':<5} {query.name}: no rows to sample {missing}")
+                continue
+            lines, scans = explain(connection, statement)
+            bad = sorted(set(scans) & set(query.guarded))
+            print(f"{'FAIL' if bad else 'ok':<5} {query.name}" + (f": sequential scan on {', '.join(bad)}" if bad else ""))
+            if bad or verbose:
+                for line in lines:
+                    print(f"        {line}")
+            failures += [f"{query.name}: {table}" for table in bad]
+    return failures
+
+
+def _is_empty(engine) -> bool:
+    from sqlalchemy import inspect
+    from app import models
+    if not inspect(engine).has_table(models.Student.__tablename__):
+        return True
+    with engine.connect() as connection:
+        return not connection.execute(select(func.count()).select_from(models.Student)).scalar()
+
+
+def main(argv: Optional[List[str]] = None):
+    from benchmarks.generate import Profile
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", required=True, help="DATABASE_URL; seeded with benchmarks.generate if empty")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only failing ones")
+    for field in fields(Profile):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=field.default)
+    args = parser.parse_args(argv)
+
+    # Read by app.database at import time
+    os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from app import migrations
+    from app.database import engine
+    from benchmarks.generate import generate
+
+    if _is_empty(engine):
+        profile = Profile(**{field.name: getattr(args, field.name) for field in fields(Profile)})
+        generate(args.database, profile, args.seed, args.workers, drop=False)
+    applied = migrations.upgrade(engine)
+    if applied:
+        print(f"applied migrations {', '.join(applied)}")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+    failures = check(engine, args.verbose)
+    if failures:
+        raise SystemExit(f"\n{len(failures)} hot query plan(s) fell back to a sequential scan")
+
+
+if __name__ == "__main__":
+    main()
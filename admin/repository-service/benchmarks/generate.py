@@ -0,0 +1,593 @@
+"""
+Synthetic data generator for capacity planning.
+
+Fills every table of app.models with realistic, deterministic volumes
+(the defaults give ~84k users, 80k students, 3k teachers, ~10k
+timetable slots, ~140k sessions, ~170k absences and ~1.3M grades):
+
+    python -m benchmarks.generate --database postgresql://postgres:pw@localhost/capacity \\
+        --students 80000 --teachers 3000 --weeks 14 --workers 8 --drop
+
+Reference data and the timetable are planned in this process (slots are
+placed without room, teacher or group double-booking); users, students,
+teachers, sessions, absences, grades, notifications and messages are
+then generated in fixed-size partitions by worker processes and written
+with COPY ... FROM STDIN. Partitions have their own random stream, so
+the output depends on --seed only, not on --workers. Every
+CheckConstraint of models.py is respected.
+
+Non-Postgres databases (SQLite for a quick local run) get multi-row
+INSERTs in a single process. The target database must be empty, or
+use --drop: rows are written with explicit ids and sequences are
+moved past them afterwards.
+"""
+import argparse
+import csv
+import io
+import math
+import multiprocessing
+import os
+import random
+import time
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, fields
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+PARTITION_SLOTS = 250
+PARTITION_ROWS = 10000
+COPY_BUFFER_ROWS = 50000
+# Absence ids are partition * ABSENCE_ID_STRIDE + n so workers never collide
+ABSENCE_ID_STRIDE = 1_000_000
+
+CELLS = [(day, hour) for day in range(1, 6) for hour in (8, 10, 12, 14, 16)]
+ABSENCE_TYPES = (("unjustified", 0.6), ("justified", 0.3), ("pending", 0.1))
+EXAM_TYPES = ("midterm", "final", "practical", "project", "quiz")
+
+
+@dataclass
+class Profile:
+    departments: int = 8
+    specialties_per_department: int = 4
+    levels_per_specialty: int = 3
+    subjects_per_level: int = 8
+    students: int = 80000
+    students_per_group: int = 25
+    teachers: int = 3000
+    admins: int = 20
+    rooms: int = 500
+    slots_per_teacher: float = 3.4
+    weeks: int = 14
+    cancel_rate: float = 0.02
+    absence_rate: float = 0.06
+    request_rate: float = 0.5
+    exams_per_subject: int = 2
+    messages_per_teacher: int = 10
+    academic_year: str = "2024-2025"
+    semester: int = 1
+    semester_start: str = "2024-09-16"
+
+    def validate(self):
+        if not 1 <= self.levels_per_specialty <= 5:
+            raise ValueError("levels_per_specialty must be between 1 and 5 (check_year_number)")
+        if self.semester not in (1, 2):
+            raise ValueError("semester must be 1 or 2")
+        if not 1 <= self.exams_per_subject <= len(EXAM_TYPES):
+            raise ValueError(f"exams_per_subject must be between 1 and {len(EXAM_TYPES)}")
+        if date.fromisoformat(self.semester_start).isoweekday() != 1:
+            raise ValueError("semester_start must be a Monday")
+
+
+# ============================================
+# OUTPUT
+# ============================================
+
+class Writer:
+    """COPY on psycopg2 connections, multi-row INSERT everywhere else"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.copy = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+    def __enter__(self):
+        if self.copy:
+            self.connection = self.engine.raw_connection()
+        else:
+            self.connection = self.engine.connect()
+            self.transaction = self.connection.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.copy:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        elif exc_type is None:
+            self.transaction.commit()
+        else:
+            self.transaction.rollback()
+        self.connection.close()
+
+    def write(self, table: str, columns: Tuple[str, ...], rows: Iterable[tuple]) -> int:
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= COPY_BUFFER_ROWS:
+                count += self._flush(table, columns, batch)
+                batch = []
+        return count + (self._flush(table, columns, batch) if batch else 0)
+
+    def _flush(self, table, columns, batch) -> int:
+        if self.copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            with self.connection.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            from sqlalchemy import insert
+            from app.database import Base
+            self.connection.execute(insert(Base.metadata.tables[table]), [dict(zip(columns, row)) for row in batch])
+        return len(batch)
+
+
+# ============================================
+# PLAN (reference data and timetable, built in the parent)
+# ============================================
+
+@dataclass
+class Plan:
+    profile: Profile
+    seed: int
+    now: datetime
+    password_hash: str
+    first_teacher_user: int
+    first_student_user: int
+    group_level: List[int]              # group index -> level id
+    level_specialty: List[int]          # level index -> specialty id
+    specialty_department: List[int]     # specialty index -> department id
+    level_subjects: Dict[int, List[int]]
+    group_bounds: List[int]             # students of group g: ids bounds[g]+1 .. bounds[g+1]
+    teacher_department: List[int]       # teacher index -> department id
+    slots: List[tuple]                  # (id, subject, teacher, group, room, day, hour)
+
+
+def _rng(seed: int, *scope) -> random.Random:
+    return random.Random(f"{seed}:{':'.join(map(str, scope))}")
+
+
+def build_plan(profile: Profile, seed: int, password_hash: str) -> Plan:
+    rng = _rng(seed, "plan")
+    departments = profile.departments
+    specialties = departments * profile.specialties_per_department
+    levels = specialties * profile.levels_per_specialty
+
+    # Group sizes vary +-20% around students_per_group
+    low = max(1, int(profile.students_per_group * 0.8))
+    high = max(low, int(profile.students_per_group * 1.2))
+    bounds = [0]
+    while bounds[-1] < profile.students:
+        bounds.append(min(profile.students, bounds[-1] + rng.randint(low, high)))
+    groups = len(bounds) - 1
+
+    level_subjects = {
+        level: list(range((level - 1) * profile.subjects_per_level + 1, level * profile.subjects_per_level + 1))
+        for level in range(1, levels + 1)
+    }
+    plan = Plan(
+        profile=profile, seed=seed, now=datetime.now().replace(microsecond=0), password_hash=password_hash,
+        first_teacher_user=departments + profile.admins + 1,
+        first_student_user=departments + profile.admins + profile.teachers + 1,
+        group_level=[g % levels + 1 for g in range(groups)],
+        level_specialty=[level // profile.levels_per_specialty + 1 for level in range(levels)],
+        specialty_department=[s // profile.specialties_per_department + 1 for s in range(specialties)],
+        level_subjects=level_subjects,
+        group_bounds=bounds,
+        teacher_department=[t % departments + 1 for t in range(profile.teachers)],
+        slots=[],
+    )
+    plan.slots = _place_slots(plan, rng)
+    return plan
+
+
+def _group_department(plan: Plan, group: int) -> int:
+    level = plan.group_level[group - 1]
+    return plan.specialty_department[plan.level_specialty[level - 1] - 1]
+
+
+def _place_slots(plan: Plan, rng: random.Random) -> List[tuple]:
+    """Greedy placement with no room, teacher or group double-booking"""
+    profile = plan.profile
+    groups_by_department: Dict[int, List[int]] = {}
+    for group in range(1, len(plan.group_level) + 1):
+        groups_by_department.setdefault(_group_department(plan, group), []).append(group)
+
+    free_rooms = {cell: rng.sample(range(1, profile.rooms + 1), profile.rooms) for cell in range(len(CELLS))}
+    busy = set()
+    slots = []
+    for k in range(round(profile.teachers * profile.slots_per_teacher)):
+        teacher = k % profile.teachers + 1
+        candidates = groups_by_department.get(plan.teacher_department[teacher - 1])
+        if not candidates:
+            continue
+        for _ in range(5):
+            group = rng.choice(candidates)
+            cells = rng.sample(range(len(CELLS)), len(CELLS))
+            cell = next((
+                c for c in cells
+                if free_rooms[c] and ("t", teacher, c) not in busy and ("g", group, c) not in busy
+            ), None)
+            if cell is not None:
+                break
+        else:
+            continue
+        busy.update((("t", teacher, cell), ("g", group, cell)))
+        room = free_rooms[cell].pop()
+        subject = rng.choice(plan.level_subjects[plan.group_level[group - 1]])
+        day, hour = CELLS[cell]
+        slots.append((len(slots) + 1, subject, teacher, group, room, day, hour))
+    return slots
+
+
+# ============================================
+# ROWS
+# ============================================
+
+USER_COLUMNS = ("id", "email", "password_hash", "first_name", "last_name", "role", "cin",
+                "is_active", "is_verified", "created_at", "updated_at")
+
+
+def _users(plan: Plan, start: int, end: int):
+    profile = plan.profile
+    rng = _rng(plan.seed, "users", start)
+    for user_id in range(start, end):
+        if user_id <= profile.departments:
+            role, prefix = "department_head", "head"
+        elif user_id < plan.first_teacher_user:
+            role, prefix = "admin", "admin"
+        elif user_id < plan.first_student_user:
+            role, prefix = "teacher", "teacher"
+        else:
+            role, prefix = "student", "student"
+        yield (user_id, f"{prefix}{user_id}@university.example.com", plan.password_hash,
+               rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), role, f"{user_id:08d}",
+               True, rng.random() < 0.9, plan.now, plan.now)
+
+
+def _reference_tables(plan: Plan):
+    profile = plan.profile
+    rng = _rng(plan.seed, "reference")
+    now = plan.now
+    yield "departments", ("id", "name", "code", "description", "head_id", "created_at", "updated_at"), [
+        (d, f"Department {d}", f"DEP{d:03d}", None, d, now, now) for d in range(1, profile.departments + 1)
+    ]
+    yield "specialties", ("id", "name", "code", "department_id", "created_at", "updated_at"), [
+        (s, f"Specialty {s}", f"SPE{s:04d}", department, now, now)
+        for s, department in enumerate(plan.specialty_department, start=1)
+    ]
+    yield "levels", ("id", "name", "code", "specialty_id", "year_number", "created_at"), [
+        (level, f"Year {(level - 1) % profile.levels_per_specialty + 1}", f"LVL{level:05d}", specialty,
+         (level - 1) % profile.levels_per_specialty + 1, now)
+        for level, specialty in enumerate(plan.level_specialty, start=1)
+    ]
+    yield "groups", ("id", "name", "code", "level_id", "max_students", "created_at"), [
+        (g, f"Group {g}", f"GRP{g:05d}", level, plan.group_bounds[g] - plan.group_bounds[g - 1] + 5, now)
+        for g, level in enumerate(plan.group_level, start=1)
+    ]
+    yield "subjects", ("id", "name", "code", "level_id", "credits", "hours_per_week", "subject_type",
+                       "created_at", "updated_at"), [
+        (subject, f"Subject {subject}", f"SUB{subject:06d}", level, rng.randint(2, 6), rng.choice((2, 3, 4)),
+         rng.choice(("theory", "practical", "mixed")), now, now)
+        for level, subjects in plan.level_subjects.items() for subject in subjects
+    ]
+    yield "rooms", ("id", "code", "name", "building", "floor", "capacity", "room_type", "has_projector",
+                    "has_computers", "is_available", "created_at", "updated_at"), [
+        (r, f"R{r:05d}", f"Room {r}", f"Building {chr(65 + r % 6)}", r % 5,
+         rng.choice((24, 30, 40, 60, 120, 250)), rng.choice(("classroom", "lab", "amphitheater", "workshop")),
+         rng.random() < 0.7, rng.random() < 0.3, True, now, now)
+        for r in range(1, profile.rooms + 1)
+    ]
+    start = date.fromisoformat(profile.semester_start)
+    yield "events", ("id", "title", "event_type", "start_date", "end_date", "affects_timetable",
+                     "created_by", "created_at", "updated_at"), [
+        (1, "Autumn break", "holiday", start + timedelta(weeks=6), start + timedelta(weeks=6, days=4), True, 1, now, now),
+        (2, "Midterm exams", "exam", start + timedelta(weeks=7), start + timedelta(weeks=7, days=4), True, 1, now, now),
+        (3, "Research day", "conference", start + timedelta(weeks=3, days=2), start + timedelta(weeks=3, days=2),
+         False, 1, now, now),
+    ]
+
+
+def _timetable_tables(plan: Plan):
+    profile, now = plan.profile, plan.now
+    yield "timetable_slots", ("id", "subject_id", "teacher_id", "group_id", "room_id", "day_of_week",
+                              "start_time", "end_time", "academic_year", "semester", "is_active",
+                              "created_at", "updated_at"), [
+        (slot_id, subject, teacher, group, room, day, dt_time(hour), dt_time(hour + 2),
+         profile.academic_year, profile.semester, True, now, now)
+        for slot_id, subject, teacher, group, room, day, hour in plan.slots
+    ]
+    assignments = sorted({(teacher, subject, group) for _, subject, teacher, group, _, _, _ in plan.slots})
+    yield "teacher_subjects", ("id", "teacher_id", "subject_id", "group_id", "academic_year", "semester",
+                               "created_at"), [
+        (i, teacher, subject, group, profile.academic_year, profile.semester, now)
+        for i, (teacher, subject, group) in enumerate(assignments, start=1)
+    ]
+
+
+TEACHER_COLUMNS = ("id", "user_id", "employee_id", "department_id", "specialization", "phone", "hire_date",
+                   "created_at", "updated_at")
+STUDENT_COLUMNS = ("id", "user_id", "student_number", "group_id", "specialty_id", "enrollment_date",
+                   "date_of_birth", "phone", "created_at", "updated_at")
+
+
+def _teachers(plan: Plan, start: int, end: int):
+    rng = _rng(plan.seed, "teachers", start)
+    for teacher in range(start, end):
+        yield (teacher, plan.first_teacher_user + teacher - 1, f"EMP{teacher:06d}",
+               plan.teacher_department[teacher - 1], rng.choice(SPECIALIZATIONS), f"+216{rng.randint(10**7, 10**8 - 1)}",
+               date(rng.randint(1995, 2024), rng.randint(1, 12), 1), plan.now, plan.now)
+
+
+def _students(plan: Plan, start: int, end: int):
+    rng = _rng(plan.seed, "students", start)
+    bounds = plan.group_bounds
+    group = _group_of(plan, start)
+    for student in range(start, end):
+        while student > bounds[group]:
+            group += 1
+        level = plan.group_level[group - 1]
+        year = (level - 1) % plan.profile.levels_per_specialty
+        yield (student, plan.first_student_user + student - 1, f"STU{student:07d}", group,
+               plan.level_specialty[level - 1], date(2024 - year, 9, 1),
+               date(2005 - year - rng.randint(0, 3), rng.randint(1, 12), rng.randint(1, 28)),
+               f"+216{rng.randint(10**7, 10**8 - 1)}", plan.now, plan.now)
+
+
+def _group_of(plan: Plan, student: int) -> int:
+    return bisect_left(plan.group_bounds, student)
+
+
+SESSION_COLUMNS = ("id", "timetable_slot_id", "session_date", "start_time", "end_time", "room_id", "status",
+                   "cancellation_reason", "is_makeup", "created_at", "updated_at")
+ABSENCE_COLUMNS = ("id", "student_id", "session_id", "absence_type", "marked_at", "marked_by",
+                   "created_at", "updated_at")
+REQUEST_COLUMNS = ("absence_id", "student_id", "request_reason", "status", "reviewed_by", "reviewed_at",
+                   "created_at", "updated_at")
+NOTIFICATION_COLUMNS = ("user_id", "title", "message", "notification_type", "is_read", "related_entity_type",
+                        "related_entity_id", "created_at")
+
+
+def _attendance(plan: Plan, partition: int, writer: Writer) -> Dict[str, int]:
+    """Sessions of a range of slots, with their absences, requests and notifications"""
+    profile = plan.profile
+    rng = _rng(plan.seed, "attendance", partition)
+    start = date.fromisoformat(profile.semester_start)
+    slots = plan.slots[partition * PARTITION_SLOTS:(partition + 1) * PARTITION_SLOTS]
+    weighted_types = [name for name, share in ABSENCE_TYPES for _ in range(int(share * 10))]
+
+    sessions, absences, requests, notifications = [], [], [], []
+    absence_id = partition * ABSENCE_ID_STRIDE
+    for slot_id, _, teacher, group, room, day, hour in slots:
+        for week in range(profile.weeks):
+            session_id = (slot_id - 1) * profile.weeks + week + 1
+            session_date = start + timedelta(weeks=week, days=day - 1)
+            cancelled = rng.random() < profile.cancel_rate
+            sessions.append((session_id, slot_id, session_date, dt_time(hour), dt_time(hour + 2), room,
+                             "cancelled" if cancelled else "completed",
+                             "Teacher unavailable" if cancelled else None, False, plan.now, plan.now))
+            if cancelled:
+                continue
+            marked_at = datetime.combine(session_date, dt_time(hour, 15))
+            for student in range(plan.group_bounds[group - 1] + 1, plan.group_bounds[group] + 1):
+                if rng.random() >= profile.absence_rate:
+                    continue
+                absence_id += 1
+                absence_type = rng.choice(weighted_types)
+                absences.append((absence_id, student, session_id, absence_type, marked_at, teacher,
+                                 marked_at, marked_at))
+                user_id = plan.first_student_user + student - 1
+                notifications.append((user_id, "New absence", f"You were marked absent on {session_date}",
+                                      "absence", rng.random() < 0.7, "absence", absence_id, marked_at))
+                # Pending absences always have an open request; the others
+                # have a reviewed one at request_rate
+                if absence_type == "pending":
+                    status = "pending"
+                elif rng.random() < profile.request_rate:
+                    status = "approved" if absence_type == "justified" else "rejected"
+                else:
+                    continue
+                reviewed = status != "pending"
+                requests.append((absence_id, student, "Medical appointment", status,
+                                 teacher if reviewed else None,
+                                 marked_at + timedelta(days=2) if reviewed else None,
+                                 marked_at + timedelta(days=1), marked_at + timedelta(days=1)))
+    return {
+        "sessions": writer.write("sessions", SESSION_COLUMNS, sessions),
+        "absences": writer.write("absences", ABSENCE_COLUMNS, absences),
+        "absence_requests": writer.write("absence_requests", REQUEST_COLUMNS, requests),
+        "notifications": writer.write("notifications", NOTIFICATION_COLUMNS, notifications),
+    }
+
+
+GRADE_COLUMNS = ("student_id", "subject_id", "exam_type", "score", "max_score", "exam_date", "academic_year",
+                 "semester", "created_at", "updated_at")
+
+
+def _grades(plan: Plan, start: int, end: int):
+    profile = plan.profile
+    rng = _rng(plan.seed, "grades", start)
+    exam_date = date.fromisoformat(profile.semester_start) + timedelta(weeks=profile.weeks)
+    group = _group_of(plan, start)
+    for student in range(start, end):
+        while student > plan.group_bounds[group]:
+            group += 1
+        ability = rng.gauss(0, 2)
+        for subject in plan.level_subjects[plan.group_level[group - 1]]:
+            for exam_type in EXAM_TYPES[:profile.exams_per_subject]:
+                score = min(20.0, max(0.0, rng.gauss(11.5 + ability, 3)))
+                yield (student, subject, exam_type, Decimal(f"{score:.2f}"), Decimal("20.00"), exam_date,
+                       profile.academic_year, profile.semester, plan.now, plan.now)
+
+
+MESSAGE_COLUMNS = ("sender_id", "recipient_id", "subject", "content", "is_read", "created_at", "read_at")
+
+
+def _messages(plan: Plan, start: int, end: int):
+    rng = _rng(plan.seed, "messages", start)
+    students = plan.profile.students
+    for teacher in range(start, end):
+        sender = plan.first_teacher_user + teacher - 1
+        for _ in range(plan.profile.messages_per_teacher):
+            recipient = plan.first_student_user + rng.randrange(students)
+            sent = plan.now - timedelta(days=rng.randint(1, 90), minutes=rng.randint(0, 1440))
+            read = rng.random() < 0.6
+            yield (sender, recipient, "Course update", "Please check the updated course material.", read,
+                   sent, sent + timedelta(hours=rng.randint(1, 48)) if read else None)
+
+
+FIRST_NAMES = ("Amine", "Sarra", "Youssef", "Ines", "Mohamed", "Yasmine", "Omar", "Nour", "Ali", "Meriem",
+               "Karim", "Salma", "Hamza", "Rania", "Mehdi", "Emna", "Aziz", "Olfa", "Bilel", "Hela")
+LAST_NAMES = ("Ben Ali", "Trabelsi", "Jaziri", "Gharbi", "Mansouri", "Hamdi", "Bouazizi", "Khelifi", "Saidi",
+              "Ayari", "Dridi", "Chaabane", "Mejri", "Ferchichi", "Sassi", "Riahi")
+SPECIALIZATIONS = ("Algorithms", "Databases", "Networks", "Statistics", "Analysis", "Physics", "Electronics",
+                   "Software Engineering", "Machine Learning", "Management")
+
+
+# ============================================
+# EXECUTION
+# ============================================
+
+_plan = None
+_engine = None
+
+
+def _init_worker(plan: Plan, database_url: str):
+    global _plan, _engine
+    from sqlalchemy import create_engine
+    _plan = plan
+    _engine = create_engine(database_url, pool_size=1, max_overflow=0)
+
+
+def _run_task(task) -> Dict[str, int]:
+    kind, start, end = task
+    with Writer(_engine) as writer:
+        if kind == "users":
+            return {"users": writer.write("users", USER_COLUMNS, _users(_plan, start, end))}
+        if kind == "teachers":
+            return {"teachers": writer.write("teachers", TEACHER_COLUMNS, _teachers(_plan, start, end))}
+        if kind == "students":
+            return {"students": writer.write("students", STUDENT_COLUMNS, _students(_plan, start, end))}
+        if kind == "attendance":
+            return _attendance(_plan, start, writer)
+        if kind == "grades":
+            return {"grades": writer.write("grades", GRADE_COLUMNS, _grades(_plan, start, end))}
+        if kind == "messages":
+            return {"messages": writer.write("messages", MESSAGE_COLUMNS, _messages(_plan, start, end))}
+    raise ValueError(kind)
+
+
+def _ranges(kind: str, first: int, last: int, size: int = PARTITION_ROWS) -> List[tuple]:
+    return [(kind, start, min(start + size, last + 1)) for start in range(first, last + 1, size)]
+
+
+def _run_phase(name: str, tasks: List[tuple], pool, totals: Dict[str, int]):
+    started = time.perf_counter()
+    results = pool.imap_unordered(_run_task, tasks) if pool else map(_run_task, tasks)
+    for counts in results:
+        for table, count in counts.items():
+            totals[table] = totals.get(table, 0) + count
+    print(f"{name:<12} {len(tasks):5d} partitions  {time.perf_counter() - started:7.1f}s")
+
+
+def _finish(engine):
+    """Move id sequences past the explicit ids and refresh planner statistics"""
+    from sqlalchemy import text
+    from app import models
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for table in models.Base.metadata.sorted_tables:
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"GREATEST((SELECT max(id) FROM {table.name}), 1))"
+            ))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+
+def generate(database_url: str, profile: Profile, seed: int, workers: int, drop: bool) -> Dict[str, int]:
+    from app import models
+    from app.auth import hash_password
+    from app.database import engine
+
+    profile.validate()
+    if drop:
+        models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+    plan = build_plan(profile, seed, hash_password("password"))
+    print(f"planned {len(plan.slots)} slots for {profile.teachers} teachers, {len(plan.group_level)} groups")
+
+    if not Writer(engine).copy:
+        workers = 1
+    _init_worker(plan, database_url)
+    pool = multiprocessing.Pool(workers, _init_worker, (plan, database_url)) if workers > 1 else None
+
+    totals: Dict[str, int] = {}
+    started = time.perf_counter()
+    try:
+        total_users = plan.first_student_user + profile.students - 1
+        _run_phase("users", _ranges("users", 1, total_users), pool, totals)
+
+        with Writer(engine) as writer:
+            for table, columns, rows in _reference_tables(plan):
+                totals[table] = writer.write(table, columns, rows)
+
+        _run_phase("people", _ranges("teachers", 1, profile.teachers) + _ranges("students", 1, profile.students),
+                   pool, totals)
+
+        with Writer(engine) as writer:
+            for table, columns, rows in _timetable_tables(plan):
+                totals[table] = writer.write(table, columns, rows)
+
+        partitions = math.ceil(len(plan.slots) / PARTITION_SLOTS)
+        _run_phase(
+            "activity",
+            [("attendance", p, p + 1) for p in range(partitions)]
+            + _ranges("grades", 1, profile.students, PARTITION_ROWS // 10)
+            + _ranges("messages", 1, profile.teachers, PARTITION_ROWS // 10),
+            pool, totals,
+        )
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    _finish(engine)
+    print(f"wrote {sum(totals.values())} rows in {time.perf_counter() - started:.1f}s")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", required=True, help="target DATABASE_URL (empty or disposable)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--drop", action="store_true", help="drop and recreate every table first")
+    for field in fields(Profile):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=field.default)
+    args = parser.parse_args()
+
+    # Read by app.database at import time
+    os.environ["DATABASE_URL"] = args.database
+    profile = Profile(**{field.name: getattr(args, field.name) for field in fields(Profile)})
+    print(f"profile: {asdict(profile)}")
+    totals = generate(args.database, profile, args.seed, args.workers, args.drop)
+    for table, count in sorted(totals.items()):
+        print(f"  {table:<18} {count:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Load benchmark for the repository service.
+
+Seeds a disposable database, drives the app with concurrent HTTP
+requests per scenario and writes latency percentiles, throughput and
+SQL statements per request to a JSON file that compare.py can diff.
+
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+    python -m benchmarks.run --database postgresql://postgres:pw@localhost:5433/bench \\
+        --students 50000 --concurrency 32 --requests 2000 --output after.json
+    python -m benchmarks.compare baseline.json after.json
+
+By default the app runs in-process behind httpx's ASGI transport, so no
+server is needed and the client's own overhead is included in every
+latency. --url points the load at a running server instead (seed the
+same database with --database, or pass --no-seed). The database must
+be empty or disposable: it is seeded with explicit ids.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+_STATEMENT_COUNT = re.compile(r"^db_statement_duration_seconds_count\{[^}]*\} ([0-9.e+]+)$", re.MULTILINE)
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # request number -> (path, json body)
+    build: Callable[[int], Tuple[str, Optional[dict]]]
+
+
+def scenarios(volumes, first_student: int) -> List[Scenario]:
+    counter = itertools.count(first_student)
+
+    def new_student(_):
+        n = next(counter)
+        return "/api/students", {
+            "student_number": f"BENCH{n:07d}", "group_id": 1 + n % volumes.groups_per_level, "specialty_id": 1,
+            "enrollment_date": "2024-09-01", "email": f"bench{n}@bench.example.com",
+            "first_name": "Bench", "last_name": f"B{n}", "cin": f"B{n:08d}",
+        }
+
+    # The first groups_per_level groups belong to level 1 of specialty 1
+    return [
+        Scenario("GET /api/students", "GET", lambda i: ("/api/students?limit=100", None)),
+        Scenario("GET /api/teachers", "GET", lambda i: ("/api/teachers?limit=100", None)),
+        Scenario(
+            "GET /api/rooms/availability", "GET",
+            lambda i: (f"/api/rooms/availability?date=2024-10-{7 + i % 5:02d}&time_slot={8 + i % 10:02d}:00-{9 + i % 10:02d}:00", None),
+        ),
+        Scenario("POST /api/students", "POST", new_student),
+    ]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def statement_count(client) -> float:
+    response = await client.get("/metrics")
+    return sum(float(value) for value in _STATEMENT_COUNT.findall(response.text))
+
+
+async def drive(client, scenario: Scenario, requests: int, concurrency: int):
+    """Returns (latencies, error count, first error, elapsed seconds)"""
+    numbers = iter(range(requests))
+    latencies: List[float] = []
+    errors = 0
+    first_error = None
+
+    async def worker():
+        nonlocal errors, first_error
+        for number in numbers:
+            path, body = scenario.build(number)
+            started = time.perf_counter()
+            response = await client.request(scenario.method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+                first_error = first_error or f"{response.status_code} {response.text[:200]}"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, first_error, time.perf_counter() - started
+
+
+async def run_scenarios(client, args, volumes) -> Dict[str, dict]:
+    results = {}
+    for scenario in scenarios(volumes, first_student=volumes.students + 1):
+        if args.only and not any(part in scenario.name for part in args.only):
+            continue
+        await drive(client, scenario, args.warmup, min(args.concurrency, max(args.warmup, 1)))
+        statements_before = await statement_count(client)
+        latencies, errors, first_error, elapsed = await drive(client, scenario, args.requests, args.concurrency)
+        statements = await statement_count(client) - statements_before
+        latencies.sort()
+        results[scenario.name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "statements_per_request": round(statements / len(latencies), 2),
+            "first_error": first_error,
+        }
+        result = results[scenario.name]
+        print(f"{scenario.name:<30} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+              f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s  "
+              f"{result['statements_per_request']:6.2f} stmt/req  {errors} errors")
+        if first_error:
+            print(f"{'':<30} first error: {first_error}")
+    return results
+
+
+async def run(args, volumes) -> Dict[str, dict]:
+    import httpx
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            return await run_scenarios(client, args, volumes)
+
+    from app.main import app
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await run_scenarios(client, args, volumes)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    from benchmarks.seed import Volumes
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="DATABASE_URL to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--no-seed", action="store_true", help="use the database as it is")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--only", action="append", help="run scenarios whose name contains this (repeatable)")
+    parser.add_argument("--output", help="write results as JSON here")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the generated data")
+    for field in fields(Volumes):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, default=field.default)
+    args = parser.parse_args()
+
+    if args.database is None and args.url is None:
+        args.database = f"sqlite:///{tempfile.mkdtemp(prefix='repository-bench-')}/bench.db"
+    if args.database:
+        # Read by app.database at import time
+        os.environ["DATABASE_URL"] = args.database
+        if args.database.startswith("sqlite"):
+            os.environ.setdefault("DB_ASYNC_DRIVER", "aiosqlite")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    volumes = Volumes(**{field.name: getattr(args, field.name) for field in fields(Volumes)})
+    counts = None
+    if not args.no_seed:
+        if not args.database:
+            parser.error("--url needs --database to seed, or --no-seed")
+        from app.database import engine
+        from benchmarks.seed import seed
+        started = time.perf_counter()
+        counts = seed(engine, volumes, args.seed)
+        print(f"seeded {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s")
+
+    results = asyncio.run(run(args, volumes))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": args.url or "in-process",
+            "database": (args.database or "").split("://", 1)[0] or None,
+            "python": sys.version.split()[0],
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "volumes": volumes.as_dict(),
+            "rows": counts,
+        },
+        "endpoints": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Time the timetable generator on a synthetic department.
+
+    python -m benchmarks.scheduler [--groups 300] [--workers 4] [--seed 1]
+
+Builds an app.scheduler.Problem directly (no database): groups spread
+over 4 specialties x 3 years with 8 subjects of 2-4 hours per level,
+enough teachers for about 18 hours a week each, and `--rooms` rooms
+(default: 40% more room-hours than the week needs). The schedule is then
+checked for double-bookings and for missing hours.
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+
+from app.occupancy import GROUP, ROOM, TEACHER
+from app.scheduler import SUBJECT_ROOM_TYPES, Course, Grid, Problem, run_search
+
+LEVELS = 12
+SUBJECTS_PER_LEVEL = 8
+TEACHER_HOURS = 18
+ROOM_TYPES = ("classroom", "classroom", "amphitheater", "lab", "workshop")
+
+
+def make_problem(groups: int, rooms: int, seed: int) -> Problem:
+    rng = random.Random(seed)
+    grid = Grid()
+    subjects = [
+        (level, level * SUBJECTS_PER_LEVEL + s + 1, rng.choice((2, 3, 4)), rng.choice(tuple(SUBJECT_ROOM_TYPES)))
+        for level in range(LEVELS) for s in range(SUBJECTS_PER_LEVEL)
+    ]
+    group_size = {group: rng.randint(20, 30) for group in range(1, groups + 1)}
+    total_hours = sum(hours for level, _, hours, _ in subjects) * groups / LEVELS
+    rooms = rooms or int(total_hours / grid.size * 1.4) + 1
+    room_list = [(room, rng.choice(ROOM_TYPES), rng.choice((30, 30, 40, 60, 120))) for room in range(1, rooms + 1)]
+    room_list.sort(key=lambda room: (room[2], room[0]))
+
+    courses, teacher, load = [], 0, TEACHER_HOURS
+    for level, subject, hours, subject_type in subjects:
+        allowed = SUBJECT_ROOM_TYPES[subject_type]
+        for group in range(level + 1, groups + 1, LEVELS):
+            if load + hours > TEACHER_HOURS:
+                teacher, load = teacher + 1, 0
+            load += hours
+            courses.append(Course(
+                subject_id=subject, teacher_id=teacher, group_id=group, periods=grid.periods(hours),
+                rooms=tuple(room for room, room_type, capacity in room_list
+                            if capacity >= group_size[group] and (allowed is None or room_type in allowed)),
+            ))
+    return Problem(grid, courses)
+
+
+def verify(problem: Problem, attempt) -> list:
+    """Double-bookings and courses missing hours; empty when the schedule is sound"""
+    taken, errors = {}, []
+    hours = defaultdict(int)
+    for course_index, start, length, room_id in attempt.placements:
+        course = problem.courses[course_index]
+        hours[course_index] += length
+        for period in range(start, start + length):
+            for key in ((ROOM, room_id), (TEACHER, course.teacher_id), (GROUP, course.group_id)):
+                if (key, period) in taken:
+                    errors.append(f"{key} double-booked at period {period}")
+                taken[(key, period)] = course_index
+    for index, course in enumerate(problem.courses):
+        if hours[index] != course.periods and not attempt.unplaced:
+            errors.append(f"course {index} got {hours[index]} of {course.periods} periods")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=300)
+    parser.add_argument("--rooms", type=int, default=0, help="default: 40%% spare room-hours")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--time-limit", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    problem = make_problem(args.groups, args.rooms, args.seed)
+    sessions = len(problem.sessions())
+    teachers = len({course.teacher_id for course in problem.courses})
+    print(f"{args.groups} groups, {len(problem.courses)} courses, {sessions} sessions, {teachers} teachers")
+
+    started = time.perf_counter()
+    attempt, attempts = run_search(problem, args.workers, args.time_limit, args.seed)
+    elapsed = time.perf_counter() - started
+    errors = verify(problem, attempt)
+    print(f"placed {len(attempt.placements)}/{sessions} sessions in {elapsed:.2f}s "
+          f"({attempts} attempts, {len(attempt.unplaced)} unplaced, {len(errors)} errors)")
+    for error in errors[:10]:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
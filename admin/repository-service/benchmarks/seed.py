@@ -0,0 +1,123 @@
+"""
+Deterministic bulk seeding of a disposable database for benchmarks.
+
+Rows get explicit ids (the database is expected to be empty), are written
+with multi-row INSERTs, and Postgres sequences are moved past them so the
+app's own inserts keep working afterwards.
+"""
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, time
+from typing import Dict, List
+
+from sqlalchemy import insert, text
+
+ACADEMIC_YEAR = "2024-2025"
+BATCH_SIZE = 5000
+
+
+@dataclass
+class Volumes:
+    departments: int = 5
+    specialties_per_department: int = 4
+    levels_per_specialty: int = 3
+    groups_per_level: int = 4
+    subjects_per_level: int = 8
+    rooms: int = 120
+    teachers: int = 400
+    students: int = 10000
+    slots: int = 3000
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def _write(connection, model, rows: List[dict]):
+    for offset in range(0, len(rows), BATCH_SIZE):
+        connection.execute(insert(model), rows[offset:offset + BATCH_SIZE])
+
+
+def seed(engine, volumes: Volumes, seed_value: int = 42) -> Dict[str, int]:
+    """Create the schema and fill it; returns the row count per table"""
+    # Imported here: app.database reads DATABASE_URL at import time, and
+    # the runner only sets it after parsing its arguments
+    from app import models
+
+    rng = random.Random(seed_value)
+    models.Base.metadata.create_all(bind=engine)
+
+    departments = [
+        {"id": i, "name": f"Department {i}", "code": f"D{i:03d}"}
+        for i in range(1, volumes.departments + 1)
+    ]
+    specialties = [
+        {"id": i, "name": f"Specialty {i}", "code": f"SP{i:04d}",
+         "department_id": (i - 1) // volumes.specialties_per_department + 1}
+        for i in range(1, volumes.departments * volumes.specialties_per_department + 1)
+    ]
+    levels = [
+        {"id": i, "name": f"L{(i - 1) % volumes.levels_per_specialty + 1}", "code": f"LV{i:04d}",
+         "specialty_id": (i - 1) // volumes.levels_per_specialty + 1,
+         "year_number": (i - 1) % volumes.levels_per_specialty + 1}
+        for i in range(1, len(specialties) * volumes.levels_per_specialty + 1)
+    ]
+    groups = [
+        {"id": i, "name": f"Group {i}", "code": f"G{i:05d}",
+         "level_id": (i - 1) // volumes.groups_per_level + 1, "max_students": 30}
+        for i in range(1, len(levels) * volumes.groups_per_level + 1)
+    ]
+    subjects = [
+        {"id": i, "name": f"Subject {i}", "code": f"SU{i:05d}",
+         "level_id": (i - 1) // volumes.subjects_per_level + 1,
+         "hours_per_week": rng.choice((2, 3, 4)), "subject_type": rng.choice(("theory", "practical", "mixed"))}
+        for i in range(1, len(levels) * volumes.subjects_per_level + 1)
+    ]
+    rooms = [
+        {"id": i, "code": f"R{i:04d}", "name": f"Room {i}", "building": f"B{i % 4}", "floor": i % 5,
+         "capacity": rng.choice((20, 30, 40, 60, 120)), "room_type": rng.choice(("classroom", "lab", "amphitheater")),
+         "has_projector": rng.random() < 0.7, "has_computers": rng.random() < 0.3, "is_available": True}
+        for i in range(1, volumes.rooms + 1)
+    ]
+
+    users, teachers, students = [], [], []
+    for i in range(1, volumes.teachers + 1):
+        users.append({"id": len(users) + 1, "email": f"teacher{i}@bench.example.com", "password_hash": "x",
+                      "first_name": "Teacher", "last_name": f"T{i}", "role": "teacher", "cin": f"T{i:08d}"})
+        teachers.append({"id": i, "user_id": len(users), "employee_id": f"EMP{i:06d}",
+                         "department_id": rng.randint(1, len(departments))})
+    for i in range(1, volumes.students + 1):
+        users.append({"id": len(users) + 1, "email": f"student{i}@bench.example.com", "password_hash": "x",
+                      "first_name": "Student", "last_name": f"S{i}", "role": "student", "cin": f"S{i:08d}"})
+        group = rng.choice(groups)
+        level = levels[group["level_id"] - 1]
+        students.append({"id": i, "user_id": len(users), "student_number": f"STU{i:07d}",
+                         "group_id": group["id"], "specialty_id": level["specialty_id"],
+                         "enrollment_date": date(2024, 9, 1)})
+
+    # Slots are spread over rooms x weekdays x 8:00-18:00 two-hour blocks;
+    # teachers and groups may overlap, which is fine for read benchmarks
+    cells = [(room["id"], day, hour) for room in rooms for day in range(1, 6) for hour in range(8, 18, 2)]
+    rng.shuffle(cells)
+    slots = [
+        {"id": i, "subject_id": rng.randint(1, len(subjects)), "teacher_id": rng.randint(1, len(teachers)),
+         "group_id": rng.randint(1, len(groups)), "room_id": room_id, "day_of_week": day,
+         "start_time": time(hour, 0), "end_time": time(hour + 2, 0),
+         "academic_year": ACADEMIC_YEAR, "semester": 1, "is_active": True}
+        for i, (room_id, day, hour) in enumerate(cells[:volumes.slots], start=1)
+    ]
+
+    tables = [
+        (models.Department, departments), (models.Specialty, specialties), (models.Level, levels),
+        (models.Group, groups), (models.Subject, subjects), (models.Room, rooms), (models.User, users),
+        (models.Teacher, teachers), (models.Student, students), (models.TimetableSlot, slots),
+    ]
+    with engine.begin() as connection:
+        for model, rows in tables:
+            _write(connection, model, rows)
+        if engine.dialect.name == "postgresql":
+            for model, rows in tables:
+                if rows:
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), {len(rows)})"
+                    ))
+    return {model.__tablename__: len(rows) for model, rows in tables}
@@ -0,0 +1,116 @@
+"""
+Test setup: the app runs on a throwaway SQLite database. Dependencies
+are in requirements-dev.txt.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+# The app reads its configuration at import time
+_DB_DIR = tempfile.mkdtemp(prefix="repository-service-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/test.db")
+os.environ.setdefault("DB_ASYNC_DRIVER", "aiosqlite")
+os.environ.setdefault("HASH_WORKERS", "1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+_serial = itertools.count(1)
+
+
+class Factory:
+    """Creates rows with unique codes in the shared test database"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _next(self) -> str:
+        return str(next(_serial))
+
+    def add(self, instance):
+        self.db.add(instance)
+        self.db.commit()
+        self.db.refresh(instance)
+        return instance
+
+    def level(self):
+        from app import models
+
+        tag = self._next()
+        department = self.add(models.Department(name=f"Department {tag}", code=f"D{tag}"))
+        specialty = self.add(models.Specialty(name=f"Specialty {tag}", code=f"S{tag}", department_id=department.id))
+        return self.add(models.Level(name=f"Level {tag}", code=f"L{tag}", specialty_id=specialty.id, year_number=1))
+
+    def group(self, level=None, **values):
+        from app import models
+
+        tag = self._next()
+        level = level or self.level()
+        return self.add(models.Group(name=values.pop("name", f"Group {tag}"), code=f"G{tag}", level_id=level.id,
+                                     **values))
+
+    def subject(self, level, **values):
+        from app import models
+
+        tag = self._next()
+        values.setdefault("subject_type", "theory")
+        return self.add(models.Subject(name=values.pop("name", f"Subject {tag}"), code=f"SUB{tag}",
+                                       level_id=level.id, **values))
+
+    def teacher(self, department_id=None):
+        from app import models
+
+        tag = self._next()
+        if department_id is None:
+            department_id = self.add(models.Department(name=f"Department {tag}", code=f"TD{tag}")).id
+        user = self.add(models.User(email=f"teacher{tag}@example.com", password_hash="x", first_name="Ada",
+                                    last_name=f"Teacher {tag}", role="teacher", cin=f"CIN{tag}"))
+        return self.add(models.Teacher(user_id=user.id, employee_id=f"E{tag}", department_id=department_id))
+
+    def room(self, **values):
+        from app import models
+
+        tag = self._next()
+        values.setdefault("capacity", 40)
+        values.setdefault("room_type", "classroom")
+        return self.add(models.Room(code=f"R{tag}", name=f"Room {tag}", **values))
+
+    def slot(self, subject, teacher, group, room, **values):
+        from app import models
+        from datetime import time
+
+        values.setdefault("day_of_week", 1)
+        values.setdefault("start_time", time(8, 0))
+        values.setdefault("end_time", time(10, 0))
+        values.setdefault("academic_year", "2024-2025")
+        values.setdefault("semester", 1)
+        return self.add(models.TimetableSlot(subject_id=subject.id, teacher_id=teacher.id, group_id=group.id,
+                                             room_id=room.id, **values))
+
+
+@pytest.fixture
+def factory(db):
+    return Factory(db)
@@ -0,0 +1,85 @@
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import auth, cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable clock for auth and the caches; starts at the real time"""
+    clock = SimpleNamespace(now=time.time())
+    fake = SimpleNamespace(time=lambda: clock.now, monotonic=lambda: clock.now)
+    monkeypatch.setattr(auth, "time", fake)
+    monkeypatch.setattr(cache, "time", fake)
+    auth.token_cache.clear()
+    auth.revoked_tokens.clear()
+    return clock
+
+
+def _token(exp: float) -> str:
+    return jwt.encode({"userId": 1, "email": "a@example.com", "role": "admin", "exp": int(exp)},
+                      auth.JWT_SECRET, algorithm="HS256")
+
+
+def _verify(token: str) -> dict:
+    return auth.verify_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+
+def test_revocation_lasts_until_the_token_expires(clock):
+    expires_at = clock.now + 3 * 86400
+    token = _token(expires_at)
+    assert _verify(token)["userId"] == 1
+
+    auth.revoke_token(token, expires_at=expires_at)
+    # Past the revocation cache's default ttl, before the token's exp
+    clock.now += 86400 + 60
+    with pytest.raises(HTTPException) as error:
+        _verify(token)
+    assert error.value.detail == "Token has been revoked"
+
+
+def test_revoking_an_expired_token_stores_nothing(clock):
+    auth.revoke_token(_token(clock.now - 10), expires_at=clock.now - 10)
+    assert len(auth.revoked_tokens) == 0
+
+
+def test_capped_cache_keeps_the_ceiling(clock):
+    capped = cache.TTLCache("capped", ttl=10)
+    capped.set("ns", "key", 1, ttl=100)
+    clock.now += 11
+    assert capped.get("ns", "key") is None
+
+
+def test_full_revocation_store_never_drops_a_live_revocation(clock, monkeypatch):
+    monkeypatch.setattr(auth, "revoked_tokens", auth.RevocationList(maxsize=3))
+    expires_at = clock.now + 3600
+    tokens = [_token(expires_at + offset) for offset in range(4)]
+    for token in tokens[:3]:
+        auth.revoke_token(token, expires_at=expires_at)
+
+    with pytest.raises(auth.RevocationStoreFull):
+        auth.revoke_token(tokens[3], expires_at=expires_at)
+    for token in tokens[:3]:
+        with pytest.raises(HTTPException) as error:
+            _verify(token)
+        assert error.value.detail == "Token has been revoked"
+
+
+def test_full_revocation_store_makes_room_from_expired_entries(clock, monkeypatch):
+    monkeypatch.setattr(auth, "revoked_tokens", auth.RevocationList(maxsize=2))
+    auth.revoke_token(_token(clock.now + 60), expires_at=clock.now + 60)
+    kept = _token(clock.now + 3600)
+    auth.revoke_token(kept, expires_at=clock.now + 3600)
+
+    clock.now += 120
+    fresh = _token(clock.now + 3600)
+    auth.revoke_token(fresh, expires_at=clock.now + 3600)
+    assert len(auth.revoked_tokens) == 2
+    for token in (kept, fresh):
+        with pytest.raises(HTTPException):
+            _verify(token)
@@ -0,0 +1,45 @@
+from datetime import time
+from types import SimpleNamespace
+
+from app.free_rooms import FreeRoomIndex
+from app.occupancy import OccupancyIndex
+
+
+def _room(room_id, capacity=30, has_projector=False, has_computers=False):
+    return SimpleNamespace(id=room_id, capacity=capacity, code=f"R{room_id}", name=None, building="A", floor=0,
+                           room_type="classroom", has_projector=has_projector, has_computers=has_computers,
+                           is_available=True)
+
+
+def _index():
+    occupancy = OccupancyIndex()
+    occupancy.load([])
+    index = FreeRoomIndex(occupancy)
+    index.load([
+        _room(1),
+        _room(2, has_projector=True),
+        _room(3, has_computers=True),
+        _room(4, has_projector=True, has_computers=True),
+    ], [])
+    return index
+
+
+def _search(index, **filters):
+    return [room.id for room in index.search(1, time(8, 0), time(10, 0), **filters)]
+
+
+def test_equipment_filters_true():
+    index = _index()
+    assert _search(index, has_projector=True) == [2, 4]
+    assert _search(index, has_computers=True) == [3, 4]
+
+
+def test_equipment_filters_false():
+    index = _index()
+    assert _search(index, has_projector=False) == [1, 3]
+    assert _search(index, has_computers=False) == [1, 2]
+    assert _search(index, has_projector=False, has_computers=False) == [1]
+
+
+def test_equipment_filters_unset():
+    assert _search(_index()) == [1, 2, 3, 4]
@@ -0,0 +1,54 @@
+from sqlalchemy import update
+
+from app import models
+
+WINDOW = "start_date=2024-09-02&end_date=2024-12-20"
+
+
+def _feed(client, path, etag=None):
+    return client.get(f"{path}?{WINDOW}", headers={"If-None-Match": etag} if etag else {})
+
+
+def _setup(factory):
+    level = factory.level()
+    group = factory.group(level, name="Group Before")
+    subject = factory.subject(level, name="Subject Before")
+    factory.slot(subject, factory.teacher(), group, factory.room(), day_of_week=2, academic_year="2024-2025")
+    return group, subject
+
+
+def test_unchanged_feed_is_not_modified(client, factory):
+    group, _ = _setup(factory)
+    path = f"/api/groups/{group.id}/timetable.ics"
+    first = _feed(client, path)
+    assert first.status_code == 200
+    assert "BEGIN:VEVENT" in first.text
+    assert _feed(client, path, first.headers["ETag"]).status_code == 304
+
+
+def test_renaming_a_group_changes_the_etag(client, db, factory):
+    group, _ = _setup(factory)
+    path = f"/api/groups/{group.id}/timetable.ics"
+    etag = _feed(client, path).headers["ETag"]
+
+    # Groups have no updated_at to go by
+    db.execute(update(models.Group).where(models.Group.id == group.id).values(name="Group After"))
+    db.commit()
+    response = _feed(client, path, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Group After" in response.text
+
+
+def test_renaming_a_subject_changes_the_etag(client, db, factory):
+    group, subject = _setup(factory)
+    path = f"/api/groups/{group.id}/timetable.ics"
+    etag = _feed(client, path).headers["ETag"]
+
+    # Even when the write leaves updated_at alone
+    db.execute(update(models.Subject).where(models.Subject.id == subject.id)
+               .values(name="Subject After", updated_at=models.Subject.updated_at))
+    db.commit()
+    response = _feed(client, path, etag)
+    assert response.status_code == 200
+    assert "SUMMARY:Subject After" in response.text
@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from app.schemas import MAKEUP_MAX_DAYS
+
+
+def test_makeup_search_rejects_windows_longer_than_a_term(client):
+    response = client.post("/api/sessions/999999/makeup", json={
+        "start_date": "2025-01-06", "end_date": "2030-01-06",
+    })
+    assert response.status_code == 422
+
+
+def test_makeup_search_caps_the_default_start_too(client):
+    end_date = date.today() + timedelta(days=MAKEUP_MAX_DAYS + 2)
+    response = client.post("/api/sessions/999999/makeup", json={"end_date": end_date.isoformat()})
+    assert response.status_code == 422
+
+
+def test_makeup_search_accepts_windows_within_the_cap(client):
+    start_date = date(2025, 1, 6)
+    response = client.post("/api/sessions/999999/makeup", json={
+        "start_date": start_date.isoformat(),
+        "end_date": (start_date + timedelta(days=MAKEUP_MAX_DAYS)).isoformat(),
+    })
+    # Past validation: the session does not exist
+    assert response.status_code == 404
@@ -0,0 +1,60 @@
+"""
+The hot queries' plans must keep using indexes (benchmarks/explain.py).
+
+Each database is seeded in a subprocess: benchmarks.generate writes
+through the app's engine, which here is bound to the shared test
+database.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from benchmarks.explain import check
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Set to run the same check on Postgres (the database is seeded when empty)
+POSTGRES_URL = os.getenv("EXPLAIN_POSTGRES_URL")
+
+
+def _seed_and_check(database_url: str, *volumes: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "HASH_WORKERS": "1"}
+    return subprocess.run(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.explain", "--database", database_url, "--workers", "1",
+         *volumes],
+        cwd=SERVICE_DIR, env=env, capture_output=True, text=True, timeout=600,
+    )
+
+
+@pytest.fixture(scope="module")
+def sqlite_url(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('explain')}/explain.db"
+    result = _seed_and_check(url, "--students", "3000", "--teachers", "120")
+    assert result.returncode == 0, result.stdout + result.stderr
+    return url
+
+
+def test_hot_queries_use_indexes_on_sqlite(sqlite_url):
+    engine = create_engine(sqlite_url)
+    try:
+        assert check(engine) == []
+    finally:
+        engine.dispose()
+
+
+def test_a_dropped_index_is_reported(sqlite_url):
+    engine = create_engine(sqlite_url)
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_notifications_user_read"))
+        assert check(engine) == ["unread notifications: notifications"]
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="EXPLAIN_POSTGRES_URL is not set")
+def test_hot_queries_use_indexes_on_postgres():
+    result = _seed_and_check(POSTGRES_URL)
+    assert result.returncode == 0, result.stdout + result.stderr
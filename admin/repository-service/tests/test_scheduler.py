@@ -0,0 +1,40 @@
+from datetime import time
+
+from app import models
+from app.scheduler import generate_schedule, write_schedule
+
+
+def _overlaps(slot, other) -> bool:
+    return (slot.day_of_week == other.day_of_week and slot.start_time < other.end_time
+            and slot.end_time > other.start_time)
+
+
+def test_generation_keeps_slots_of_unstaffed_subjects(db, factory):
+    academic_year = "2091-2092"
+    level = factory.level()
+    group = factory.group(level)
+    staffed = factory.subject(level, hours_per_week=2)
+    unstaffed = factory.subject(level, hours_per_week=2)
+    teacher, other_teacher = factory.teacher(), factory.teacher()
+    room = factory.room()
+    factory.add(models.TeacherSubject(teacher_id=teacher.id, subject_id=staffed.id, group_id=group.id,
+                                      academic_year=academic_year, semester=1))
+    old_staffed = factory.slot(staffed, teacher, group, room, day_of_week=3, academic_year=academic_year)
+    # Placed by hand: nobody is assigned to the subject in TeacherSubject
+    kept = factory.slot(unstaffed, other_teacher, group, room, day_of_week=1, start_time=time(8, 0),
+                        end_time=time(10, 0), academic_year=academic_year)
+
+    schedule = generate_schedule(db, academic_year, 1, [group], workers=1, time_limit=5)
+    assert schedule.unstaffed == [{"group_id": group.id, "subject_id": unstaffed.id}]
+    write_schedule(db, schedule)
+    db.expire_all()
+
+    active = db.query(models.TimetableSlot).filter(
+        models.TimetableSlot.group_id == group.id, models.TimetableSlot.is_active == True,
+    ).all()
+    assert kept.id in {slot.id for slot in active}
+    assert db.get(models.TimetableSlot, old_staffed.id).is_active is False
+    generated = [slot for slot in active if slot.subject_id == staffed.id]
+    assert generated
+    # The kept slot was fixed occupancy for the group
+    assert not any(_overlaps(slot, kept) for slot in generated)
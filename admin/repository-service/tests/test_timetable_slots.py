@@ -0,0 +1,63 @@
+import pytest
+
+
+@pytest.mark.parametrize("field", ["room_id", "teacher_id", "day_of_week", "start_time", "academic_year"])
+def test_update_rejects_null_for_required_columns(client, factory, field):
+    level = factory.level()
+    group = factory.group(level)
+    slot = factory.slot(factory.subject(level), factory.teacher(), group, factory.room(), day_of_week=2)
+
+    response = client.put(f"/api/timetable-slots/{slot.id}", json={field: None})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", field]
+
+
+def test_update_accepts_omitted_fields(client, factory):
+    level = factory.level()
+    group = factory.group(level)
+    slot = factory.slot(factory.subject(level), factory.teacher(), group, factory.room(), day_of_week=2)
+
+    response = client.put(f"/api/timetable-slots/{slot.id}", json={"day_of_week": 4})
+    assert response.status_code == 200
+    assert response.json()["day_of_week"] == 4
+
+
+def _payload(subject, teacher, group, room, **values):
+    payload = {"subject_id": subject.id, "teacher_id": teacher.id, "group_id": group.id, "room_id": room.id,
+               "day_of_week": 5, "start_time": "14:00", "end_time": "16:00", "academic_year": "2024-2025",
+               "semester": 1}
+    payload.update(values)
+    return payload
+
+
+def test_create_ignores_a_conflict_only_this_process_still_sees(client, db, factory):
+    from app import models
+
+    level = factory.level()
+    group, subject, teacher, room = factory.group(level), factory.subject(level), factory.teacher(), factory.room()
+    created = client.post("/api/timetable-slots", json=_payload(subject, teacher, group, room))
+    assert created.status_code == 201
+
+    # Another worker moves it: this process's occupancy index still has it at 14:00
+    db.query(models.TimetableSlot).filter(models.TimetableSlot.id == created.json()["id"]).update(
+        {"day_of_week": 3}, synchronize_session=False
+    )
+    db.commit()
+
+    response = client.post("/api/timetable-slots", json=_payload(subject, teacher, group, room))
+    assert response.status_code == 201
+
+
+def test_create_reports_the_database_conflict(client, factory):
+    from datetime import time
+
+    level = factory.level()
+    group, subject, teacher, room = factory.group(level), factory.subject(level), factory.teacher(), factory.room()
+    # Written by another worker: this process's occupancy index never saw it
+    existing = factory.slot(subject, teacher, group, room, day_of_week=5, start_time=time(14, 0),
+                            end_time=time(16, 0))
+
+    response = client.post("/api/timetable-slots", json=_payload(subject, teacher, group, room,
+                                                                 start_time="15:00", end_time="17:00"))
+    assert response.status_code == 409
+    assert f"(slot {existing.id})" in response.json()["detail"]